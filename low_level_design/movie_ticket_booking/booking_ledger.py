@@ -0,0 +1,216 @@
+# Bookings sharded across worker processes by show.
+#
+# Each worker process runs its own MovieTicketBookingSystem for the shows
+# hashed to it and stamps every booking id it issues with its shard number as
+# the Snowflake node id. Booking and seat state for a show therefore stay in
+# one process, and a booking id routes straight back to the shard that issued
+# it from its own bits: looking a booking up needs no directory of ids.
+# Processes, pipes and batching come from ShardPool.
+#
+# Run from the repository root:
+#   python -m low_level_design.movie_ticket_booking.booking_ledger
+
+import datetime
+import os
+import zlib
+from typing import NamedTuple, Optional
+
+from low_level_design.movie_ticket_booking.implementation import (
+    NODE_BITS,
+    Booking,
+    Movie,
+    MovieTicketBookingSystem,
+    Show,
+    SnowflakeIdGenerator,
+    Theater,
+    User,
+    create_seats,
+    parse_booking_id,
+)
+from low_level_design.shard_pool import BatchError, ShardPool
+
+
+class ShowSpec(NamedTuple):
+    show_id: str
+    movie_id: str
+    theater_id: str
+    start: datetime.datetime
+    rows: int = 10
+    columns: int = 10
+    duration_in_min: int = 120
+
+
+class LedgerRequest(NamedTuple):
+    op: str  # "book", "confirm", "cancel" or "get"
+    show_id: Optional[str] = None
+    booking_id: Optional[str] = None
+    user_id: Optional[str] = None
+    # Books these seats, or the best `count` adjacent seats when empty
+    seat_ids: tuple[str, ...] = ()
+    count: int = 0
+
+
+class BookingRef(NamedTuple):
+    booking_id: str
+    show_id: str
+    user_id: str
+    seat_ids: tuple[str, ...]
+    total_price: float
+    status: str
+
+
+# Stable across processes, unlike hash() of a str
+def shard_of(show_id: str, num_shards: int) -> int:
+    return zlib.crc32(show_id.encode()) % num_shards
+
+
+def booking_ref(booking: Booking) -> BookingRef:
+    return BookingRef(booking.id, booking.show.id, booking.user.id, tuple(seat.id for seat in booking.seats),
+                      booking.total_price, booking.status.value)
+
+
+class LedgerWorker:
+    def __init__(self, node_id: int):
+        MovieTicketBookingSystem.reset_instance()
+        self.booking_system = MovieTicketBookingSystem.get_instance()
+        self.booking_system.set_node_id(node_id)
+        self.movies: dict[str, Movie] = {}
+        self.theaters: dict[str, Theater] = {}
+        self.users: dict[str, User] = {}
+
+    def add_show(self, spec: ShowSpec) -> None:
+        movie = self.movies.get(spec.movie_id)
+        if not movie:
+            movie = self.movies[spec.movie_id] = Movie(spec.movie_id, spec.movie_id, "", spec.duration_in_min)
+            self.booking_system.add_movie(movie)
+        theater = self.theaters.get(spec.theater_id)
+        if not theater:
+            theater = self.theaters[spec.theater_id] = Theater(spec.theater_id, spec.theater_id, "", [])
+            self.booking_system.add_theater(theater)
+        end = spec.start + datetime.timedelta(minutes=spec.duration_in_min)
+        self.booking_system.add_show(Show(spec.show_id, movie, theater, spec.start, end,
+                                          create_seats(spec.rows, spec.columns)))
+
+    def _user(self, user_id: str) -> User:
+        user = self.users.get(user_id)
+        if not user:
+            user = self.users[user_id] = User(user_id, user_id, "")
+        return user
+
+    def handle(self, request: LedgerRequest):
+        booking_system = self.booking_system
+        if request.op == "book":
+            show = booking_system.get_show(request.show_id)
+            if not show:
+                return None
+            user = self._user(request.user_id)
+            if request.seat_ids:
+                booking = booking_system.book_tickets(user, show, list(request.seat_ids))
+            else:
+                booking = booking_system.book_best_seats(user, show, request.count)
+            return booking_ref(booking) if booking else None
+        if request.op == "confirm":
+            return booking_system.confirm_booking(request.booking_id)
+        if request.op == "cancel":
+            return booking_system.cancel_booking(request.booking_id)
+        if request.op == "get":
+            booking = booking_system.bookings.get(request.booking_id)
+            return booking_ref(booking) if booking else None
+        raise ValueError(f"Unknown ledger operation {request.op}")
+
+    def status(self) -> dict:
+        counts = {"shows": len(self.booking_system.shows), "bookings": len(self.booking_system.bookings)}
+        for booking in self.booking_system.bookings.values():
+            counts[booking.status.value] = counts.get(booking.status.value, 0) + 1
+        return counts
+
+
+# first_node_id lets several ledgers (say, one per machine) share the id
+# space: this ledger's shards are nodes first_node_id .. first_node_id + n - 1
+class BookingLedger:
+    def __init__(self, num_shards: Optional[int] = None, first_node_id: int = 0):
+        num_shards = num_shards or os.cpu_count() or 1
+        if first_node_id + num_shards > 1 << NODE_BITS:
+            raise ValueError(f"At most {1 << NODE_BITS} nodes")
+        self.first_node_id = first_node_id
+        self.pool = ShardPool(num_shards, LedgerWorker, "booking-shard", lambda index: (first_node_id + index,))
+
+    def __enter__(self) -> 'BookingLedger':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def add_show(self, spec: ShowSpec) -> int:
+        index = shard_of(spec.show_id, len(self.pool))
+        self.pool.call(index, "add_show", spec)
+        return index
+
+    # Shard of a request: by show for bookings, by the node bits of the
+    # booking id for everything else; None if the id was not issued here
+    def shard_for(self, request: LedgerRequest) -> Optional[int]:
+        if request.op == "book":
+            return shard_of(request.show_id, len(self.pool))
+        id = parse_booking_id(request.booking_id or "")
+        if id is None:
+            return None
+        index = SnowflakeIdGenerator.node_of(id) - self.first_node_id
+        return index if 0 <= index < len(self.pool) else None
+
+    # Results come back in request order: BookingRef / None for book and get,
+    # bool for confirm and cancel. Raises BatchError once the whole batch is
+    # done if any request failed; its results still hold the other bookings.
+    def submit(self, requests: list[LedgerRequest]) -> list:
+        return self.pool.submit(requests, self.shard_for,
+                                lambda request: False if request.op in ("confirm", "cancel") else None)
+
+    def book(self, show_id: str, user_id: str, seat_ids: tuple[str, ...] = (), count: int = 0) -> Optional[BookingRef]:
+        return self.submit([LedgerRequest("book", show_id, user_id=user_id, seat_ids=seat_ids, count=count)])[0]
+
+    def get(self, booking_id: str) -> Optional[BookingRef]:
+        return self.submit([LedgerRequest("get", booking_id=booking_id)])[0]
+
+    def confirm(self, booking_id: str) -> bool:
+        return self.submit([LedgerRequest("confirm", booking_id=booking_id)])[0]
+
+    def cancel(self, booking_id: str) -> bool:
+        return self.submit([LedgerRequest("cancel", booking_id=booking_id)])[0]
+
+    def get_status(self) -> dict:
+        shards = [self.pool.call(index, "status") for index in range(len(self.pool))]
+        totals: dict[str, int] = {}
+        for counts in shards:
+            for key, value in counts.items():
+                totals[key] = totals.get(key, 0) + value
+        return {"shards": shards, "total": totals}
+
+    def close(self) -> None:
+        self.pool.close()
+
+
+if __name__ == "__main__":
+    evening = datetime.datetime(2024, 5, 1, 18)
+    with BookingLedger(num_shards=2) as ledger:
+        for number in range(1, 5):
+            shard = ledger.add_show(ShowSpec(f"S{number}", "M1", "T1", evening + datetime.timedelta(hours=number)))
+            print(f"Show S{number} on shard {shard}")
+
+        bookings = ledger.submit([
+            LedgerRequest("book", "S1", user_id="U1", seat_ids=("1-5", "1-6")),
+            LedgerRequest("book", "S2", user_id="U2", count=4),
+            LedgerRequest("book", "S4", user_id="U3", count=2),
+            LedgerRequest("book", "S1", user_id="U4", seat_ids=("1-6", "1-7")),
+        ])
+        for booking in bookings:
+            print(f"✅ {booking.booking_id} (node {SnowflakeIdGenerator.node_of(parse_booking_id(booking.booking_id))}) "
+                  f"{booking.show_id} {list(booking.seat_ids)}" if booking else "❌ Seats already taken")
+
+        try:
+            ledger.submit([LedgerRequest("refund", booking_id=bookings[0].booking_id),
+                           LedgerRequest("book", "S3", user_id="U5", count=2)])
+        except BatchError as e:
+            print(f"❌ {e.errors[0]}; the S3 booking went through anyway: {e.results[1] is not None}")
+
+        print(f"Confirm {bookings[1].booking_id}: {ledger.confirm(bookings[1].booking_id)}")
+        print(f"Lookup by id: {ledger.get(bookings[1].booking_id)}")
+        print(f"Status: {ledger.get_status()['total']}")
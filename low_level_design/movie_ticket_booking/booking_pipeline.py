@@ -0,0 +1,310 @@
+# Asyncio pipeline for the slow side of confirm_booking / cancel_booking.
+#
+# The pipeline is a BookingObserver: confirming or cancelling a booking only
+# hands the booking to the pipeline's event loop (call_soon_threadsafe, no
+# waiting), and the loop does the payment / refund and the notification.
+# Jobs are batched into one backend call per stage, at most max_concurrency
+# backend calls run at once, and items a call fails are retried with
+# exponential backoff before they are given up as failed and handed to the
+# on_failed hook, e.g. release_unpaid to give an unpaid booking's seats back.
+#
+# Run from the repository root:
+#   python -m low_level_design.movie_ticket_booking.booking_pipeline
+
+import asyncio
+import collections
+import datetime
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, NamedTuple, Optional
+
+from low_level_design.movie_ticket_booking.implementation import (
+    Booking,
+    BookingObserver,
+    Movie,
+    MovieTicketBookingSystem,
+    Show,
+    Theater,
+    User,
+    create_seats,
+)
+
+
+PAYMENT = "payment"
+REFUND = "refund"
+NOTIFICATION = "notification"
+# Stages each event goes through, in order
+CONFIRMED_STAGES = (PAYMENT, NOTIFICATION)
+CANCELLED_STAGES = (REFUND, NOTIFICATION)
+
+
+# Payment and notification provider; one call handles a batch of bookings
+# for one stage and reports success per booking
+class BookingBackend(ABC):
+    @abstractmethod
+    async def process(self, stage: str, bookings: list[Booking]) -> list[bool]:
+        pass
+
+
+# Local stand-in with a fixed latency per call and random per-booking failures
+class FakeBookingBackend(BookingBackend):
+    def __init__(self, latency: float = 0.05, failure_rate: float = 0.0, seed: Optional[int] = None):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.calls = 0
+        self.processed = collections.Counter()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def process(self, stage: str, bookings: list[Booking]) -> list[bool]:
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+            results = [self.random.random() >= self.failure_rate for _ in bookings]
+            self.processed[stage] += sum(results)
+            return results
+        finally:
+            self.in_flight -= 1
+
+
+class PipelineJob:
+    __slots__ = ("booking", "stages", "stage", "attempts", "submitted")
+
+    def __init__(self, booking: Booking, stages: tuple[str, ...]):
+        self.booking = booking
+        self.stages = stages
+        self.stage = 0
+        self.attempts = 0
+        self.submitted = time.perf_counter()
+
+
+class PipelineMetrics(NamedTuple):
+    queue_depth: int
+    max_queue_depth: int
+    in_progress: int
+    completed: int
+    failed: int
+    retries: int
+    batches: int
+    latency_p50_ms: float
+    latency_p99_ms: float
+
+
+# on_failed hook that cancels a booking whose payment never went through and
+# puts its seats back on sale; a failed refund or notice leaves the booking alone
+def release_unpaid(booking_system: MovieTicketBookingSystem) -> Callable[[PipelineJob], None]:
+    def on_failed(job: PipelineJob) -> None:
+        if job.stages[job.stage] == PAYMENT:
+            booking_system.revoke_booking(job.booking.id)
+
+    return on_failed
+
+
+class BookingPipeline(BookingObserver):
+    # on_failed is called on the pipeline's loop with each job given up after
+    # max_retries, so it should be quick
+    def __init__(self, backend: BookingBackend, batch_size: int = 100, max_batch_delay: float = 0.01,
+                 max_concurrency: int = 8, max_retries: int = 3, backoff: float = 0.05,
+                 seed: Optional[int] = None, on_failed: Optional[Callable[[PipelineJob], None]] = None):
+        self.backend = backend
+        self.on_failed = on_failed
+        self.batch_size = batch_size
+        self.max_batch_delay = max_batch_delay
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.random = random.Random(seed)
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.queue: Optional[asyncio.Queue] = None
+        self.thread: Optional[threading.Thread] = None
+        self.in_progress = 0
+        self.max_queue_depth = 0
+        self.completed = 0
+        self.retries = 0
+        self.batches = 0
+        # Jobs given up after max_retries, for someone to look at
+        self.failed: list[PipelineJob] = []
+        # Submit-to-done seconds of the most recent jobs
+        self.latencies: collections.deque = collections.deque(maxlen=100000)
+        self.dropped = 0
+
+    async def start(self) -> None:
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+        self.slots = asyncio.Semaphore(self.max_concurrency)
+        self.idle = asyncio.Event()
+        self.idle.set()
+        self.tasks: set[asyncio.Task] = set()
+        self.batcher = asyncio.create_task(self._batch_loop())
+
+    # Waits for every submitted job to finish, then stops the pipeline
+    async def close(self) -> None:
+        await self.idle.wait()
+        self.batcher.cancel()
+        try:
+            await self.batcher
+        except asyncio.CancelledError:
+            pass
+
+    # For callers without an event loop: runs the pipeline on its own loop in a daemon thread
+    def start_in_thread(self) -> None:
+        started = threading.Event()
+
+        def run():
+            loop = asyncio.new_event_loop()
+            loop.run_until_complete(self.start())
+            started.set()
+            loop.run_forever()
+            loop.close()
+
+        self.thread = threading.Thread(target=run, name="booking-pipeline", daemon=True)
+        self.thread.start()
+        started.wait()
+
+    def stop_thread(self, timeout: Optional[float] = None) -> None:
+        asyncio.run_coroutine_threadsafe(self.close(), self.loop).result(timeout)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout)
+
+    def on_booking_confirmed(self, booking: Booking):
+        self.submit(PipelineJob(booking, CONFIRMED_STAGES))
+
+    def on_booking_cancelled(self, booking: Booking):
+        self.submit(PipelineJob(booking, CANCELLED_STAGES))
+
+    # Safe from any thread and never waits; a pipeline that is not running drops the job
+    def submit(self, job: PipelineJob) -> None:
+        try:
+            self.loop.call_soon_threadsafe(self._enqueue, job, True)
+        except (AttributeError, RuntimeError):
+            self.dropped += 1
+
+    def _enqueue(self, job: PipelineJob, new: bool = False) -> None:
+        if new:
+            self.in_progress += 1
+            self.idle.clear()
+        self.queue.put_nowait(job)
+        self.max_queue_depth = max(self.max_queue_depth, self.queue.qsize())
+
+    def _finish(self, job: PipelineJob, succeeded: bool) -> None:
+        if succeeded:
+            self.completed += 1
+            self.latencies.append(time.perf_counter() - job.submitted)
+        else:
+            self.failed.append(job)
+            if self.on_failed:
+                # A broken hook must not leave the job in progress, or close() would wait forever
+                try:
+                    self.on_failed(job)
+                except Exception:
+                    pass
+        self.in_progress -= 1
+        if not self.in_progress:
+            self.idle.set()
+
+    async def _batch_loop(self) -> None:
+        queue = self.queue
+        while True:
+            batch = [await queue.get()]
+            # Give a partial batch a moment to fill up
+            if queue.qsize() < self.batch_size - 1:
+                await asyncio.sleep(self.max_batch_delay)
+            while len(batch) < self.batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+            by_stage: dict[str, list[PipelineJob]] = {}
+            for job in batch:
+                by_stage.setdefault(job.stages[job.stage], []).append(job)
+            for stage, jobs in by_stage.items():
+                # Waits here while max_concurrency calls are out; new jobs keep queueing meanwhile
+                await self.slots.acquire()
+                task = asyncio.create_task(self._dispatch(stage, jobs))
+                self.tasks.add(task)
+                task.add_done_callback(self.tasks.discard)
+
+    async def _dispatch(self, stage: str, jobs: list[PipelineJob]) -> None:
+        self.batches += 1
+        try:
+            results = await self.backend.process(stage, [job.booking for job in jobs])
+        except Exception:
+            results = [False] * len(jobs)
+        finally:
+            self.slots.release()
+        # A short answer must not strand jobs: anything unanswered failed
+        results = list(results)[:len(jobs)]
+        results += [False] * (len(jobs) - len(results))
+        for job, succeeded in zip(jobs, results):
+            if succeeded:
+                job.stage += 1
+                job.attempts = 0
+                if job.stage < len(job.stages):
+                    self._enqueue(job)
+                else:
+                    self._finish(job, True)
+            elif job.attempts < self.max_retries:
+                job.attempts += 1
+                self.retries += 1
+                # Exponential backoff with jitter, so retries of one failed call spread out
+                delay = self.backoff * 2 ** (job.attempts - 1) * self.random.uniform(0.5, 1.5)
+                self.loop.call_later(delay, self._enqueue, job)
+            else:
+                self._finish(job, False)
+
+    def metrics(self) -> PipelineMetrics:
+        latencies = sorted(self.latencies)
+
+        def percentile(fraction: float) -> float:
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(len(latencies) * fraction))] * 1000
+
+        return PipelineMetrics(
+            queue_depth=self.queue.qsize() if self.queue else 0,
+            max_queue_depth=self.max_queue_depth,
+            in_progress=self.in_progress,
+            completed=self.completed,
+            failed=len(self.failed),
+            retries=self.retries,
+            batches=self.batches,
+            latency_p50_ms=percentile(0.5),
+            latency_p99_ms=percentile(0.99),
+        )
+
+
+if __name__ == "__main__":
+    MovieTicketBookingSystem.reset_instance()
+    booking_system = MovieTicketBookingSystem.get_instance()
+    today = datetime.datetime.now()
+    show = Show("S1", Movie("M1", "Dune", "", 155), Theater("T1", "PVR Cinemas", "Downtown", []),
+                today, today + datetime.timedelta(minutes=155), create_seats(10, 10))
+    booking_system.add_show(show)
+
+    backend = FakeBookingBackend(latency=0.05, failure_rate=0.2, seed=4)
+    pipeline = BookingPipeline(backend, batch_size=10, seed=4, on_failed=release_unpaid(booking_system))
+    pipeline.start_in_thread()
+    booking_system.add_booking_observer(pipeline)
+
+    bookings = [booking_system.book_best_seats(User(f"U{number}", f"User {number}", ""), show, 2)
+                for number in range(30)]
+    start = time.perf_counter()
+    for number, booking in enumerate(bookings):
+        if number % 3:
+            booking_system.confirm_booking(booking.id)
+        else:
+            booking_system.cancel_booking(booking.id)
+    print(f"30 confirms / cancels returned in {(time.perf_counter() - start) * 1000:.2f} ms")
+
+    pipeline.stop_thread()
+    metrics = pipeline.metrics()
+    print(f"✅ {metrics.completed} done, {metrics.failed} failed, {metrics.retries} retries, "
+          f"{metrics.batches} backend calls (max {backend.max_in_flight} at once)")
+    print(f"Payments {backend.processed[PAYMENT]}, refunds {backend.processed[REFUND]}, "
+          f"notifications {backend.processed[NOTIFICATION]}")
+    print(f"End-to-end p50 {metrics.latency_p50_ms:.0f} ms, p99 {metrics.latency_p99_ms:.0f} ms, "
+          f"max queue depth {metrics.max_queue_depth}")
+    unpaid = sum(job.stages[job.stage] == PAYMENT for job in pipeline.failed)
+    print(f"Unpaid bookings cancelled: {unpaid}, seats on sale again: {show.seats.available_count()}")
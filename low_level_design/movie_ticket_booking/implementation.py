@@ -1,6 +1,14 @@
+import bisect
 import datetime
-import itertools
+import functools
+import heapq
+import threading
+import time
+from abc import ABC, abstractmethod
+from array import array
+from collections.abc import Iterable, Iterator, Mapping
 from enum import Enum
+from typing import Callable, Optional, Union
 
 
 
@@ -16,6 +24,19 @@ class BookingStatus(Enum):
     PENDING = "Pending"
     CONFIRMED = "Confirmed"
     CANCELLED = "Cancelled"
+    EXPIRED = "Expired"
+
+# How long a pending booking keeps its seats before they go back on sale
+DEFAULT_HOLD_TTL = datetime.timedelta(minutes=10)
+# Shows per bucket of a ShowSchedule, between this and twice this
+SCHEDULE_BUCKET = 256
+# Best-seat scoring: one row away from the preferred row costs as much as
+# two seats away from the centre of the row
+ROW_WEIGHT = 2
+# Booking id layout: milliseconds since ID_EPOCH, node id, per-millisecond sequence
+ID_EPOCH_MS = 1704067200000  # 2024-01-01 UTC
+NODE_BITS = 10
+SEQUENCE_BITS = 12
 
 
 class User:
@@ -32,6 +53,9 @@ class Movie:
         self.duration_in_min = duration
 
 class Seat:
+    # Slotted, so neither a Seat nor a SeatView carries a __dict__
+    __slots__ = ("id", "row", "column", "seat_type", "price", "status")
+
     def __init__(self, id: str, row: int, column: int, seat_type: SeatType, price: float, seat_status: SeatStatus):
         self.id = id
         self.row = row
@@ -40,23 +64,595 @@ class Seat:
         self.price = price
         self.status = seat_status
 
+# Seat positions of an auditorium: a row x column grid where each position
+# holds a seat class code (0 for an aisle or gap). A class is a seat type and
+# its price, so type and price live once per class instead of once per seat.
+# Per-class bitsets let a show count free seats of a type with one AND.
+# A layout is the template of an auditorium: every show there shares it, and
+# it is frozen once the first show uses it.
+class SeatLayout:
+    def __init__(self, rows: int, columns: int):
+        self.rows = rows
+        self.columns = columns
+        self.class_codes = bytearray(rows * columns)
+        self.classes: list[tuple[SeatType, float]] = []
+        self.seat_count = 0
+        self.row_seat_counts = array('I', [0]) * rows
+        # Seats whose id is not "row-column"
+        self.custom_indexes: dict[str, int] = {}
+        self.custom_ids: dict[int, str] = {}
+        self._class_masks: Optional[list[int]] = None
+        self._type_masks: dict[SeatType, int] = {}
+        self._row_masks: dict[Optional[SeatType], list[int]] = {}
+        self.frozen = False
+
+    def _check_editable(self) -> None:
+        if self.frozen:
+            raise ValueError("Seat layout is already shared by shows")
+
+    def _class_code(self, seat_type: SeatType, price: float) -> int:
+        self._check_editable()
+        seat_class = (seat_type, price)
+        if seat_class not in self.classes:
+            self.classes.append(seat_class)
+        return self.classes.index(seat_class) + 1
+
+    def add_seat(self, row: int, column: int, seat_type: SeatType, price: float, seat_id: Optional[str] = None) -> int:
+        index = (row - 1) * self.columns + column - 1
+        if self.class_codes[index]:
+            raise ValueError(f"Seat {row}-{column} already exists")
+        self.class_codes[index] = self._class_code(seat_type, price)
+        self.seat_count += 1
+        self.row_seat_counts[row - 1] += 1
+        if seat_id is not None and seat_id != f"{row}-{column}":
+            self.custom_indexes[seat_id] = index
+            self.custom_ids[index] = seat_id
+        self._class_masks = None
+        self._type_masks = {}
+        self._row_masks = {}
+        return index
+
+    # Fills whole rows at once
+    def add_rows(self, first_row: int, last_row: int, seat_type: SeatType, price: float) -> None:
+        code = self._class_code(seat_type, price)
+        start = (first_row - 1) * self.columns
+        end = last_row * self.columns
+        if any(self.class_codes[start:end]):
+            raise ValueError(f"Rows {first_row}-{last_row} already have seats")
+        self.class_codes[start:end] = bytes([code]) * (end - start)
+        self.seat_count += end - start
+        for row in range(first_row - 1, last_row):
+            self.row_seat_counts[row] = self.columns
+        self._class_masks = None
+        self._type_masks = {}
+        self._row_masks = {}
+
+    def index_of(self, seat_id: str) -> int:
+        index = self.custom_indexes.get(seat_id)
+        if index is not None:
+            return index
+        row, _, column = seat_id.partition("-")
+        if not (row.isdigit() and column.isdigit()):
+            return -1
+        row, column = int(row), int(column)
+        if not (1 <= row <= self.rows and 1 <= column <= self.columns):
+            return -1
+        index = (row - 1) * self.columns + column - 1
+        if not self.class_codes[index] or index in self.custom_ids:
+            return -1
+        return index
+
+    def seat_id(self, index: int) -> str:
+        seat_id = self.custom_ids.get(index)
+        if seat_id is None:
+            row, column = divmod(index, self.columns)
+            seat_id = f"{row + 1}-{column + 1}"
+        return seat_id
+
+    def seat_indexes(self) -> Iterator[int]:
+        return (index for index, code in enumerate(self.class_codes) if code)
+
+    def seat_class(self, index: int) -> tuple[SeatType, float]:
+        return self.classes[self.class_codes[index] - 1]
+
+    # Bitset of the positions of every class; built once, after the last seat is added
+    def class_masks(self) -> list[int]:
+        if self._class_masks is None:
+            masks = []
+            for code in range(1, len(self.classes) + 1):
+                bits = bytearray((len(self.class_codes) + 7) // 8)
+                for index in (index for index, seat_code in enumerate(self.class_codes) if seat_code == code):
+                    bits[index >> 3] |= 1 << (index & 7)
+                masks.append(int.from_bytes(bits, "little"))
+            self._class_masks = masks
+        return self._class_masks
+
+    def type_mask(self, seat_type: SeatType) -> int:
+        mask = self._type_masks.get(seat_type)
+        if mask is None:
+            mask = 0
+            for (class_type, _), class_mask in zip(self.classes, self.class_masks()):
+                if class_type == seat_type:
+                    mask |= class_mask
+            self._type_masks[seat_type] = mask
+        return mask
+
+    # The seats of each row (optionally of one type) as a bitset over its columns
+    def row_masks(self, seat_type: Optional[SeatType] = None) -> list[int]:
+        masks = self._row_masks.get(seat_type)
+        if masks is None:
+            if seat_type is None:
+                mask = 0
+                for class_mask in self.class_masks():
+                    mask |= class_mask
+            else:
+                mask = self.type_mask(seat_type)
+            row_mask = (1 << self.columns) - 1
+            masks = [mask >> (row * self.columns) & row_mask for row in range(self.rows)]
+            self._row_masks[seat_type] = masks
+        return masks
+
+
+# Bit i of the result is set when bits i .. i+length-1 of bits are all set;
+# doubling the run each step takes O(log length) big-int operations
+def _run_starts(bits: int, length: int) -> int:
+    run = 1
+    while run < length and bits:
+        step = min(run, length - run)
+        bits &= bits >> step
+        run += step
+    return bits
+
+
+# Set bit of bits closest to position, preferring the lower one on a tie
+def _nearest_bit(bits: int, position: float) -> int:
+    split = int(position) + 1
+    lower = bits & ((1 << split) - 1)
+    upper = bits >> split
+    below = lower.bit_length() - 1 if lower else None
+    above = split + (upper & -upper).bit_length() - 1 if upper else None
+    if above is None or (below is not None and position - below <= above - position):
+        return below
+    return above
+
+
+# Rows outward from the preferred one: preferred, one behind, one in front, ...
+def _rows_by_distance(preferred_row: int, rows: int) -> Iterator[int]:
+    for distance in range(rows):
+        if preferred_row + distance <= rows:
+            yield preferred_row + distance
+        if distance and preferred_row - distance >= 1:
+            yield preferred_row - distance
+
+
+_materialize_lock = threading.Lock()
+
+
+# Per-show seat state as one bitset over the layout (bit set = booked). A
+# multi-seat request is one mask: checking it is a single AND and booking it
+# a single OR, whatever the size of the auditorium. Free counts per show and
+# per row are kept as counters. Reads as a mapping of seat id -> Seat view.
+#
+# A show nobody has booked yet is a handful of fields over the shared layout:
+# the per-row state and the lock are only created on its first booking.
+class SeatMap(Mapping):
+    __slots__ = ("layout", "lock", "booked", "available", "row_available", "row_booked")
+
+    def __init__(self, layout: SeatLayout):
+        layout.frozen = True
+        self.layout = layout
+        self.booked = 0
+        self.available = layout.seat_count
+        # Held across each check-and-set, so concurrent buyers cannot both win a
+        # seat; the bitset operations inside are short, so one lock per show is enough
+        self.lock: Optional[threading.Lock] = None
+        # Copy of the layout's row seat counts, minus booked seats
+        self.row_available: Optional[array] = None
+        # The same booked bits split by row, so a row is read without shifting
+        # the whole bitset
+        self.row_booked: Optional[list[int]] = None
+
+    def _materialize(self) -> threading.Lock:
+        with _materialize_lock:
+            if self.lock is None:
+                self.row_available = array('I', self.layout.row_seat_counts)
+                self.row_booked = [0] * self.layout.rows
+                # Set last: a map with a lock has its row state
+                self.lock = threading.Lock()
+        return self.lock
+
+    @classmethod
+    def from_seats(cls, seats: dict[str, Seat]) -> 'SeatMap':
+        layout = SeatLayout(max((seat.row for seat in seats.values()), default=0),
+                            max((seat.column for seat in seats.values()), default=0))
+        booked = []
+        for seat_id, seat in seats.items():
+            index = layout.add_seat(seat.row, seat.column, seat.seat_type, seat.price, seat_id)
+            if seat.status == SeatStatus.BOOKED:
+                booked.append(index)
+        seat_map = cls(layout)
+        seat_map.book(booked)
+        return seat_map
+
+    def __getitem__(self, seat_id: str) -> 'SeatView':
+        index = self.layout.index_of(seat_id)
+        if index < 0:
+            raise KeyError(seat_id)
+        return SeatView(self, index)
+
+    def __contains__(self, seat_id) -> bool:
+        return isinstance(seat_id, str) and self.layout.index_of(seat_id) >= 0
+
+    def __iter__(self) -> Iterator[str]:
+        return (self.layout.seat_id(index) for index in self.layout.seat_indexes())
+
+    def __len__(self) -> int:
+        return self.layout.seat_count
+
+    # Layout indexes of the seats (Seat objects or ids); None if any seat is
+    # unknown or repeated
+    def indexes_of(self, seats: Iterable[Union[Seat, str]]) -> Optional[list[int]]:
+        indexes = []
+        for seat in seats:
+            index = self.layout.index_of(seat if isinstance(seat, str) else seat.id)
+            if index < 0:
+                return None
+            indexes.append(index)
+        if len(set(indexes)) != len(indexes):
+            return None
+        return indexes
+
+    @staticmethod
+    def mask_of(indexes: Iterable[int]) -> int:
+        mask = 0
+        for index in indexes:
+            mask |= 1 << index
+        return mask
+
+    def is_booked(self, index: int) -> bool:
+        return bool(self.booked >> index & 1)
+
+    def are_available(self, indexes: list[int]) -> bool:
+        return not self.booked & self.mask_of(indexes)
+
+    # All or nothing: books every seat, or none if any is taken
+    def book(self, indexes: list[int]) -> bool:
+        mask = self.mask_of(indexes)
+        with self.lock or self._materialize():
+            if self.booked & mask:
+                return False
+            self.booked |= mask
+            self._count(indexes, -1)
+        return True
+
+    # All or nothing: frees every seat, or none if any is not booked
+    def release(self, indexes: list[int]) -> bool:
+        mask = self.mask_of(indexes)
+        with self.lock or self._materialize():
+            if self.booked & mask != mask:
+                return False
+            self.booked &= ~mask
+            self._count(indexes, 1)
+        return True
+
+    # Replaces the whole seat state, e.g. from a snapshot, and rebuilds the counters
+    def load_booked(self, booked: int) -> None:
+        layout = self.layout
+        row_mask = (1 << layout.columns) - 1
+        with self.lock or self._materialize():
+            self.booked = booked
+            self.available = layout.seat_count - booked.bit_count()
+            for row in range(layout.rows):
+                row_booked = booked >> (row * layout.columns) & row_mask
+                self.row_booked[row] = row_booked
+                self.row_available[row] = layout.row_seat_counts[row] - row_booked.bit_count()
+
+    def _count(self, indexes: list[int], delta: int) -> None:
+        self.available += delta * len(indexes)
+        columns = self.layout.columns
+        for index in indexes:
+            row, column = divmod(index, columns)
+            self.row_available[row] += delta
+            # Every bit changes state here, so a flip books or releases it
+            self.row_booked[row] ^= 1 << column
+
+    def available_count(self, seat_type: Optional[SeatType] = None) -> int:
+        if seat_type is None:
+            return self.available
+        type_mask = self.layout.type_mask(seat_type)
+        return (type_mask & ~self.booked).bit_count()
+
+    def row_available_count(self, row: int) -> int:
+        row_available = self.row_available
+        return (self.layout.row_seat_counts if row_available is None else row_available)[row - 1]
+
+    def total_price(self, indexes: list[int]) -> float:
+        return sum(self.layout.seat_class(index)[1] for index in indexes)
+
+    # Indexes of the best `count` adjacent free seats in one row, or None.
+    # Rows are tried outward from the preferred row (two thirds of the way back
+    # by default) and a block scores by its row's distance from the preferred
+    # row plus its distance from the row's centre, so the search stops once the
+    # row distance alone is worse than the best block found. Within a row, the
+    # row's slice of the bitset gives every free run of `count` seats at once.
+    def find_best_seats(self, count: int, seat_type: Optional[SeatType] = None,
+                        preferred_row: Optional[int] = None) -> Optional[list[int]]:
+        layout = self.layout
+        if not 1 <= count <= layout.columns or not layout.rows:
+            return None
+        if preferred_row is None:
+            preferred_row = (2 * layout.rows + 2) // 3
+        preferred_row = min(max(preferred_row, 1), layout.rows)
+        row_masks = layout.row_masks(seat_type)
+        # Rows are read without the lock; book() re-checks the block, so a
+        # block taken meanwhile only costs the caller a retry
+        row_available, row_booked = self.row_available, self.row_booked
+        if row_available is None or row_booked is None:
+            row_available, row_booked = layout.row_seat_counts, None
+        centre = (layout.columns - count) / 2
+        best_score, best_start = None, None
+        for row in _rows_by_distance(preferred_row, layout.rows):
+            row_score = ROW_WEIGHT * abs(row - preferred_row)
+            if best_score is not None and row_score >= best_score:
+                break
+            if row_available[row - 1] < count:
+                continue
+            free = row_masks[row - 1] if row_booked is None else row_masks[row - 1] & ~row_booked[row - 1]
+            starts = _run_starts(free, count)
+            if not starts:
+                continue
+            start = _nearest_bit(starts, centre)
+            score = row_score + abs(start - centre)
+            if best_score is None or score < best_score:
+                best_score, best_start = score, (row - 1) * layout.columns + start
+        if best_start is None:
+            return None
+        return list(range(best_start, best_start + count))
+
+    # Finds and books the best block. The search runs without the lock first;
+    # if another buyer took that block meanwhile, it runs again under the lock,
+    # so a crowd asking for the best seats does not keep colliding on one block
+    def book_best_seats(self, count: int, seat_type: Optional[SeatType] = None,
+                        preferred_row: Optional[int] = None) -> Optional[list[int]]:
+        indexes = self.find_best_seats(count, seat_type, preferred_row)
+        if indexes is None or self.book(indexes):
+            return indexes
+        with self.lock:
+            indexes = self.find_best_seats(count, seat_type, preferred_row)
+            if indexes is not None:
+                self.booked |= self.mask_of(indexes)
+                self._count(indexes, -1)
+        return indexes
+
+
+# Seat over one position of a SeatMap; holds nothing but the index
+class SeatView(Seat):
+    __slots__ = ("seat_map", "index")
+
+    def __init__(self, seat_map: SeatMap, index: int):
+        self.seat_map = seat_map
+        self.index = index
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, SeatView) and other.seat_map is self.seat_map and other.index == self.index
+
+    def __hash__(self) -> int:
+        return hash((id(self.seat_map), self.index))
+
+    def __repr__(self) -> str:
+        return f"SeatView({self.id!r})"
+
+    @property
+    def id(self) -> str:
+        return self.seat_map.layout.seat_id(self.index)
+
+    @property
+    def row(self) -> int:
+        return self.index // self.seat_map.layout.columns + 1
+
+    @property
+    def column(self) -> int:
+        return self.index % self.seat_map.layout.columns + 1
+
+    @property
+    def seat_type(self) -> SeatType:
+        return self.seat_map.layout.seat_class(self.index)[0]
+
+    @property
+    def price(self) -> float:
+        return self.seat_map.layout.seat_class(self.index)[1]
+
+    @property
+    def status(self) -> SeatStatus:
+        return SeatStatus.BOOKED if self.seat_map.is_booked(self.index) else SeatStatus.AVAILABLE
+
+    @status.setter
+    def status(self, status: SeatStatus):
+        if status == SeatStatus.BOOKED:
+            self.seat_map.book([self.index])
+        else:
+            self.seat_map.release([self.index])
+
+
 class Show:
-    def __init__(self, id: str, movie: Movie, theater: 'Theater', start_datetime: datetime.datetime, end_datetime: datetime.datetime, seats: dict[str, Seat]):
+    def __init__(self, id: str, movie: Movie, theater: 'Theater', start_datetime: datetime.datetime, end_datetime: datetime.datetime, seats: Union[SeatMap, dict[str, Seat]]):
         self.id = id
         self.movie = movie
         self.theater = theater
         self.start_datetime = start_datetime
         self.end_datetime = end_datetime
-        self.seats = seats
+        self.seats = seats if isinstance(seats, SeatMap) else SeatMap.from_seats(seats)
+
+# A screen of a theater; its seat layout is defined once and every show
+# there gets a SeatMap over it
+class Auditorium:
+    def __init__(self, id: str, name: str, layout: SeatLayout):
+        self.id = id
+        self.name = name
+        self.layout = layout
+
+    def new_seat_map(self) -> SeatMap:
+        return SeatMap(self.layout)
 
 class Theater:
-    def __init__(self, id: str, name: str, location: str, shows: list[Show]):
+    def __init__(self, id: str, name: str, location: str, shows: list[Show],
+                 auditoriums: Optional[list[Auditorium]] = None):
         self.id = id
         self.name = name
         self.location = location
         self.shows = shows
+        self.auditoriums = auditoriums or []
+
+# Shows sorted by start time, so "starting between a and b" is two bisects
+# plus the k shows returned. Kept as a list of sorted buckets of at most
+# 2 * SCHEDULE_BUCKET shows, so an insert or remove moves one bucket instead
+# of every later show.
+class ShowSchedule:
+    def __init__(self):
+        self.keys: list[list[tuple[datetime.datetime, str]]] = []
+        self.shows: list[list[Show]] = []
+        # Last key of every bucket
+        self.maxes: list[tuple[datetime.datetime, str]] = []
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def add(self, show: Show) -> None:
+        key = (show.start_datetime, show.id)
+        self.size += 1
+        if not self.keys:
+            self.keys.append([key])
+            self.shows.append([show])
+            self.maxes.append(key)
+            return
+        bucket = min(bisect.bisect_left(self.maxes, key), len(self.maxes) - 1)
+        keys, shows = self.keys[bucket], self.shows[bucket]
+        position = bisect.bisect_left(keys, key)
+        keys.insert(position, key)
+        shows.insert(position, show)
+        self.maxes[bucket] = keys[-1]
+        if len(keys) > 2 * SCHEDULE_BUCKET:
+            self.keys[bucket:bucket + 1] = [keys[:SCHEDULE_BUCKET], keys[SCHEDULE_BUCKET:]]
+            self.shows[bucket:bucket + 1] = [shows[:SCHEDULE_BUCKET], shows[SCHEDULE_BUCKET:]]
+            self.maxes[bucket:bucket + 1] = [keys[SCHEDULE_BUCKET - 1], keys[-1]]
+
+    def remove(self, show: Show) -> None:
+        key = (show.start_datetime, show.id)
+        bucket = bisect.bisect_left(self.maxes, key)
+        if bucket == len(self.maxes):
+            return
+        keys, shows = self.keys[bucket], self.shows[bucket]
+        position = bisect.bisect_left(keys, key)
+        if keys[position] != key:
+            return
+        del keys[position]
+        del shows[position]
+        self.size -= 1
+        if keys:
+            self.maxes[bucket] = keys[-1]
+        else:
+            del self.keys[bucket], self.shows[bucket], self.maxes[bucket]
+
+    # Shows starting in [start, end); either bound may be left open
+    def between(self, start: Optional[datetime.datetime] = None,
+                end: Optional[datetime.datetime] = None) -> list[Show]:
+        bucket, position = 0, 0
+        if start is not None:
+            bucket = bisect.bisect_left(self.maxes, (start,))
+            if bucket < len(self.keys):
+                position = bisect.bisect_left(self.keys[bucket], (start,))
+        found = []
+        while bucket < len(self.keys):
+            keys = self.keys[bucket]
+            if end is not None and keys[-1] >= (end,):
+                found.extend(self.shows[bucket][position:bisect.bisect_left(keys, (end,))])
+                break
+            found.extend(self.shows[bucket][position:])
+            bucket, position = bucket + 1, 0
+        return found
+
+
+# Secondary indexes over the system's shows and theaters, kept up to date on
+# every add and remove
+class ShowIndex:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.all_shows = ShowSchedule()
+        self.by_movie: dict[str, ShowSchedule] = {}
+        self.by_theater: dict[str, ShowSchedule] = {}
+        self.by_theater_movie: dict[tuple[str, str], ShowSchedule] = {}
+        self.theaters_by_location: dict[str, dict[str, Theater]] = {}
+
+    def _schedules(self, show: Show) -> list[ShowSchedule]:
+        return [
+            self.all_shows,
+            self.by_movie.setdefault(show.movie.id, ShowSchedule()),
+            self.by_theater.setdefault(show.theater.id, ShowSchedule()),
+            self.by_theater_movie.setdefault((show.theater.id, show.movie.id), ShowSchedule()),
+        ]
+
+    def add_show(self, show: Show) -> None:
+        with self.lock:
+            for schedule in self._schedules(show):
+                schedule.add(show)
+
+    def remove_show(self, show: Show) -> None:
+        with self.lock:
+            for schedule in self._schedules(show):
+                schedule.remove(show)
+            for key, index in ((show.movie.id, self.by_movie), (show.theater.id, self.by_theater),
+                               ((show.theater.id, show.movie.id), self.by_theater_movie)):
+                if not index[key]:
+                    del index[key]
+
+    def add_theater(self, theater: Theater) -> None:
+        with self.lock:
+            self.theaters_by_location.setdefault(theater.location, {})[theater.id] = theater
+
+    def remove_theater(self, theater: Theater) -> None:
+        with self.lock:
+            theaters = self.theaters_by_location.get(theater.location, {})
+            theaters.pop(theater.id, None)
+            if not theaters:
+                self.theaters_by_location.pop(theater.location, None)
+
+    def theaters_in(self, location: str) -> list[Theater]:
+        with self.lock:
+            return list(self.theaters_by_location.get(location, {}).values())
+
+    # Shows matching every given filter, in start time order. A location query
+    # merges one bisected schedule per theater there: O(t log n + k) for t theaters.
+    def search(self, movie_id: Optional[str] = None, location: Optional[str] = None,
+               theater_id: Optional[str] = None, start: Optional[datetime.datetime] = None,
+               end: Optional[datetime.datetime] = None) -> list[Show]:
+        with self.lock:
+            if theater_id is not None:
+                theater_ids = [theater_id]
+                if location is not None and theater_id not in self.theaters_by_location.get(location, {}):
+                    return []
+            elif location is not None:
+                theater_ids = list(self.theaters_by_location.get(location, {}))
+            else:
+                schedule = self.all_shows if movie_id is None else self.by_movie.get(movie_id)
+                return schedule.between(start, end) if schedule else []
+            runs = []
+            for theater_id in theater_ids:
+                if movie_id is None:
+                    schedule = self.by_theater.get(theater_id)
+                else:
+                    schedule = self.by_theater_movie.get((theater_id, movie_id))
+                if schedule:
+                    runs.append(schedule.between(start, end))
+        if len(runs) == 1:
+            return runs[0]
+        return list(heapq.merge(*runs, key=lambda show: (show.start_datetime, show.id)))
+
 
 class Booking:
+    # Recovery rebuilds every live booking at once
+    __slots__ = ("id", "user", "show", "seats", "total_price", "status", "timestamp", "expires_at", "lock")
+
     def __init__(self, id: str, user: User, show: Show, seats: list[Seat], total_price: float, status: BookingStatus, timestamp: datetime.datetime):
         self.id = id
         self.user = user
@@ -65,18 +661,96 @@ class Booking:
         self.total_price = total_price
         self.status = status
         self.timestamp = timestamp
+        # A pending booking holds its seats until this moment; None once settled
+        self.expires_at: Optional[datetime.datetime] = None
+        # Guards status changes so a booking is confirmed or cancelled once
+        self.lock = threading.Lock()
+
+# Told about every booking that is confirmed or cancelled, after the change;
+# called on the booking thread, so implementations should hand work off quickly
+class BookingObserver(ABC):
+    @abstractmethod
+    def on_booking_confirmed(self, booking: Booking):
+        pass
+
+    @abstractmethod
+    def on_booking_cancelled(self, booking: Booking):
+        pass
+
+
+# Snowflake-style 64-bit ids. Each node (process) has its own node id, so
+# nodes never hand out the same id; within a node ids strictly increase, and
+# across nodes they sort by creation time to the millisecond. If the clock
+# steps back, or a millisecond runs out of sequence numbers, the generator
+# keeps counting from its last millisecond instead of waiting.
+class SnowflakeIdGenerator:
+    def __init__(self, node_id: int = 0):
+        if not 0 <= node_id < 1 << NODE_BITS:
+            raise ValueError(f"Node id must be between 0 and {(1 << NODE_BITS) - 1}")
+        self.node_id = node_id
+        self.last_ms = -1
+        self.sequence = 0
+        self.lock = threading.Lock()
+
+    def next_id(self) -> int:
+        with self.lock:
+            now_ms = time.time_ns() // 1_000_000 - ID_EPOCH_MS
+            if now_ms > self.last_ms:
+                self.last_ms, self.sequence = now_ms, 0
+            else:
+                self.sequence += 1
+                if self.sequence >> SEQUENCE_BITS:
+                    self.last_ms, self.sequence = self.last_ms + 1, 0
+            return (self.last_ms << (NODE_BITS + SEQUENCE_BITS)) | (self.node_id << SEQUENCE_BITS) | self.sequence
+
+    @staticmethod
+    def node_of(id: int) -> int:
+        return id >> SEQUENCE_BITS & ((1 << NODE_BITS) - 1)
+
+    @staticmethod
+    def created_at(id: int) -> datetime.datetime:
+        milliseconds = (id >> (NODE_BITS + SEQUENCE_BITS)) + ID_EPOCH_MS
+        return datetime.datetime.fromtimestamp(milliseconds / 1000, datetime.timezone.utc)
+
+
+# Booking ids are "BKG" and the Snowflake id as 16 hex digits, so they sort
+# as strings in creation order
+def booking_id_of(id: int) -> str:
+    return f"BKG{id:016X}"
+
+def parse_booking_id(booking_id: str) -> Optional[int]:
+    if len(booking_id) != 19 or not booking_id.startswith("BKG"):
+        return None
+    try:
+        return int(booking_id[3:], 16)
+    except ValueError:
+        return None
+
 
 class MovieTicketBookingSystem:
     _instance = None
+    _lock = threading.Lock()
 
     def __new__(cls):
-        if not cls._instance:
-            cls._instance = super().__new__(cls)
-            cls._instance.movies = []
-            cls._instance.theaters = []
-            cls._instance.shows = {}
-            cls._instance.bookings = {}
-            cls._instance.booking_counter = itertools.count(1)
+        with cls._lock:
+            if not cls._instance:
+                cls._instance = super().__new__(cls)
+                cls._instance.movies = []
+                cls._instance.theaters = []
+                cls._instance.shows = {}
+                cls._instance.show_index = ShowIndex()
+                cls._instance.bookings = {}
+                cls._instance.booking_ids = SnowflakeIdGenerator()
+                # Source of booking timestamps; tests and benchmarks swap in a virtual clock
+                cls._instance.clock = datetime.datetime.now
+                cls._instance.hold_ttl = DEFAULT_HOLD_TTL
+                # Min-heap of (expires_at, booking_id) for pending bookings. Confirmed
+                # or cancelled bookings are not removed, only skipped when they come due
+                cls._instance.holds = []
+                cls._instance.holds_lock = threading.Lock()
+                cls._instance.expired_holds = 0
+                cls._instance.booking_observers = []
+                cls._instance.journal = None
         return cls._instance
 
 
@@ -86,14 +760,68 @@ class MovieTicketBookingSystem:
             MovieTicketBookingSystem()
         return MovieTicketBookingSystem._instance
 
+    # Drops the singleton so tests and benchmarks start from an empty system
+    @classmethod
+    def reset_instance(cls):
+        with cls._lock:
+            cls._instance = None
+
+    def set_clock(self, clock: Callable[[], datetime.datetime]) -> None:
+        self.clock = clock
+
+    # Workers that book into a shared ledger each need their own node id
+    def set_node_id(self, node_id: int) -> None:
+        self.booking_ids = SnowflakeIdGenerator(node_id)
+
+    # The journal is told about every booking, confirmation, cancellation and expiry
+    def attach_journal(self, journal) -> None:
+        self.journal = journal
+
+    def add_booking_observer(self, observer: BookingObserver) -> None:
+        # Copy on write, so bookings can iterate without a lock
+        self.booking_observers = self.booking_observers + [observer]
+
+    def remove_booking_observer(self, observer: BookingObserver) -> None:
+        self.booking_observers = [existing for existing in self.booking_observers if existing is not observer]
+
+    def set_hold_ttl(self, hold_ttl: datetime.timedelta) -> None:
+        self.hold_ttl = hold_ttl
+
     def add_movie(self, movie: Movie):
         self.movies.append(movie)
 
     def add_theater(self, theater: Theater):
         self.theaters.append(theater)
+        self.show_index.add_theater(theater)
+        for show in theater.shows:
+            if show.id not in self.shows:
+                self.shows[show.id] = show
+                self.show_index.add_show(show)
 
     def add_show(self, show: Show):
+        if show.id in self.shows:
+            self.remove_show(show.id)
         self.shows[show.id] = show
+        show.theater.shows.append(show)
+        self.show_index.add_show(show)
+
+    def remove_show(self, show_id: str) -> Optional[Show]:
+        show = self.shows.pop(show_id, None)
+        if show:
+            self.show_index.remove_show(show)
+            if show in show.theater.shows:
+                show.theater.shows.remove(show)
+        return show
+
+    # Drops the theater together with its shows
+    def remove_theater(self, theater_id: str) -> Optional[Theater]:
+        theater = next((theater for theater in self.theaters if theater.id == theater_id), None)
+        if theater:
+            for show in list(theater.shows):
+                self.remove_show(show.id)
+            self.theaters.remove(theater)
+            self.show_index.remove_theater(theater)
+        return theater
 
     def get_movies(self) -> list[Movie]:
         return self.movies
@@ -107,54 +835,179 @@ class MovieTicketBookingSystem:
     def get_show(self, show_id: str) -> Show:
         return self.shows.get(show_id)
 
+    def get_theaters_in(self, location: str) -> list[Theater]:
+        return self.show_index.theaters_in(location)
+
+    def search_shows(self, movie_id: Optional[str] = None, location: Optional[str] = None,
+                     theater_id: Optional[str] = None, start: Optional[datetime.datetime] = None,
+                     end: Optional[datetime.datetime] = None) -> list[Show]:
+        return self.show_index.search(movie_id, location, theater_id, start, end)
+
+    # The booking starts PENDING and holds its seats for hold_ttl; unless it is
+    # confirmed in time, the seats go back on sale
     def book_tickets(self, user: User, show: Show, selected_seats: list[Seat]) -> Booking:
-        if self._are_seats_available(show, selected_seats):
-            self._mark_seats_as_booked(show, selected_seats)
-            total_price = self._calculate_total_price(selected_seats)
-            booking_id = self._generate_booking_id()
-            booking = Booking(booking_id, user, show, selected_seats, total_price, BookingStatus.PENDING, datetime.datetime.now())
-            self.bookings[booking_id] = booking
-            return booking
+        now = self.clock()
+        # Expired holds give their seats back before anyone is turned away
+        self.expire_holds(now)
+        indexes = show.seats.indexes_of(selected_seats)
+        if indexes is not None and self._mark_seats_as_booked(show, indexes):
+            return self._create_booking(user, show, indexes, now)
+
+    # Records a PENDING booking for seats already marked booked in the show
+    def _create_booking(self, user: User, show: Show, indexes: list[int], now: datetime.datetime) -> Booking:
+        total_price = show.seats.total_price(indexes)
+        booking_id = self._generate_booking_id()
+        booking = Booking(booking_id, user, show, [SeatView(show.seats, index) for index in indexes],
+                          total_price, BookingStatus.PENDING, now)
+        booking.expires_at = now + self.hold_ttl
+        self.bookings[booking_id] = booking
+        with self.holds_lock:
+            heapq.heappush(self.holds, (booking.expires_at, booking_id))
+        if self.journal:
+            self.journal.record_book(booking)
+        return booking
+
+    def find_best_seats(self, show: Show, count: int, seat_type: Optional[SeatType] = None,
+                        preferred_row: Optional[int] = None) -> Optional[list[Seat]]:
+        self.expire_holds()
+        indexes = show.seats.find_best_seats(count, seat_type, preferred_row)
+        if indexes is None:
+            return None
+        return [SeatView(show.seats, index) for index in indexes]
+
+    def book_best_seats(self, user: User, show: Show, count: int, seat_type: Optional[SeatType] = None,
+                        preferred_row: Optional[int] = None) -> Optional[Booking]:
+        now = self.clock()
+        self.expire_holds(now)
+        indexes = show.seats.book_best_seats(count, seat_type, preferred_row)
+        if indexes is not None:
+            return self._create_booking(user, show, indexes, now)
 
     def _are_seats_available(self, show: Show, selected_seats: list[Seat]) -> bool:
-        for seat in selected_seats:
-            show_seat = show.seats.get(seat.id)
-            if show_seat is None or show_seat.status != SeatStatus.AVAILABLE:
-                return False
-        return True
+        indexes = show.seats.indexes_of(selected_seats)
+        return indexes is not None and show.seats.are_available(indexes)
+
+    def _mark_seats_as_booked(self, show: Show, indexes: list[int]) -> bool:
+        return show.seats.book(indexes)
 
-    def _mark_seats_as_booked(self, show, selected_seats):
-        for seat in selected_seats:
-            show_seat = show.seats.get(seat.id)
-            show_seat.status = SeatStatus.BOOKED
-     
     def _calculate_total_price(self, selected_seats: list[Seat]) -> float:
         return sum(seat.price for seat in selected_seats)
 
-    def _generate_booking_id(self):
-        booking_number = next(self.booking_counter)
-        timestamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
-        return f"BKG{timestamp}{booking_number:06d}"
+    def _generate_booking_id(self) -> str:
+        return booking_id_of(self.booking_ids.next_id())
 
     def confirm_booking(self, booking_id: str) -> bool:
         booking = self.bookings.get(booking_id)
-        if booking and booking.status == BookingStatus.PENDING:
-            booking.status = BookingStatus.CONFIRMED
-            # Process payment and send notification
-            # ...
+        if not booking:
+            return False
+        with booking.lock:
+            if booking.status != BookingStatus.PENDING:
+                return False
+            late = booking.expires_at <= self.clock()
+            if late:
+                # Too late, even if the expiry has not run yet
+                sequence = self._expire(booking)
+            else:
+                booking.status = BookingStatus.CONFIRMED
+                booking.expires_at = None
+        if late:
+            self._wait_for_journal(sequence)
+            return False
+        if self.journal:
+            self.journal.record_confirm(booking)
+        # Payment and notification happen off this thread, e.g. in a BookingPipeline
+        for observer in self.booking_observers:
+            observer.on_booking_confirmed(booking)
+        return True
 
     def cancel_booking(self, booking_id: str) -> bool:
         booking = self.bookings.get(booking_id)
-        if booking and booking.status == BookingStatus.PENDING:
+        if not booking:
+            return False
+        with booking.lock:
+            if booking.status != BookingStatus.PENDING:
+                return False
+            booking.status = BookingStatus.CANCELLED
+            booking.expires_at = None
+        self._mark_seats_as_available(booking.show, booking.seats)
+        if self.journal:
+            self.journal.record_cancel(booking)
+        # Refund and cancellation notice happen off this thread, e.g. in a BookingPipeline
+        for observer in self.booking_observers:
+            observer.on_booking_cancelled(booking)
+        return True
+
+    # Cancels a confirmed booking whose payment never went through and puts
+    # its seats back on sale. Observers are not told: there is nothing to refund.
+    def revoke_booking(self, booking_id: str) -> bool:
+        booking = self.bookings.get(booking_id)
+        if not booking:
+            return False
+        with booking.lock:
+            if booking.status != BookingStatus.CONFIRMED:
+                return False
             booking.status = BookingStatus.CANCELLED
-            self._mark_seats_as_available(booking.show, booking.seats)
-            # Process refund and send cancellation notification
-            # ....
+        self._mark_seats_as_available(booking.show, booking.seats)
+        if self.journal:
+            self.journal.record_cancel(booking)
+        return True
 
     def _mark_seats_as_available(self, show: Show, selected_seats: list[Seat]):
-        for seat in selected_seats:
-            show_seat = show.get(seat.id)
-            show_seat.status = SeatStatus.AVAILABLE
+        show.seats.release(show.seats.indexes_of(selected_seats))
+
+    # Called with booking.lock held and the booking still PENDING. Returns
+    # the journal sequence of the expiry record, to wait for once the lock is
+    # released.
+    def _expire(self, booking: Booking) -> Optional[int]:
+        booking.status = BookingStatus.EXPIRED
+        booking.expires_at = None
+        self._mark_seats_as_available(booking.show, booking.seats)
+        self.expired_holds += 1
+        if self.journal:
+            return self.journal.record_expire(booking)
+        return None
+
+    def _wait_for_journal(self, sequence: Optional[int]) -> None:
+        if self.journal and sequence is not None:
+            self.journal.wait_for(sequence)
+
+    # Gives the seats of every pending booking whose hold has run out back to
+    # the show. O(log n) per hold; a no-op unless the earliest hold is due.
+    def expire_holds(self, now: Optional[datetime.datetime] = None) -> int:
+        now = now or self.clock()
+        holds = self.holds
+        # Unlocked peek: another sweep may empty the heap under us, which
+        # also means nothing is due
+        try:
+            if holds[0][0] > now:
+                return 0
+        except IndexError:
+            return 0
+        due = []
+        with self.holds_lock:
+            while holds and holds[0][0] <= now:
+                due.append(heapq.heappop(holds)[1])
+        expired = 0
+        sequence = None
+        for booking_id in due:
+            booking = self.bookings[booking_id]
+            with booking.lock:
+                if booking.status == BookingStatus.PENDING:
+                    sequence = self._expire(booking)
+                    expired += 1
+        # One commit wait for the whole sweep, with no booking lock held
+        self._wait_for_journal(sequence)
+        return expired
+
+    def start_hold_expiry_thread(self, interval: float = 1.0) -> threading.Event:
+        stop = threading.Event()
+
+        def run():
+            while not stop.wait(interval):
+                self.expire_holds()
+
+        threading.Thread(target=run, name="hold-expiry", daemon=True).start()
+        return stop
 
 
 class MovieTicketBookingDemo:
@@ -184,6 +1037,15 @@ class MovieTicketBookingDemo:
         booking_system.add_show(avengers_show)
         booking_system.add_show(joker_show)
     
+        evening = today.replace(hour=18, minute=0, second=0, microsecond=0)
+        late_show = Show("S3", movie1, inox, evening + datetime.timedelta(hours=3),
+                         evening + datetime.timedelta(hours=6), create_seats(8, 8))
+        booking_system.add_show(late_show)
+        shows = booking_system.search_shows(movie_id="M1", location="Uptown Mall", start=evening)
+        print(f"{movie1.title} at Uptown Mall after 6pm: "
+              f"{[(show.id, show.start_datetime.strftime('%H:%M')) for show in shows]}")
+        print(f"Shows at {pvr.name}: {[show.id for show in pvr.shows]}")
+
         # Book Tickets
         user = User("U1", "John Doe", "john@example.com")
         selected_seats = [avengers_show.seats["1-5"], avengers_show.seats["1-6"]]
@@ -193,17 +1055,38 @@ class MovieTicketBookingDemo:
             booking_system.confirm_booking(booking.id)
         else:
             print("Booking Failed. Seats not available")
+        print(f"Seats left for {movie1.title}: {avengers_show.seats.available_count()} "
+              f"({avengers_show.seats.available_count(SeatType.PREMIUM)} premium)")
+
+        # Seat 1-6 is already taken, so the whole request fails
+        booking = booking_system.book_tickets(user, avengers_show, [avengers_show.seats["1-6"], avengers_show.seats["1-7"]])
+        print(f"Booking 1-6 and 1-7: {'successful' if booking else 'failed, seat 1-7 is still free'}: "
+              f"{avengers_show.seats['1-7'].status.value}")
+
+        # An unpaid booking holds its seats only until the hold runs out
+        booking = booking_system.book_tickets(user, joker_show, [joker_show.seats["2-3"], joker_show.seats["2-4"]])
+        print(f"Holding 2-3 and 2-4 for {movie2.title} until {booking.expires_at:%H:%M}")
+        booking_system.set_clock(lambda: today + DEFAULT_HOLD_TTL + datetime.timedelta(minutes=1))
+        print(f"Holds expired: {booking_system.expire_holds()}, booking is {booking.status.value}, "
+              f"seat 2-3 is {joker_show.seats['2-3'].status.value}")
+        print(f"Confirming after expiry: {booking_system.confirm_booking(booking.id)}")
+
+        # Let the system pick the seats
+        for count in (4, 4, 3):
+            booking = booking_system.book_best_seats(user, avengers_show, count, SeatType.PREMIUM)
+            print(f"Best {count} premium seats for {movie1.title}: {[seat.id for seat in booking.seats]}")
+
+# Three normal rows at the front and premium behind; one shared layout per size
+@functools.lru_cache(maxsize=None)
+def standard_layout(rows: int, columns: int) -> SeatLayout:
+    layout = SeatLayout(rows, columns)
+    layout.add_rows(1, min(3, rows), SeatType.NORMAL, 200)
+    if rows > 3:
+        layout.add_rows(4, rows, SeatType.PREMIUM, 300)
+    return layout
 
-def create_seats(rows: int, columns: int):
-    seats = {}
-    for row in range(1, rows + 1):
-        for col in range(1, columns + 1):
-            seat_id = f"{row}-{col}"
-            seat_type = SeatType.NORMAL if row <= 3 else SeatType.PREMIUM
-            price = 200 if seat_type == SeatType.NORMAL else 300
-            seat = Seat(seat_id, row, col, seat_type, price, SeatStatus.AVAILABLE)
-            seats[seat_id] = seat
-    return seats
+def create_seats(rows: int, columns: int) -> SeatMap:
+    return SeatMap(standard_layout(rows, columns))
     
 
 if __name__ == "__main__":
@@ -0,0 +1,486 @@
+# Event journal, snapshots and recovery for the movie ticket booking system.
+#
+# Every book (a seat hold) / confirm / cancel / expire is appended to a
+# segment file as
+#   [payload length: uint32][crc32 of payload: uint32][payload]
+# Appends are buffered and a background thread writes and fsyncs them in
+# groups, so one fsync covers many bookings. Periodic snapshots hold each
+# show's seat bitmap and the live (pending or confirmed) bookings; recovery
+# loads the latest snapshot and replays only the segments written after it.
+#
+# Movies, theaters and shows are configuration, not journaled state: recovery
+# expects a system with the same shows added. Cancelled and expired bookings
+# are history and are not part of the snapshot.
+#
+# Run from the repository root:
+#   python -m low_level_design.movie_ticket_booking.journal
+
+import datetime
+import gc
+import heapq
+import json
+import os
+import shutil
+import struct
+import threading
+import time
+import zlib
+from typing import Iterator, NamedTuple, Optional
+
+from low_level_design.movie_ticket_booking.implementation import (
+    Booking,
+    BookingStatus,
+    Movie,
+    MovieTicketBookingSystem,
+    SeatMap,
+    SeatView,
+    Show,
+    Theater,
+    User,
+    create_seats,
+)
+
+
+RECORD_HEADER = struct.Struct("<II")
+MAX_RECORD_SIZE = 1 << 16
+FIELD_SEPARATOR = "\x1f"
+
+BOOK = "B"
+CONFIRM = "C"
+CANCEL = "X"
+EXPIRE = "E"
+
+SNAPSHOT_FILE = "snapshot.json"
+
+
+def segment_path(directory: str, segment_index: int) -> str:
+    return os.path.join(directory, f"segment-{segment_index:08d}.log")
+
+
+def list_segments(directory: str) -> list[int]:
+    return sorted(
+        int(name[len("segment-"):-len(".log")])
+        for name in os.listdir(directory)
+        if name.startswith("segment-") and name.endswith(".log")
+    )
+
+
+def encode_record(payload: bytes) -> bytes:
+    return RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+class ReadStats:
+    def __init__(self):
+        self.records = 0
+        self.corrupt_records = 0
+        self.skipped_bytes = 0
+        self.torn_tail = False
+
+
+# Yields valid payloads. A bad checksum or an impossible length makes the
+# reader resynchronise byte by byte; a record cut off at the end of the file
+# (a torn write from a crash) ends the segment.
+def read_records(path: str, stats: Optional[ReadStats] = None) -> Iterator[bytes]:
+    stats = stats or ReadStats()
+    with open(path, "rb") as file:
+        data = file.read()
+    offset = 0
+    header_size = RECORD_HEADER.size
+    in_corrupt_run = False
+    while offset + header_size <= len(data):
+        length, checksum = RECORD_HEADER.unpack_from(data, offset)
+        end = offset + header_size + length
+        if length <= MAX_RECORD_SIZE and end > len(data):
+            stats.torn_tail = True
+            stats.skipped_bytes += len(data) - offset
+            return
+        if length <= MAX_RECORD_SIZE:
+            payload = data[offset + header_size:end]
+            if zlib.crc32(payload) == checksum:
+                in_corrupt_run = False
+                stats.records += 1
+                yield payload
+                offset = end
+                continue
+        if not in_corrupt_run:
+            stats.corrupt_records += 1
+            in_corrupt_run = True
+        stats.skipped_bytes += 1
+        offset += 1
+    if offset < len(data):
+        stats.torn_tail = True
+        stats.skipped_bytes += len(data) - offset
+
+
+def _isoformat(moment: Optional[datetime.datetime]) -> Optional[str]:
+    return moment.isoformat() if moment else None
+
+
+def _seat_indexes(booking: Booking) -> list[int]:
+    return [seat.index for seat in booking.seats]
+
+
+# [booking id, show id, user id, user name, user email, seat indexes, total price,
+#  status, timestamp, hold expiry], the same in snapshots and in replay
+def snapshot_booking(booking: Booking) -> list:
+    user = booking.user
+    return [booking.id, booking.show.id, user.id, user.name, user.email, _seat_indexes(booking),
+            booking.total_price, booking.status.value, booking.timestamp.isoformat(),
+            _isoformat(booking.expires_at)]
+
+
+class BookingJournal:
+    def __init__(self, directory: str, batch_size: int = 512, flush_interval: float = 0.005,
+                 fsync: bool = True, snapshot_every: int = 50000, wait_for_commit: bool = False):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        # When set, booking calls return only once their record is on disk
+        self.wait_for_commit = wait_for_commit
+        self.snapshot_every = snapshot_every
+        self.booking_system: Optional[MovieTicketBookingSystem] = None
+
+        # Never append after a possibly torn tail: always start a fresh segment
+        segments = list_segments(directory)
+        self.segment_index = (segments[-1] + 1) if segments else 0
+        self.file = open(segment_path(directory, self.segment_index), "ab")
+
+        self.condition = threading.Condition()
+        self.buffer: list[bytes] = []
+        self.appended = 0
+        self.flushed = 0
+        self.events_since_snapshot = 0
+        self.snapshots_written = 0
+        # One snapshot at a time, whether taken by hand or by the flusher
+        self.snapshot_lock = threading.Lock()
+        self.snapshot_thread: Optional[threading.Thread] = None
+        self.closed = False
+        self.flusher = threading.Thread(target=self._run_flusher, daemon=True)
+        self.flusher.start()
+
+    def attach(self, booking_system: MovieTicketBookingSystem) -> None:
+        self.booking_system = booking_system
+        booking_system.attach_journal(self)
+
+    def record_book(self, booking: Booking) -> None:
+        user = booking.user
+        self._append(
+            BOOK, booking.id, booking.show.id, user.id, user.name, user.email,
+            ",".join(map(str, _seat_indexes(booking))), repr(booking.total_price),
+            booking.timestamp.isoformat(), booking.expires_at.isoformat(),
+        )
+
+    def record_confirm(self, booking: Booking) -> None:
+        self._append(CONFIRM, booking.id, booking.show.id)
+
+    def record_cancel(self, booking: Booking) -> None:
+        self._append(CANCEL, booking.id, booking.show.id)
+
+    # Called with booking locks held, so it never waits for the commit; the
+    # caller passes the returned sequence to wait_for once the locks are released
+    def record_expire(self, booking: Booking) -> int:
+        return self._append(EXPIRE, booking.id, booking.show.id, wait=False)
+
+    # Waiting callers share one group commit instead of paying an fsync each
+    def _append(self, *fields: str, wait: bool = True) -> int:
+        record = encode_record(FIELD_SEPARATOR.join(fields).encode("utf-8"))
+        with self.condition:
+            self.buffer.append(record)
+            self.appended += 1
+            sequence = self.appended
+            if len(self.buffer) >= self.batch_size:
+                self.condition.notify_all()
+            if wait:
+                self._wait_for(sequence)
+        return sequence
+
+    # With wait_for_commit, blocks until record `sequence` and all before it are on disk
+    def wait_for(self, sequence: int) -> None:
+        with self.condition:
+            self._wait_for(sequence)
+
+    def _wait_for(self, sequence: int) -> None:
+        if self.wait_for_commit:
+            while self.flushed < sequence and not self.closed:
+                self.condition.wait()
+
+    def flush(self) -> None:
+        with self.condition:
+            self._write_buffer()
+
+    def _write_buffer(self) -> None:
+        if not self.buffer:
+            return
+        self.file.write(b"".join(self.buffer))
+        self.file.flush()
+        if self.fsync:
+            os.fsync(self.file.fileno())
+        self.events_since_snapshot += len(self.buffer)
+        self.flushed = self.appended
+        self.buffer = []
+        self.condition.notify_all()
+
+    def _run_flusher(self) -> None:
+        while True:
+            with self.condition:
+                if self.closed:
+                    return
+                self.condition.wait(self.flush_interval)
+                self._write_buffer()
+                if (self.booking_system and self.events_since_snapshot >= self.snapshot_every
+                        and not (self.snapshot_thread and self.snapshot_thread.is_alive())):
+                    self.events_since_snapshot = 0
+                    # Off the flusher, so group commits go on while the snapshot is written
+                    self.snapshot_thread = threading.Thread(target=self.snapshot, daemon=True)
+                    self.snapshot_thread.start()
+
+    # Rotates to a new segment, then writes every show's seat bitmap and the
+    # live bookings and drops the segments the snapshot now covers. Anything
+    # that changes while the snapshot is read also lands in the new segment,
+    # and recovery rebuilds the seats of every show that segment touches.
+    def snapshot(self) -> None:
+        with self.snapshot_lock:
+            self._snapshot()
+
+    def _snapshot(self) -> None:
+        with self.condition:
+            self._write_buffer()
+            self.file.close()
+            self.segment_index += 1
+            self.file = open(segment_path(self.directory, self.segment_index), "ab")
+            next_segment = self.segment_index
+            self.events_since_snapshot = 0
+
+        booking_system = self.booking_system
+        bookings = list(booking_system.bookings.values())
+        state = {
+            "next_segment": next_segment,
+            "created_at": time.time(),
+            # Seat bitmaps as hex, one per show with any seat taken
+            "shows": {show.id: format(show.seats.booked, "x")
+                      for show in list(booking_system.shows.values()) if show.seats.booked},
+            "bookings": [snapshot_booking(booking) for booking in bookings
+                         if booking.status in (BookingStatus.PENDING, BookingStatus.CONFIRMED)],
+        }
+        temp_path = os.path.join(self.directory, SNAPSHOT_FILE + ".tmp")
+        with open(temp_path, "w") as file:
+            # dumps, unlike dump, runs in the C encoder
+            file.write(json.dumps(state, separators=(",", ":")))
+            file.flush()
+            if self.fsync:
+                os.fsync(file.fileno())
+        os.replace(temp_path, os.path.join(self.directory, SNAPSHOT_FILE))
+        self.snapshots_written += 1
+
+        for segment_index in list_segments(self.directory):
+            if segment_index < next_segment:
+                os.remove(segment_path(self.directory, segment_index))
+
+    def close(self) -> None:
+        with self.condition:
+            self._write_buffer()
+            self.closed = True
+            self.condition.notify_all()
+        self.flusher.join()
+        if self.snapshot_thread:
+            self.snapshot_thread.join()
+        self.file.close()
+
+
+class RecoveryStats(NamedTuple):
+    snapshot_bookings: int
+    replayed_events: int
+    corrupt_records: int
+    torn_segments: int
+    live_bookings: int
+    rebuilt_shows: int
+    seconds: float
+
+
+# Folds events into plain per-booking state and only builds Booking objects
+# for bookings still live at the end. Every step is idempotent and depends on
+# nothing but the booking's own events, so events of different bookings may
+# be replayed in any order and an event replayed twice is harmless.
+class _Replayer:
+    def __init__(self):
+        # booking id -> snapshot_booking() row
+        self.live: dict[str, list] = {}
+        self.finished: set[str] = set()
+        # Shows whose seats changed after the snapshot
+        self.touched_shows: set[str] = set()
+
+    def book(self, booking_id: str, show_id: str, *fields) -> None:
+        self.touched_shows.add(show_id)
+        if booking_id not in self.live and booking_id not in self.finished:
+            self.live[booking_id] = [booking_id, show_id, *fields]
+
+    # Confirming leaves the seats as they are
+    def confirm(self, booking_id: str, show_id: str) -> None:
+        state = self.live.get(booking_id)
+        if state:
+            state[7] = BookingStatus.CONFIRMED.value
+            state[9] = None
+
+    # The booking may be missing from the snapshot while its seats are still
+    # in the snapshot's bitmap, so the show is rebuilt either way
+    def finish(self, booking_id: str, show_id: str) -> None:
+        self.touched_shows.add(show_id)
+        self.finished.add(booking_id)
+        self.live.pop(booking_id, None)
+
+    def apply(self, payload: bytes) -> None:
+        kind, *fields = payload.decode("utf-8").split(FIELD_SEPARATOR)
+        if kind == BOOK:
+            booking_id, show_id, user_id, name, email, indexes, total_price, timestamp, expires_at = fields
+            self.book(booking_id, show_id, user_id, name, email, list(map(int, indexes.split(","))),
+                      float(total_price), BookingStatus.PENDING.value, timestamp, expires_at)
+        elif kind == CONFIRM:
+            self.confirm(*fields)
+        elif kind in (CANCEL, EXPIRE):
+            self.finish(*fields)
+
+    def materialize(self, booking_system: MovieTicketBookingSystem, show_bitmaps: dict[str, str]) -> int:
+        shows = booking_system.shows
+        bookings = booking_system.bookings
+        touched_shows = self.touched_shows
+        statuses = {status.value: status for status in BookingStatus}
+        from_isoformat = datetime.datetime.fromisoformat
+        mask_of = SeatMap.mask_of
+        users: dict[str, User] = {}
+        masks: dict[str, int] = {}
+        holds = []
+        for state in self.live.values():
+            booking_id, show_id, user_id, name, email, indexes, total_price, status, timestamp, expires_at = state
+            show = shows.get(show_id)
+            if not show:
+                continue
+            user = users.get(user_id)
+            if not user:
+                user = users[user_id] = User(user_id, name, email)
+            seat_map = show.seats
+            booking = Booking(booking_id, user, show, [SeatView(seat_map, index) for index in indexes],
+                              total_price, statuses[status], from_isoformat(timestamp))
+            bookings[booking_id] = booking
+            if expires_at is not None:
+                booking.expires_at = from_isoformat(expires_at)
+                holds.append((booking.expires_at, booking_id))
+            if show_id in touched_shows:
+                masks[show_id] = masks.get(show_id, 0) | mask_of(indexes)
+
+        # Untouched shows take their bitmap straight from the snapshot; the
+        # others are rebuilt from the live bookings that hold their seats
+        for show_id, bitmap in show_bitmaps.items():
+            if show_id in shows and show_id not in self.touched_shows:
+                shows[show_id].seats.load_booked(int(bitmap, 16))
+        rebuilt = 0
+        for show_id in self.touched_shows:
+            if show_id in shows:
+                shows[show_id].seats.load_booked(masks.get(show_id, 0))
+                rebuilt += 1
+
+        with booking_system.holds_lock:
+            booking_system.holds.extend(holds)
+            heapq.heapify(booking_system.holds)
+        return rebuilt
+
+
+# Rebuilds the bookings and seat state of a system with the same shows added
+def recover_booking_system(booking_system: MovieTicketBookingSystem, directory: str) -> RecoveryStats:
+    start = time.perf_counter()
+    # Everything built here lives on; collections during the load would only
+    # walk the growing heap again and again
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _recover(booking_system, directory, start)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def _recover(booking_system: MovieTicketBookingSystem, directory: str, start: float) -> RecoveryStats:
+    replayer = _Replayer()
+    snapshot_bookings = 0
+    first_segment = 0
+    show_bitmaps: dict[str, str] = {}
+
+    snapshot_file = os.path.join(directory, SNAPSHOT_FILE)
+    if os.path.exists(snapshot_file):
+        with open(snapshot_file) as file:
+            state = json.load(file)
+        first_segment = state["next_segment"]
+        show_bitmaps = state["shows"]
+        for booking_state in state["bookings"]:
+            replayer.live[booking_state[0]] = booking_state
+        snapshot_bookings = len(state["bookings"])
+
+    read_stats = ReadStats()
+    torn_segments = 0
+    for segment_index in list_segments(directory):
+        if segment_index < first_segment:
+            continue
+        segment_stats = ReadStats()
+        for payload in read_records(segment_path(directory, segment_index), segment_stats):
+            replayer.apply(payload)
+        read_stats.records += segment_stats.records
+        read_stats.corrupt_records += segment_stats.corrupt_records
+        torn_segments += segment_stats.torn_tail
+    rebuilt_shows = replayer.materialize(booking_system, show_bitmaps)
+
+    return RecoveryStats(
+        snapshot_bookings=snapshot_bookings,
+        replayed_events=read_stats.records,
+        corrupt_records=read_stats.corrupt_records,
+        torn_segments=torn_segments,
+        live_bookings=len(replayer.live),
+        rebuilt_shows=rebuilt_shows,
+        seconds=time.perf_counter() - start,
+    )
+
+
+def _setup_shows(booking_system: MovieTicketBookingSystem, start: datetime.datetime) -> list[Show]:
+    movie = Movie("M1", "Interstellar", "", 169)
+    theater = Theater("T1", "PVR Cinemas", "Downtown", [])
+    booking_system.add_movie(movie)
+    booking_system.add_theater(theater)
+    shows = [Show(f"S{number}", movie, theater, start + datetime.timedelta(hours=3 * number),
+                  start + datetime.timedelta(hours=3 * number + 3), create_seats(10, 10)) for number in range(2)]
+    for show in shows:
+        booking_system.add_show(show)
+    return shows
+
+
+def run_journal_demo(directory: str = "booking_journal"):
+    shutil.rmtree(directory, ignore_errors=True)
+    evening = datetime.datetime.now().replace(hour=18, minute=0, second=0, microsecond=0)
+
+    MovieTicketBookingSystem.reset_instance()
+    booking_system = MovieTicketBookingSystem.get_instance()
+    shows = _setup_shows(booking_system, evening)
+    journal = BookingJournal(directory)
+    journal.attach(booking_system)
+    users = [User(f"U{number}", f"User {number}", f"user{number}@example.com") for number in range(4)]
+    bookings = [booking_system.book_best_seats(user, shows[number % 2], 2) for number, user in enumerate(users)]
+    booking_system.confirm_booking(bookings[0].id)
+    booking_system.cancel_booking(bookings[1].id)
+    journal.snapshot()
+    booking_system.confirm_booking(bookings[2].id)
+    journal.close()
+    before = {show.id: show.seats.available_count() for show in shows}
+    print("Before restart:", before, {booking.id: booking.status.value for booking in bookings})
+
+    # Simulate a process restart: same shows, bookings and seats come from the journal
+    MovieTicketBookingSystem.reset_instance()
+    restarted_system = MovieTicketBookingSystem.get_instance()
+    shows = _setup_shows(restarted_system, evening)
+    stats = recover_booking_system(restarted_system, directory)
+    print("After recovery: ", {show.id: show.seats.available_count() for show in shows},
+          {booking_id: booking.status.value for booking_id, booking in restarted_system.bookings.items()})
+    print(stats)
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    run_journal_demo()
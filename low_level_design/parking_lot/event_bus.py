@@ -0,0 +1,171 @@
+# Change-event bus between the floors and their displays / dashboards.
+#
+# Assign and release publish a small SpotEvent. Publishing is a deque append
+# on the gate thread; a delivery thread drains the queue, coalesces every
+# burst within the window into one event per (floor, spot type) with the
+# deltas summed and the latest counts, and hands it to the observers
+# subscribed to that floor, that spot type, or everything.
+#
+# Run from the repository root:
+#   python -m low_level_design.parking_lot.event_bus
+
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+from low_level_design.parking_lot.my_parking_lot import (
+    Car,
+    DisplayBoard,
+    Motorcycle,
+    ParkingLot,
+    ParkingLotObserver,
+    ParkingSpotType,
+    PaymentType,
+    SpotEvent,
+    Truck,
+    setup_parking_lot,
+)
+
+
+class ParkingEventBus:
+    def __init__(self, coalesce_window: float = 0.05):
+        self.coalesce_window = coalesce_window
+        self.queue: deque[SpotEvent] = deque()
+        # (floor_id or None, spot_type or None) -> observers; None matches everything
+        self.subscriptions: dict[tuple[Optional[str], Optional[ParkingSpotType]], list[ParkingLotObserver]] = {}
+        self.subscription_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.delivered = threading.Condition()
+        self.published = 0
+        self.delivered_events = 0
+        self.observer_errors = 0
+        self.delivering = False
+        self.closed = False
+        self.thread = threading.Thread(target=self._run, name="parking-event-bus", daemon=True)
+        self.thread.start()
+
+    def attach(self, parking_lot: ParkingLot) -> None:
+        parking_lot.attach_event_bus(self)
+
+    def subscribe(self, observer: ParkingLotObserver, floor_id: Optional[str] = None,
+                  spot_type: Optional[ParkingSpotType] = None) -> None:
+        with self.subscription_lock:
+            # Copy on write, so delivery can iterate without the lock
+            subscriptions = dict(self.subscriptions)
+            key = (floor_id, spot_type)
+            subscriptions[key] = subscriptions.get(key, []) + [observer]
+            self.subscriptions = subscriptions
+
+    def unsubscribe(self, observer: ParkingLotObserver) -> None:
+        with self.subscription_lock:
+            self.subscriptions = {
+                key: [subscriber for subscriber in observers if subscriber is not observer]
+                for key, observers in self.subscriptions.items()
+            }
+
+    # Called by ParkingFloor with the allocator lock held, so it must stay cheap
+    def publish(self, event: SpotEvent) -> None:
+        self.queue.append(event)
+        if not self.wakeup.is_set():
+            self.wakeup.set()
+
+    def _run(self):
+        while not (self.closed and not self.queue):
+            self.wakeup.wait()
+            if not self.closed:
+                # Let the rest of the burst arrive before delivering
+                time.sleep(self.coalesce_window)
+            self.delivering = True
+            self.wakeup.clear()
+            self._deliver(self._drain())
+
+    def _drain(self) -> dict[tuple[str, ParkingSpotType], SpotEvent]:
+        deltas: dict[tuple[str, ParkingSpotType], int] = {}
+        latest: dict[tuple[str, ParkingSpotType], SpotEvent] = {}
+        queue = self.queue
+        drained = 0
+        while queue:
+            event = queue.popleft()
+            drained += 1
+            key = (event.floor_id, event.spot_type)
+            deltas[key] = deltas.get(key, 0) + event.delta
+            latest[key] = event
+        self.published += drained
+        return {key: event._replace(delta=deltas[key]) for key, event in latest.items()}
+
+    def _deliver(self, coalesced: dict[tuple[str, ParkingSpotType], SpotEvent]):
+        subscriptions = self.subscriptions
+        for (floor_id, spot_type), event in coalesced.items():
+            for key in ((floor_id, spot_type), (floor_id, None), (None, spot_type), (None, None)):
+                for observer in subscriptions.get(key, ()):
+                    try:
+                        observer.update(event)
+                    except Exception:
+                        # One broken dashboard must not stop delivery to the rest
+                        self.observer_errors += 1
+        with self.delivered:
+            self.delivered_events += len(coalesced)
+            self.delivering = False
+            self.delivered.notify_all()
+
+    # Blocks until everything published so far has been delivered
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.delivered:
+            while self.queue or self.wakeup.is_set() or self.delivering:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.delivered.wait(remaining if remaining is not None else 0.1)
+        return True
+
+    def close(self) -> None:
+        self.flush()
+        self.closed = True
+        self.wakeup.set()
+        self.thread.join()
+
+
+# Lot-wide free-spot counts kept from coalesced events
+class OccupancyDashboard(ParkingLotObserver):
+    def __init__(self):
+        self.free_counts: dict[tuple[str, ParkingSpotType], int] = {}
+        self.updates = 0
+
+    def update(self, event: SpotEvent):
+        self.free_counts[(event.floor_id, event.spot_type)] = event.free_count
+        self.updates += 1
+
+    def total_free(self, spot_type: ParkingSpotType) -> int:
+        return sum(free for (_, event_spot_type), free in self.free_counts.items() if event_spot_type == spot_type)
+
+
+def run_event_bus_demo():
+    ParkingLot.reset_instance()
+    parking_lot = setup_parking_lot(num_floors=2, spots_per_type=5, num_panels=1)
+    event_bus = ParkingEventBus(coalesce_window=0.05)
+    event_bus.attach(parking_lot)
+
+    dashboard = OccupancyDashboard()
+    event_bus.subscribe(dashboard)
+    floor_displays = {floor.floor_id: DisplayBoard(floor.floor_id) for floor in parking_lot.floors}
+    for floor_id, display in floor_displays.items():
+        event_bus.subscribe(display, floor_id=floor_id)
+
+    vehicles = [Car(f"Car-{i:03d}") for i in range(8)] + [Motorcycle("Moto-001"), Truck("Truck-001")]
+    tickets = [parking_lot.issue_ticket(vehicle, "ENTRY-1") for vehicle in vehicles]
+    for ticket in tickets[:3]:
+        parking_lot.process_exit(ticket.ticket_id, "EXIT-1", PaymentType.UPI)
+    event_bus.flush()
+
+    print(f"\nPublished {event_bus.published} spot events, delivered {event_bus.delivered_events} after coalescing")
+    for display in floor_displays.values():
+        print(display.current_status)
+    print(f"Dashboard: {dashboard.total_free(ParkingSpotType.COMPACT)} compact spots free "
+          f"(lot says {parking_lot.get_occupancy_by_spot_type()['Compact']['free']})")
+    event_bus.close()
+
+
+if __name__ == "__main__":
+    run_event_bus_demo()
@@ -0,0 +1,205 @@
+# Batch fee computation for settlement and reporting.
+#
+# A Tariff prices one stay from integer microsecond timestamps (wall clock,
+# counted from a naive 1970-01-01) and a spot type code, and can price whole
+# arrays of stays at once. With NumPy installed the batch path is one
+# vectorised pass; without it the batch path loops over the scalar one.
+# Both paths perform the same float operations in the same order, and
+# rounding ties that NumPy could resolve differently from round() are
+# recomputed with round(), so batch results are bit-identical to the scalar
+# path. FlatHourlyTariff also matches ParkingTicket.calculate_fee exactly.
+#
+# Run from the repository root:
+#   python -m low_level_design.parking_lot.fee_engine
+
+import datetime
+from abc import ABC, abstractmethod
+from array import array
+from typing import Optional, Sequence
+
+from low_level_design.parking_lot.my_parking_lot import (
+    SPOT_TYPE_CODES,
+    SPOT_TYPES,
+    HourlyCost,
+    ParkingSpotType,
+    ParkingTicket,
+)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+EPOCH = datetime.datetime(1970, 1, 1)
+MICROSECONDS_PER_HOUR = 3600 * 10**6
+MICROSECONDS_PER_DAY = 24 * MICROSECONDS_PER_HOUR
+
+
+def to_microseconds(moment: datetime.datetime) -> int:
+    return (moment - EPOCH) // datetime.timedelta(microseconds=1)
+
+
+def _round_fees(amounts):
+    # np.round rounds amount * 100 to an integer; it only disagrees with
+    # round(amount, 2) when amount * 100 lands next to a .5 tie
+    fees = np.round(amounts, 2)
+    scaled = amounts * 100
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    for index in np.flatnonzero(near_tie):
+        fees[index] = round(float(amounts[index]), 2)
+    return fees
+
+
+class Tariff(ABC):
+    @abstractmethod
+    def fee_from_microseconds(self, entry_us: int, exit_us: int, spot_type_code: int) -> float:
+        pass
+
+    # Vectorised counterpart of fee_from_microseconds, NumPy arrays in and out
+    @abstractmethod
+    def _batch_amounts(self, entry_us, exit_us, spot_type_codes):
+        pass
+
+    def fee(self, entry_time: datetime.datetime, exit_time: datetime.datetime, spot_type: ParkingSpotType) -> float:
+        return self.fee_from_microseconds(to_microseconds(entry_time), to_microseconds(exit_time),
+                                          SPOT_TYPE_CODES[spot_type])
+
+    def fees(self, entry_us: Sequence[int], exit_us: Sequence[int], spot_type_codes: Sequence[int]):
+        if np is None:
+            return array('d', map(self.fee_from_microseconds, entry_us, exit_us, spot_type_codes))
+        entry_us = np.asarray(entry_us, dtype=np.int64)
+        exit_us = np.asarray(exit_us, dtype=np.int64)
+        spot_type_codes = np.asarray(spot_type_codes, dtype=np.intp)
+        return _round_fees(self._batch_amounts(entry_us, exit_us, spot_type_codes))
+
+
+# Same arithmetic as ExitPanel: hours parked times the hourly rate
+class FlatHourlyTariff(Tariff):
+    def __init__(self, hourly_cost: Optional[HourlyCost] = None):
+        hourly_cost = hourly_cost or HourlyCost()
+        self.rates = [hourly_cost.get_cost(spot_type) for spot_type in SPOT_TYPES]
+
+    def fee_from_microseconds(self, entry_us: int, exit_us: int, spot_type_code: int) -> float:
+        hours = (exit_us - entry_us) / 10**6 / 3600
+        return round(hours * self.rates[spot_type_code], 2)
+
+    def _batch_amounts(self, entry_us, exit_us, spot_type_codes):
+        hours = (exit_us - entry_us).astype(np.float64) / 1e6 / 3600
+        return hours * np.asarray(self.rates)[spot_type_codes]
+
+
+# Rate bands by length of stay, e.g. [(1, 20.0), (3, 15.0), (None, 10.0)]:
+# 20/h for the first hour, 15/h up to three hours, 10/h after that
+class TieredTariff(Tariff):
+    def __init__(self, bands: dict[ParkingSpotType, list[tuple[Optional[float], float]]]):
+        self.bands: list[list[tuple[float, float, float]]] = []
+        for spot_type in SPOT_TYPES:
+            lower, spot_bands = 0.0, []
+            for upper, rate in bands[spot_type]:
+                upper = float("inf") if upper is None else float(upper)
+                spot_bands.append((lower, upper - lower, rate))
+                lower = upper
+            self.bands.append(spot_bands)
+
+    def fee_from_microseconds(self, entry_us: int, exit_us: int, spot_type_code: int) -> float:
+        hours = (exit_us - entry_us) / 10**6 / 3600
+        amount = 0.0
+        for lower, width, rate in self.bands[spot_type_code]:
+            amount += min(max(hours - lower, 0.0), width) * rate
+        return round(amount, 2)
+
+    def _batch_amounts(self, entry_us, exit_us, spot_type_codes):
+        hours = (exit_us - entry_us).astype(np.float64) / 1e6 / 3600
+        amounts = np.zeros(len(hours))
+        for spot_type_code, spot_bands in enumerate(self.bands):
+            selected = spot_type_codes == spot_type_code
+            if not selected.any():
+                continue
+            selected_hours, selected_amounts = hours[selected], amounts[selected]
+            for lower, width, rate in spot_bands:
+                selected_amounts += np.minimum(np.maximum(selected_hours - lower, 0.0), width) * rate
+            amounts[selected] = selected_amounts
+        return amounts
+
+
+# Hourly rate depends on the hour of the day; the fee integrates the rate
+# over the stay using a per-day prefix-sum table, so it is O(1) per stay
+class TimeOfDayTariff(Tariff):
+    def __init__(self, hourly_rates: dict[ParkingSpotType, list[float]]):
+        self.rates: list[list[float]] = []
+        self.prefix: list[list[float]] = []
+        for spot_type in SPOT_TYPES:
+            rates = hourly_rates[spot_type]
+            if len(rates) != 24:
+                raise ValueError(f"Expected 24 hourly rates for {spot_type.value}, got {len(rates)}")
+            prefix = [0.0]
+            for rate in rates:
+                prefix.append(prefix[-1] + rate)
+            self.rates.append(list(rates))
+            self.prefix.append(prefix)
+
+    # Cost from the start of the day up to the moment, and the day number
+    def _cost_within_day(self, moment_us: int, spot_type_code: int) -> tuple[int, float]:
+        day, within_day = divmod(moment_us, MICROSECONDS_PER_DAY)
+        hour, within_hour = divmod(within_day, MICROSECONDS_PER_HOUR)
+        cost = self.prefix[spot_type_code][hour] + within_hour / 1e6 / 3600 * self.rates[spot_type_code][hour]
+        return day, cost
+
+    def fee_from_microseconds(self, entry_us: int, exit_us: int, spot_type_code: int) -> float:
+        entry_day, entry_cost = self._cost_within_day(entry_us, spot_type_code)
+        exit_day, exit_cost = self._cost_within_day(exit_us, spot_type_code)
+        day_cost = self.prefix[spot_type_code][24]
+        return round((exit_day - entry_day) * day_cost + (exit_cost - entry_cost), 2)
+
+    def _batch_amounts(self, entry_us, exit_us, spot_type_codes):
+        rates, prefix = np.asarray(self.rates), np.asarray(self.prefix)
+
+        def cost_within_day(moment_us):
+            day, within_day = np.divmod(moment_us, MICROSECONDS_PER_DAY)
+            hour, within_hour = np.divmod(within_day, MICROSECONDS_PER_HOUR)
+            cost = (prefix[spot_type_codes, hour]
+                    + within_hour.astype(np.float64) / 1e6 / 3600 * rates[spot_type_codes, hour])
+            return day, cost
+
+        entry_day, entry_cost = cost_within_day(entry_us)
+        exit_day, exit_cost = cost_within_day(exit_us)
+        day_cost = prefix[spot_type_codes, 24]
+        return (exit_day - entry_day).astype(np.float64) * day_cost + (exit_cost - entry_cost)
+
+
+class BatchFeeEngine:
+    def __init__(self, tariff: Tariff):
+        self.tariff = tariff
+
+    def compute(self, entry_us: Sequence[int], exit_us: Sequence[int], spot_type_codes: Sequence[int]):
+        return self.tariff.fees(entry_us, exit_us, spot_type_codes)
+
+    def compute_for_tickets(self, tickets: list[ParkingTicket], exit_time: Optional[datetime.datetime] = None):
+        exit_time = exit_time or datetime.datetime.now()
+        return self.compute(
+            [to_microseconds(ticket.entry_time) for ticket in tickets],
+            [to_microseconds(ticket.exit_time or exit_time) for ticket in tickets],
+            [SPOT_TYPE_CODES[ticket.spot.get_parking_spot_type()] for ticket in tickets],
+        )
+
+
+if __name__ == "__main__":
+    entry = datetime.datetime(2024, 5, 1, 8, 30)
+    stays = [datetime.timedelta(minutes=minutes) for minutes in (20, 95, 240, 600, 1500)]
+    spot_type = ParkingSpotType.COMPACT
+    day_rates = [10.0] * 7 + [25.0] * 3 + [20.0] * 7 + [25.0] * 3 + [10.0] * 4
+    tariffs = {
+        "flat hourly": FlatHourlyTariff(),
+        "tiered": TieredTariff({spot_type: [(1, 20.0), (3, 15.0), (None, 10.0)] for spot_type in ParkingSpotType}),
+        "time of day": TimeOfDayTariff({spot_type: day_rates for spot_type in ParkingSpotType}),
+    }
+    print(f"NumPy batch path: {'enabled' if np is not None else 'not installed, using scalar loop'}")
+    for name, tariff in tariffs.items():
+        batch = BatchFeeEngine(tariff).compute(
+            [to_microseconds(entry)] * len(stays),
+            [to_microseconds(entry + stay) for stay in stays],
+            [SPOT_TYPE_CODES[spot_type]] * len(stays),
+        )
+        scalar = [tariff.fee(entry, entry + stay, spot_type) for stay in stays]
+        print(f"{name:<12} {list(batch)} identical to scalar: {list(batch) == scalar}")
@@ -0,0 +1,148 @@
+# Asyncio front end for the parking lot.
+# Entry and exit requests are coroutines, so one slow payment gateway call
+# only suspends its own exit instead of blocking the whole lane.
+#
+# Run from the repository root:
+#   python -m low_level_design.parking_lot.gate_service
+
+import asyncio
+import random
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from low_level_design.parking_lot.my_parking_lot import (
+    Car,
+    Motorcycle,
+    ParkingLot,
+    ParkingTicket,
+    PaymentStrategy,
+    PaymentType,
+    Vehicle,
+    setup_parking_lot,
+)
+
+
+# Async variant of PaymentStrategy
+class AsyncPaymentStrategy(ABC):
+    def __init__(self, timeout: float = 5.0):
+        self.timeout = timeout
+
+    @abstractmethod
+    async def process_payment(self, amount: float) -> bool:
+        pass
+
+    # A payment that does not answer within the timeout counts as failed
+    async def process_payment_with_timeout(self, amount: float) -> bool:
+        try:
+            return await asyncio.wait_for(self.process_payment(amount), self.timeout)
+        except asyncio.TimeoutError:
+            return False
+
+
+# Runs an existing blocking strategy in a worker thread
+class SyncPaymentAdapter(AsyncPaymentStrategy):
+    def __init__(self, payment_strategy: PaymentStrategy, timeout: float = 5.0):
+        super().__init__(timeout)
+        self.payment_strategy = payment_strategy
+
+    async def process_payment(self, amount: float) -> bool:
+        return await asyncio.to_thread(self.payment_strategy.process_payment, amount)
+
+
+# Local stand-in for a card / UPI gateway with configurable latency
+class FakePaymentGateway:
+    def __init__(self, latency: float = 0.1, jitter: float = 0.0, failure_rate: float = 0.0,
+                 seed: Optional[int] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def charge(self, amount: float, payment_type: PaymentType) -> bool:
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency + self.random.uniform(0, self.jitter))
+            return self.random.random() >= self.failure_rate
+        finally:
+            self.in_flight -= 1
+
+
+class GatewayPayment(AsyncPaymentStrategy):
+    def __init__(self, gateway: FakePaymentGateway, payment_type: PaymentType, timeout: float = 5.0):
+        super().__init__(timeout)
+        self.gateway = gateway
+        self.payment_type = payment_type
+
+    async def process_payment(self, amount: float) -> bool:
+        return await self.gateway.charge(amount, self.payment_type)
+
+
+class AsyncGateService:
+    def __init__(self, parking_lot: ParkingLot):
+        self.parking_lot = parking_lot
+
+    async def enter(self, vehicle: Vehicle, entry_panel_id: str) -> Optional[ParkingTicket]:
+        # Allocation is in-memory and short, so it runs on the loop directly
+        return self.parking_lot.issue_ticket(vehicle, entry_panel_id)
+
+    async def exit(self, ticket: ParkingTicket, exit_panel_id: str,
+                   payment_strategy: AsyncPaymentStrategy) -> bool:
+        exit_panel = self.parking_lot.get_exit_panel(exit_panel_id)
+        if not exit_panel:
+            return False
+
+        payment = exit_panel.begin_exit(ticket, payment_strategy, self.parking_lot.clock())
+        if not payment:
+            return False
+        try:
+            succeeded = await payment_strategy.process_payment_with_timeout(payment.amount)
+        except BaseException:
+            # Cancelled (or the gateway blew up): a payment left PENDING would
+            # make begin_exit refuse this ticket for good
+            payment.record_result(False)
+            self.parking_lot.record_payment(ticket)
+            raise
+        payment.record_result(succeeded)
+        self.parking_lot.record_payment(ticket)
+        if exit_panel.finish_exit(ticket, payment):
+            self.parking_lot.close_ticket(ticket)
+            return True
+        return False
+
+
+async def run_gate_service_demo():
+    ParkingLot.reset_instance()
+    parking_lot = setup_parking_lot()
+    service = AsyncGateService(parking_lot)
+    gateway = FakePaymentGateway(latency=0.1, seed=7)
+
+    vehicles = [Car("Car-001"), Car("Car-002"), Motorcycle("Moto-001"), Motorcycle("Moto-002")]
+    tickets = await asyncio.gather(*(service.enter(vehicle, "ENTRY-1") for vehicle in vehicles))
+    for ticket in tickets:
+        print(f"✅ Parked {ticket.vehicle.registration_number} at {ticket.spot.spot_id}")
+
+    # A gateway slower than the strategy timeout fails the payment and keeps the spot occupied
+    slow_gateway = FakePaymentGateway(latency=1.0)
+    strategies = [
+        GatewayPayment(gateway, PaymentType.UPI),
+        GatewayPayment(gateway, PaymentType.CREDIT_CARD),
+        GatewayPayment(gateway, PaymentType.DEBIT_CARD),
+        GatewayPayment(slow_gateway, PaymentType.UPI, timeout=0.2),
+    ]
+    results = await asyncio.gather(*(
+        service.exit(ticket, "EXIT-1", strategy) for ticket, strategy in zip(tickets, strategies)
+    ))
+    for ticket, success in zip(tickets, results):
+        status = "✅ Exit processed" if success else "❌ Exit failed"
+        print(f"{status} for vehicle {ticket.vehicle.registration_number} "
+              f"(payment {ticket.payment.payment_status.value})")
+    print(f"Gateway calls in flight at once: {gateway.max_in_flight}")
+
+
+if __name__ == "__main__":
+    asyncio.run(run_gate_service_demo())
@@ -0,0 +1,429 @@
+# Write-ahead journal and crash recovery for the parking lot.
+#
+# Every assign / payment / release is appended to a segment file as
+#   [payload length: uint32][crc32 of payload: uint32][payload]
+# Appends are buffered and a background thread writes and fsyncs them in
+# groups, so one fsync covers many gate operations. Periodic snapshots hold
+# the active tickets; recovery loads the latest snapshot and replays only the
+# segments written after it.
+#
+# Lot topology (floors, spots, panels) is configuration, not journaled state:
+# recovery expects a lot built with the same setup. Closed tickets are not
+# part of the snapshot; they are history and belong to the export pipeline.
+#
+# Run from the repository root:
+#   python -m low_level_design.parking_lot.journal
+
+import datetime
+import json
+import os
+import shutil
+import struct
+import threading
+import time
+import zlib
+from typing import Iterator, NamedTuple, Optional
+
+from low_level_design.parking_lot.my_parking_lot import (
+    Car,
+    ParkingLot,
+    ParkingTicket,
+    Payment,
+    PaymentStatus,
+    PaymentType,
+    VehicleFactory,
+    VehicleType,
+    setup_parking_lot,
+)
+
+
+RECORD_HEADER = struct.Struct("<II")
+MAX_RECORD_SIZE = 1 << 16
+FIELD_SEPARATOR = "\x1f"
+
+ASSIGN = "A"
+PAYMENT = "P"
+RELEASE = "R"
+
+SNAPSHOT_FILE = "snapshot.json"
+
+
+def segment_path(directory: str, segment_index: int) -> str:
+    return os.path.join(directory, f"segment-{segment_index:08d}.log")
+
+
+def list_segments(directory: str) -> list[int]:
+    return sorted(
+        int(name[len("segment-"):-len(".log")])
+        for name in os.listdir(directory)
+        if name.startswith("segment-") and name.endswith(".log")
+    )
+
+
+def encode_record(payload: bytes) -> bytes:
+    return RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+class ReadStats:
+    def __init__(self):
+        self.records = 0
+        self.corrupt_records = 0
+        self.skipped_bytes = 0
+        self.torn_tail = False
+
+
+# Yields valid payloads. A bad checksum or an impossible length makes the
+# reader resynchronise byte by byte; a record cut off at the end of the file
+# (a torn write from a crash) ends the segment.
+def read_records(path: str, stats: Optional[ReadStats] = None) -> Iterator[bytes]:
+    stats = stats or ReadStats()
+    with open(path, "rb") as file:
+        data = file.read()
+    offset = 0
+    header_size = RECORD_HEADER.size
+    in_corrupt_run = False
+    while offset + header_size <= len(data):
+        length, checksum = RECORD_HEADER.unpack_from(data, offset)
+        end = offset + header_size + length
+        if length <= MAX_RECORD_SIZE and end > len(data):
+            stats.torn_tail = True
+            stats.skipped_bytes += len(data) - offset
+            return
+        if length <= MAX_RECORD_SIZE and zlib.crc32(data[offset + header_size:end]) == checksum:
+            in_corrupt_run = False
+            stats.records += 1
+            yield data[offset + header_size:end]
+            offset = end
+            continue
+        if not in_corrupt_run:
+            stats.corrupt_records += 1
+            in_corrupt_run = True
+        stats.skipped_bytes += 1
+        offset += 1
+    if offset < len(data):
+        stats.torn_tail = True
+        stats.skipped_bytes += len(data) - offset
+
+
+class ParkingLotJournal:
+    def __init__(self, directory: str, batch_size: int = 512, flush_interval: float = 0.005,
+                 fsync: bool = True, snapshot_every: int = 100000, wait_for_commit: bool = False):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        # When set, gate operations return only once their record is on disk
+        self.wait_for_commit = wait_for_commit
+        self.snapshot_every = snapshot_every
+        self.parking_lot: Optional[ParkingLot] = None
+
+        # Never append after a possibly torn tail: always start a fresh segment
+        segments = list_segments(directory)
+        self.segment_index = (segments[-1] + 1) if segments else 0
+        self.file = open(segment_path(directory, self.segment_index), "ab")
+
+        self.condition = threading.Condition()
+        self.buffer: list[bytes] = []
+        self.appended = 0
+        self.flushed = 0
+        self.events_since_snapshot = 0
+        self.snapshots_written = 0
+        # One snapshot at a time, whether taken by hand or by the flusher
+        self.snapshot_lock = threading.Lock()
+        self.snapshot_thread: Optional[threading.Thread] = None
+        self.closed = False
+        self.flusher = threading.Thread(target=self._run_flusher, daemon=True)
+        self.flusher.start()
+
+    def attach(self, parking_lot: ParkingLot) -> None:
+        self.parking_lot = parking_lot
+        parking_lot.attach_journal(self)
+
+    def record_assign(self, ticket: ParkingTicket) -> None:
+        self._append(
+            ASSIGN, ticket.ticket_id, ticket.vehicle.registration_number,
+            ticket.vehicle.get_vehicle_type().value, ticket.spot.spot_id, repr(ticket.entry_time.timestamp()),
+        )
+
+    def record_payment(self, ticket: ParkingTicket) -> None:
+        payment = ticket.payment
+        processed_at = repr(payment.processed_at.timestamp()) if payment.processed_at else ""
+        exit_time = repr(ticket.exit_time.timestamp()) if ticket.exit_time else ""
+        self._append(
+            PAYMENT, ticket.ticket_id, payment.payment_id, repr(payment.amount),
+            payment.payment_status.value, processed_at, exit_time,
+        )
+
+    def record_release(self, ticket: ParkingTicket) -> None:
+        self._append(RELEASE, ticket.ticket_id)
+
+    # Waiting callers share one group commit instead of paying an fsync each
+    def _append(self, *fields: str) -> None:
+        record = encode_record(FIELD_SEPARATOR.join(fields).encode("utf-8"))
+        with self.condition:
+            self.buffer.append(record)
+            self.appended += 1
+            sequence = self.appended
+            if len(self.buffer) >= self.batch_size:
+                self.condition.notify_all()
+            if self.wait_for_commit:
+                while self.flushed < sequence and not self.closed:
+                    self.condition.wait()
+
+    def flush(self) -> None:
+        with self.condition:
+            self._write_buffer()
+
+    def _write_buffer(self) -> None:
+        if not self.buffer:
+            return
+        self.file.write(b"".join(self.buffer))
+        self.file.flush()
+        if self.fsync:
+            os.fsync(self.file.fileno())
+        self.events_since_snapshot += len(self.buffer)
+        self.flushed = self.appended
+        self.buffer = []
+        self.condition.notify_all()
+
+    def _run_flusher(self) -> None:
+        while True:
+            with self.condition:
+                if self.closed:
+                    return
+                self.condition.wait(self.flush_interval)
+                self._write_buffer()
+                if (self.parking_lot and self.events_since_snapshot >= self.snapshot_every
+                        and not (self.snapshot_thread and self.snapshot_thread.is_alive())):
+                    self.events_since_snapshot = 0
+                    # Off the flusher, so group commits go on while the snapshot is written
+                    self.snapshot_thread = threading.Thread(target=self.snapshot, daemon=True)
+                    self.snapshot_thread.start()
+
+    # Rotates to a new segment, writes the active tickets and drops the
+    # segments the snapshot now covers. Replay is idempotent, so operations
+    # racing with the snapshot are safe to see twice.
+    def snapshot(self) -> None:
+        with self.snapshot_lock:
+            self._snapshot()
+
+    def _snapshot(self) -> None:
+        with self.condition:
+            self._write_buffer()
+            self.file.close()
+            self.segment_index += 1
+            self.file = open(segment_path(self.directory, self.segment_index), "ab")
+            next_segment = self.segment_index
+            self.events_since_snapshot = 0
+
+        repository = self.parking_lot.ticket_repository
+        with repository.lock:
+            tickets = list(repository.tickets_by_id.values())
+        state = {
+            "next_segment": next_segment,
+            "created_at": time.time(),
+            "tickets": [snapshot_ticket(ticket) for ticket in tickets],
+        }
+        temp_path = os.path.join(self.directory, SNAPSHOT_FILE + ".tmp")
+        with open(temp_path, "w") as file:
+            json.dump(state, file, separators=(",", ":"))
+            file.flush()
+            if self.fsync:
+                os.fsync(file.fileno())
+        os.replace(temp_path, os.path.join(self.directory, SNAPSHOT_FILE))
+        self.snapshots_written += 1
+
+        for segment_index in list_segments(self.directory):
+            if segment_index < next_segment:
+                os.remove(segment_path(self.directory, segment_index))
+
+    def close(self) -> None:
+        with self.condition:
+            self._write_buffer()
+            self.closed = True
+            self.condition.notify_all()
+        self.flusher.join()
+        if self.snapshot_thread:
+            self.snapshot_thread.join()
+        self.file.close()
+
+
+def snapshot_ticket(ticket: ParkingTicket) -> list:
+    payment = ticket.payment
+    return [
+        ticket.ticket_id,
+        ticket.vehicle.registration_number,
+        ticket.vehicle.get_vehicle_type().value,
+        ticket.spot.spot_id,
+        ticket.entry_time.timestamp(),
+        ticket.exit_time.timestamp() if ticket.exit_time else None,
+        [payment.payment_id, payment.amount, payment.payment_status.value,
+         payment.processed_at.timestamp() if payment.processed_at else None] if payment else None,
+    ]
+
+
+class RecoveryStats(NamedTuple):
+    snapshot_tickets: int
+    replayed_events: int
+    corrupt_records: int
+    torn_segments: int
+    active_tickets: int
+    seconds: float
+
+
+def _parse_timestamp(value) -> Optional[float]:
+    if value in (None, ""):
+        return None
+    return float(value)
+
+
+def _to_datetime(timestamp: Optional[float]) -> Optional[datetime.datetime]:
+    if timestamp is None:
+        return None
+    return datetime.datetime.fromtimestamp(timestamp)
+
+
+# Folds events into plain per-ticket state first and only touches the lot for
+# tickets that are still active at the end, so a long tail of short stays costs
+# a dict insert and delete per ticket instead of a full assign and release.
+# Every step is idempotent, so replaying an event twice is harmless.
+class _Replayer:
+    def __init__(self, parking_lot: ParkingLot):
+        self.parking_lot = parking_lot
+        self.archive = parking_lot.ticket_repository.archive
+        # ticket_id -> [registration, vehicle type, spot id, entry ts, exit ts, payment]
+        self.active: dict[str, list] = {}
+
+    def assign(self, ticket_id: str, registration_number: str, vehicle_type: str, spot_id: str,
+               entry_time: Optional[float], exit_time: Optional[float] = None, payment: Optional[list] = None) -> None:
+        if ticket_id in self.active or ticket_id in self.archive.positions:
+            return
+        self.active[ticket_id] = [registration_number, vehicle_type, spot_id, entry_time, exit_time, payment]
+
+    def payment(self, ticket_id: str, payment_id: str, amount: str, status: str, processed_at: str,
+                exit_time: str) -> None:
+        state = self.active.get(ticket_id)
+        if state:
+            state[4] = _parse_timestamp(exit_time)
+            state[5] = [payment_id, float(amount), status, _parse_timestamp(processed_at)]
+
+    def release(self, ticket_id: str) -> None:
+        state = self.active.pop(ticket_id, None)
+        if state:
+            self._archive(ticket_id, state)
+
+    def _archive(self, ticket_id: str, state: list) -> None:
+        registration_number, vehicle_type, spot_id, entry_time, exit_time, payment = state
+        spot = self.parking_lot.get_spot(spot_id)
+        # A spot gone from the lot's setup leaves no spot type to archive under
+        if not spot:
+            return
+        self.archive.append_row(
+            ticket_id, registration_number, spot_id, spot.get_parking_spot_type(),
+            entry_time, exit_time if exit_time is not None else entry_time,
+            payment[1] if payment else 0.0, payment[0] if payment else "",
+        )
+
+    def apply(self, payload: bytes) -> None:
+        kind, *fields = payload.decode("utf-8").split(FIELD_SEPARATOR)
+        if kind == ASSIGN:
+            ticket_id, registration_number, vehicle_type, spot_id, entry_time = fields
+            self.assign(ticket_id, registration_number, vehicle_type, spot_id, float(entry_time))
+        elif kind == PAYMENT:
+            self.payment(*fields)
+        elif kind == RELEASE:
+            self.release(*fields)
+
+    def materialize(self) -> None:
+        repository = self.parking_lot.ticket_repository
+        vehicle_factory = VehicleFactory()
+        for ticket_id, state in self.active.items():
+            registration_number, vehicle_type, spot_id, entry_time, exit_time, payment = state
+            # Paid but the release never made it to disk: finish the exit, or
+            # the next exit would charge the driver a second time
+            if payment and payment[2] == PaymentStatus.COMPLETED.value:
+                self._archive(ticket_id, state)
+                continue
+            spot = self.parking_lot.get_spot(spot_id)
+            vehicle = vehicle_factory.create_vehicle(VehicleType(vehicle_type), registration_number)
+            if not spot or not spot.assign_vehicle(vehicle):
+                continue
+            ticket = ParkingTicket(vehicle, spot, ticket_id=ticket_id, entry_time=_to_datetime(entry_time))
+            ticket.exit_time = _to_datetime(exit_time)
+            if payment:
+                payment_id, amount, status, processed_at = payment
+                ticket.payment = Payment(amount, None)
+                ticket.payment.payment_id = payment_id
+                ticket.payment.payment_status = PaymentStatus(status)
+                ticket.payment.processed_at = _to_datetime(processed_at)
+                # The gateway's answer was lost with the process; a pending
+                # payment would make begin_exit refuse the ticket for good
+                if ticket.payment.payment_status == PaymentStatus.PENDING:
+                    ticket.payment.payment_status = PaymentStatus.FAILED
+            if not repository.add(ticket):
+                spot.remove_vehicle()
+
+
+# Rebuilds the tickets of a freshly set up lot from the journal directory
+def recover_parking_lot(parking_lot: ParkingLot, directory: str) -> RecoveryStats:
+    start = time.perf_counter()
+    replayer = _Replayer(parking_lot)
+    snapshot_tickets = 0
+    first_segment = 0
+
+    snapshot_file = os.path.join(directory, SNAPSHOT_FILE)
+    if os.path.exists(snapshot_file):
+        with open(snapshot_file) as file:
+            state = json.load(file)
+        first_segment = state["next_segment"]
+        for ticket_state in state["tickets"]:
+            replayer.assign(*ticket_state)
+        snapshot_tickets = len(state["tickets"])
+
+    read_stats = ReadStats()
+    torn_segments = 0
+    for segment_index in list_segments(directory):
+        if segment_index < first_segment:
+            continue
+        segment_stats = ReadStats()
+        for payload in read_records(segment_path(directory, segment_index), segment_stats):
+            replayer.apply(payload)
+        read_stats.records += segment_stats.records
+        read_stats.corrupt_records += segment_stats.corrupt_records
+        torn_segments += segment_stats.torn_tail
+    replayer.materialize()
+
+    return RecoveryStats(
+        snapshot_tickets=snapshot_tickets,
+        replayed_events=read_stats.records,
+        corrupt_records=read_stats.corrupt_records,
+        torn_segments=torn_segments,
+        active_tickets=len(parking_lot.ticket_repository),
+        seconds=time.perf_counter() - start,
+    )
+
+
+def run_journal_demo(directory: str = "parking_lot_journal"):
+    shutil.rmtree(directory, ignore_errors=True)
+
+    ParkingLot.reset_instance()
+    parking_lot = setup_parking_lot()
+    journal = ParkingLotJournal(directory)
+    journal.attach(parking_lot)
+    tickets = [parking_lot.issue_ticket(Car(f"Car-00{i}"), "ENTRY-1") for i in range(1, 4)]
+    parking_lot.process_exit(tickets[0].ticket_id, "EXIT-1", PaymentType.CASH)
+    journal.close()
+    print("Before restart:", parking_lot.get_occupancy_by_spot_type())
+
+    # Simulate a process restart: same topology, state comes from the journal
+    ParkingLot.reset_instance()
+    restarted_lot = setup_parking_lot()
+    stats = recover_parking_lot(restarted_lot, directory)
+    print("After recovery: ", restarted_lot.get_occupancy_by_spot_type())
+    print(stats)
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    run_journal_demo()
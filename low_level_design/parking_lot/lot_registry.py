@@ -0,0 +1,173 @@
+# Many parking lots sharded across worker processes.
+#
+# Each worker process owns a set of independent lots (ParkingLot.create, not
+# the singleton) and serves gate requests for them over a pipe. LotRegistry
+# places every lot on the least loaded shard, routes requests by lot id,
+# sends one batch per shard so all shards work in parallel (see ShardPool),
+# and merges status from every shard.
+#
+# A lot is the unit of sharding: its ticket repository is what rejects
+# re-entry and finds tickets at the exit, so its floors stay in one process.
+#
+# Run from the repository root:
+#   python -m low_level_design.parking_lot.lot_registry
+
+import os
+from typing import NamedTuple, Optional
+
+from low_level_design.parking_lot.my_parking_lot import (
+    ParkingLot,
+    ParkingSpotType,
+    PaymentFactory,
+    PaymentType,
+    VehicleFactory,
+    VehicleType,
+    setup_parking_lot,
+)
+from low_level_design.shard_pool import BatchError, ShardPool
+
+
+class LotSpec(NamedTuple):
+    lot_id: str
+    num_floors: int = 3
+    spots_per_type: int = 50
+    num_panels: int = 2
+
+    @property
+    def total_spots(self) -> int:
+        return self.num_floors * self.spots_per_type * len(ParkingSpotType)
+
+
+class GateRequest(NamedTuple):
+    op: str  # "enter" or "exit"
+    lot_id: str
+    registration_number: str
+    panel_id: str
+    vehicle_type: Optional[VehicleType] = None
+    # Exits use the ticket when given, the registration number otherwise
+    ticket_id: Optional[str] = None
+    payment_type: Optional[PaymentType] = None
+
+
+class TicketRef(NamedTuple):
+    lot_id: str
+    ticket_id: str
+    registration_number: str
+    spot_id: str
+
+
+class ShardWorker:
+    def __init__(self):
+        self.lots: dict[str, ParkingLot] = {}
+        self.vehicle_factory = VehicleFactory()
+        self.payment_factory = PaymentFactory()
+
+    def add_lot(self, spec: LotSpec) -> None:
+        parking_lot = ParkingLot.create(spec.lot_id)
+        setup_parking_lot(spec.num_floors, spec.spots_per_type, spec.num_panels, parking_lot)
+        self.lots[spec.lot_id] = parking_lot
+
+    def handle(self, request: GateRequest):
+        parking_lot = self.lots.get(request.lot_id)
+        if not parking_lot:
+            return None
+        if request.op == "enter":
+            vehicle = self.vehicle_factory.create_vehicle(request.vehicle_type, request.registration_number)
+            ticket = parking_lot.issue_ticket(vehicle, request.panel_id)
+            if not ticket:
+                return None
+            return TicketRef(request.lot_id, ticket.ticket_id, request.registration_number, ticket.spot.spot_id)
+        if request.op == "exit":
+            repository = parking_lot.ticket_repository
+            if request.ticket_id:
+                ticket = repository.get(request.ticket_id)
+            else:
+                ticket = repository.find_by_registration(request.registration_number)
+            # Nobody leaves without paying; PaymentType.INVOICE bills an account instead
+            if not ticket or not request.payment_type:
+                return False
+            payment_strategy = self.payment_factory.create_payment(request.payment_type)
+            return parking_lot.exit_vehicle(ticket, request.panel_id, payment_strategy)
+        raise ValueError(f"Unknown gate operation {request.op}")
+
+    def status(self) -> dict:
+        return {lot_id: parking_lot.get_occupancy_by_spot_type() for lot_id, parking_lot in self.lots.items()}
+
+
+class LotRegistry:
+    def __init__(self, num_shards: Optional[int] = None):
+        self.pool = ShardPool(num_shards or os.cpu_count() or 1, ShardWorker, "parking-shard")
+        self.spots_by_shard = [0] * len(self.pool)
+        self.shard_by_lot: dict[str, int] = {}
+
+    def __enter__(self) -> 'LotRegistry':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def add_lot(self, spec: LotSpec) -> int:
+        if spec.lot_id in self.shard_by_lot:
+            raise ValueError(f"Duplicate lot id {spec.lot_id}")
+        index = min(range(len(self.pool)), key=lambda i: self.spots_by_shard[i])
+        self.pool.call(index, "add_lot", spec)
+        self.spots_by_shard[index] += spec.total_spots
+        self.shard_by_lot[spec.lot_id] = index
+        return index
+
+    # Results come back in request order: TicketRef / None for entries, bool
+    # for exits. Raises BatchError once the whole batch is done if any request
+    # failed; its results still hold the tickets of the requests that worked.
+    def submit(self, requests: list[GateRequest]) -> list:
+        return self.pool.submit(requests, lambda request: self.shard_by_lot.get(request.lot_id),
+                                lambda request: False if request.op == "exit" else None)
+
+    def enter(self, lot_id: str, vehicle_type: VehicleType, registration_number: str,
+              entry_panel_id: str) -> Optional[TicketRef]:
+        return self.submit([GateRequest("enter", lot_id, registration_number, entry_panel_id, vehicle_type)])[0]
+
+    def exit(self, ticket: TicketRef, exit_panel_id: str, payment_type: PaymentType) -> bool:
+        return self.submit([GateRequest("exit", ticket.lot_id, ticket.registration_number, exit_panel_id,
+                                        ticket_id=ticket.ticket_id, payment_type=payment_type)])[0]
+
+    def get_status(self) -> dict:
+        lots = {}
+        for index in range(len(self.pool)):
+            lots.update(self.pool.call(index, "status"))
+        totals = {spot_type.value: {"free": 0, "total": 0, "occupied": 0} for spot_type in ParkingSpotType}
+        for occupancy in lots.values():
+            for spot_type, counts in occupancy.items():
+                for key, value in counts.items():
+                    totals[spot_type][key] += value
+        return {"lots": lots, "total": totals}
+
+    def close(self) -> None:
+        self.pool.close()
+
+
+if __name__ == "__main__":
+    with LotRegistry(num_shards=2) as registry:
+        for site in ("AIRPORT", "MALL", "STATION"):
+            shard = registry.add_lot(LotSpec(site, num_floors=2, spots_per_type=3))
+            print(f"Lot {site} on shard {shard}")
+
+        tickets = registry.submit([
+            GateRequest("enter", "AIRPORT", "Car-001", "ENTRY-1", VehicleType.CAR),
+            GateRequest("enter", "MALL", "Moto-001", "ENTRY-2", VehicleType.MOTORCYCLE),
+            GateRequest("enter", "STATION", "Truck-001", "ENTRY-1", VehicleType.TRUCK),
+            GateRequest("enter", "AIRPORT", "Car-001", "ENTRY-2", VehicleType.CAR),
+        ])
+        for ticket in tickets:
+            print(f"✅ {ticket.registration_number} parked at {ticket.lot_id} {ticket.spot_id}" if ticket
+                  else "❌ Entry rejected (vehicle already parked)")
+
+        try:
+            registry.submit([GateRequest("tow", "AIRPORT", "Car-001", "EXIT-1"),
+                             GateRequest("enter", "MALL", "Car-002", "ENTRY-1", VehicleType.CAR)])
+        except BatchError as e:
+            print(f"❌ {e.errors[0]}; Car-002 parked anyway: {e.results[1] is not None}")
+
+        print(f"Exit Car-001 from AIRPORT: {registry.exit(tickets[0], 'EXIT-1', PaymentType.INVOICE)}")
+        status = registry.get_status()
+        print(f"Lots: {sorted(status['lots'])}")
+        print(f"All sites: {status['total']}")
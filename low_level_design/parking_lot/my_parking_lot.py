@@ -1,11 +1,14 @@
 import datetime
+import heapq
+import itertools
 import uuid
-import time
 import random
+import threading
 
+from array import array
 from enum import Enum
 from abc import ABC, abstractmethod
-from typing import Optional, List
+from typing import Callable, NamedTuple, Optional, List
 
 
 class VehicleType(Enum):
@@ -24,12 +27,21 @@ class PaymentType(Enum):
     CREDIT_CARD = "Credit Card"
     DEBIT_CARD = "Debit Card"
     UPI = "UPI"
+    # Billed to the customer's account later, e.g. a fleet or season pass
+    INVOICE = "Invoice"
 
 class PaymentStatus(Enum):
     PENDING = "Pending"
     COMPLETED = "Completed"
     FAILED = "Failed"
 
+COMPATIBLE_SPOT_TYPES: dict[VehicleType, list[ParkingSpotType]] = {
+    VehicleType.MOTORCYCLE: [ParkingSpotType.MOTORCYCLE],
+    VehicleType.CAR: [ParkingSpotType.COMPACT],
+    VehicleType.VAN: [ParkingSpotType.LARGE],
+    VehicleType.TRUCK: [ParkingSpotType.LARGE]
+}
+
 # Abstract base class
 class Vehicle(ABC):
     def __init__(self, registration_number: str):
@@ -59,12 +71,21 @@ class Van(Vehicle):
 
 # Abstract base class
 class ParkingSpot(ABC):
+    # Empty, so SpotView can go without a __dict__; the concrete spots below keep theirs
+    __slots__ = ()
+
     def __init__(self, spot_id: str, floor_id: str):
         self.spot_id = spot_id
         self.floor_id = floor_id
         self.is_free: bool = True
         self.is_reserved: bool = False
+        # Reservation holding the spot while it waits for its vehicle
+        self.hold_id: Optional[str] = None
         self.vehicle: Optional[Vehicle] = None
+        self.floor: Optional['ParkingFloor'] = None
+        # Replaced by the allocator's lock once the spot is added to a floor,
+        # so locks are striped per floor and spot type
+        self.lock = threading.Lock()
 
     @abstractmethod
     def get_parking_spot_type(self) -> ParkingSpotType:
@@ -79,21 +100,61 @@ class ParkingSpot(ABC):
     def _vehicle_can_fit(self, vehicle: Vehicle) -> bool:
         pass
 
+    # Compare-and-set: the check and the assignment happen under one lock,
+    # so two gates racing for the same spot cannot both win
     def assign_vehicle(self, vehicle: Vehicle) -> bool:
-        if self.can_park_vehicle(vehicle):
-            self.vehicle = vehicle
-            self.is_free = False
+        with self.lock:
+            if self.can_park_vehicle(vehicle):
+                self.vehicle = vehicle
+                self.is_free = False
+                self.is_reserved = True
+                if self.floor:
+                    self.floor.on_spot_occupied(self)
+                return True
+            return False
+
+    def remove_vehicle(self) -> bool:
+        with self.lock:
+            if not self.is_free:
+                self.vehicle = None
+                self.is_free = True
+                self.is_reserved = False
+                if self.floor:
+                    self.floor.on_spot_released(self)
+                return True
+            return False
+
+    # A held spot is reserved but still free; it leaves the free list like an
+    # occupied one, so spot selection never sees it
+    def place_hold(self, hold_id: str) -> bool:
+        with self.lock:
+            if not self.is_free or self.is_reserved:
+                return False
             self.is_reserved = True
+            self.hold_id = hold_id
+            if self.floor:
+                self.floor.on_spot_occupied(self)
             return True
-        return False
 
-    def remove_vehicle(self) -> bool:
-        if not self.is_free:
-            self.vehicle = None
-            self.is_free = True
+    def release_hold(self, hold_id: str) -> bool:
+        with self.lock:
+            if self.hold_id != hold_id or not self.is_free:
+                return False
             self.is_reserved = False
+            self.hold_id = None
+            if self.floor:
+                self.floor.on_spot_released(self)
+            return True
+
+    # The reserved vehicle arrives; the spot is already off the free list
+    def claim_hold(self, hold_id: str, vehicle: Vehicle) -> bool:
+        with self.lock:
+            if self.hold_id != hold_id or not self.is_free or not self._vehicle_can_fit(vehicle):
+                return False
+            self.hold_id = None
+            self.vehicle = vehicle
+            self.is_free = False
             return True
-        return False
 
 # Parking Spot Implementation
 class CompactSpot(ParkingSpot):
@@ -117,44 +178,100 @@ class MotorCycleSpot(ParkingSpot):
     def _vehicle_can_fit(self, vehicle: Vehicle) -> bool:
         return vehicle.get_vehicle_type() in [VehicleType.MOTORCYCLE]
 
+# Free list of the spots of one type on one floor.
+# Occupied spots are swap-removed, so allocation and release are both O(1).
+class SpotAllocator:
+    def __init__(self):
+        self.free_spots: list[ParkingSpot] = []
+        self.positions: dict[str, int] = {}
+        self.total = 0
+        # Guards the free list and the state of every spot it owns
+        self.lock = threading.Lock()
+
+    @property
+    def free_count(self) -> int:
+        return len(self.free_spots)
+
+    @property
+    def occupied_count(self) -> int:
+        return self.total - len(self.free_spots)
+
+    def add_spot(self, spot: ParkingSpot) -> None:
+        self.total += 1
+        if spot.is_free and not spot.is_reserved:
+            self.release(spot)
+
+    def peek(self) -> Optional[ParkingSpot]:
+        # Lock-free read; the caller confirms the spot with assign_vehicle
+        try:
+            return self.free_spots[-1]
+        except IndexError:
+            return None
+
+    def acquire(self, spot: ParkingSpot) -> None:
+        index = self.positions.pop(spot.spot_id, None)
+        if index is None:
+            return
+        last_spot = self.free_spots.pop()
+        if last_spot is not spot:
+            self.free_spots[index] = last_spot
+            self.positions[last_spot.spot_id] = index
+
+    def release(self, spot: ParkingSpot) -> None:
+        if spot.spot_id in self.positions:
+            return
+        self.positions[spot.spot_id] = len(self.free_spots)
+        self.free_spots.append(spot)
+
+# Change in one floor's spots of one type. delta is the change in occupied
+# spots (+1 on assign, -1 on release); counts are the values right after it.
+class SpotEvent(NamedTuple):
+    floor_id: str
+    spot_type: ParkingSpotType
+    delta: int
+    free_count: int
+    total: int
+
 # Observer Pattern for Display Board
 class ParkingLotObserver(ABC):
     @abstractmethod
-    def update(self, floor_id: str, parking_spots: dict[ParkingSpotType, list[ParkingSpot]]):
+    def update(self, event: SpotEvent):
+        pass
+
+# Notified when a ticket is issued and when it is closed after payment;
+# called on the gate thread, like floor observers
+class TicketObserver(ABC):
+    @abstractmethod
+    def on_ticket_issued(self, ticket: 'ParkingTicket'):
+        pass
+
+    @abstractmethod
+    def on_ticket_closed(self, ticket: 'ParkingTicket'):
         pass
 
 class DisplayBoard(ParkingLotObserver):
     def __init__(self, floor_id: str):
         self.floor_id = floor_id
-        self.current_status = {}
+        self.current_status = {"floor_id": floor_id, "spots": {}}
 
-    def update(self, parking_spots: dict[ParkingSpotType, list[ParkingSpot]]) -> dict:
-        floor_status = {
-            "floor_id": self.floor_id,
-            "spots": {}
+    def update(self, event: SpotEvent):
+        self.current_status["spots"][event.spot_type.value] = {
+            "free": event.free_count,
+            "total": event.total,
+            "occupied": event.total - event.free_count
         }
-        for spot_type, spots in parking_spots.items():
-            free_count = sum(1 for spot in spots if spot.is_free and not spot.is_reserved)
-            total_count = len(spots)
-            floor_status["spots"][spot_type.value] = {
-                "free": free_count,
-                "total": total_count,
-                "occupied": total_count - free_count
-            }
-        self.current_status = floor_status
 
-    def get_display_status(self, parking_spots: dict[ParkingSpotType, list[ParkingSpot]]) -> dict:
+    # Reads the counters maintained by the allocators, O(spot types) per call
+    def get_display_status(self, allocators: dict[ParkingSpotType, SpotAllocator]) -> dict:
         floor_status = {
             "floor_id": self.floor_id,
             "spots": {}
         }
-        for spot_type, spots in parking_spots.items():
-            free_count = sum(1 for spot in spots if spot.is_free and not spot.is_reserved)
-            total_count = len(spots)
+        for spot_type, allocator in allocators.items():
             floor_status["spots"][spot_type.value] = {
-                "free": free_count,
-                "total": total_count,
-                "occupied": total_count - free_count
+                "free": allocator.free_count,
+                "total": allocator.total,
+                "occupied": allocator.occupied_count
             }
         return floor_status
 
@@ -164,9 +281,16 @@ class ParkingFloor(ABC):
         self.parking_spots: dict[ParkingSpotType, list[ParkingSpot]] = {
             spot_type: [] for spot_type in ParkingSpotType
         }
+        self.spots_by_id: dict[str, ParkingSpot] = {}
+        self.allocators: dict[ParkingSpotType, SpotAllocator] = {
+            spot_type: SpotAllocator() for spot_type in ParkingSpotType
+        }
         self.display_board = DisplayBoard(floor_id)
         self.observers: List[ParkingLotObserver] = [self.display_board]
         self.is_full = False
+        # Set by ParkingLot.add_floor so the lot-wide capacity index stays in sync
+        self.lot: Optional['ParkingLot'] = None
+        self.floor_index: int = 0
 
     def add_observer(self, observer: ParkingLotObserver):
         self.observers.append(observer)
@@ -174,34 +298,76 @@ class ParkingFloor(ABC):
     def remove_observer(self, observer: ParkingLotObserver):
         self.observers.remove(observer)
 
-    def notify_observers(self):
+    # Floor observers are updated inline on the gate thread, so keep them cheap;
+    # anything slow should subscribe through the lot's event bus instead
+    def notify_observers(self, event: SpotEvent):
         for observer in self.observers:
-            observer.update(self.floor_id, self.parking_spots)
+            observer.update(event)
+        if self.lot and self.lot.event_bus:
+            self.lot.event_bus.publish(event)
 
     def find_available_spot(self, vehicle: Vehicle) -> Optional[ParkingSpot]:
         vehicle_type = vehicle.get_vehicle_type()
-        compatible_spot_types = self._get_compatible_spot_types(vehicle_type)
-        for spot_type in compatible_spot_types:
-            for spot in self.parking_spots[spot_type]:
-                if spot.can_park_vehicle(vehicle):
-                    return spot
+        for spot_type in self._get_compatible_spot_types(vehicle_type):
+            spot = self.allocators[spot_type].peek()
+            if spot:
+                return spot
         return None
 
     def _get_compatible_spot_types(self, vehicle_type: VehicleType) -> list[ParkingSpotType]:
-        compatibility_map = {
-            VehicleType.MOTORCYCLE: [ParkingSpotType.MOTORCYCLE],
-            VehicleType.CAR: [ParkingSpotType.COMPACT],
-            VehicleType.VAN: [ParkingSpotType.LARGE],
-            VehicleType.TRUCK: [ParkingSpotType.LARGE]
-        }
-        return compatibility_map.get(vehicle_type, [])
+        return COMPATIBLE_SPOT_TYPES.get(vehicle_type, [])
 
     def add_parking_spot(self, spot: ParkingSpot):
         spot_type = spot.get_parking_spot_type()
         self.parking_spots[spot_type].append(spot)
+        self.spots_by_id[spot.spot_id] = spot
+        allocator = self.allocators[spot_type]
+        with allocator.lock:
+            spot.floor = self
+            spot.lock = allocator.lock
+            allocator.add_spot(spot)
+            if allocator.free_count == 1:
+                self._update_capacity(spot_type)
+
+    def on_spot_occupied(self, spot: ParkingSpot):
+        spot_type = spot.get_parking_spot_type()
+        allocator = self.allocators[spot_type]
+        allocator.acquire(spot)
+        if allocator.free_count == 0:
+            self._update_capacity(spot_type)
+        self.notify_observers(SpotEvent(self.floor_id, spot_type, 1, allocator.free_count, allocator.total))
+
+    def on_spot_released(self, spot: ParkingSpot):
+        spot_type = spot.get_parking_spot_type()
+        allocator = self.allocators[spot_type]
+        allocator.release(spot)
+        if allocator.free_count == 1:
+            self._update_capacity(spot_type)
+        if self.lot:
+            self.lot.spot_selection_strategy.on_spot_released(spot)
+        self.notify_observers(SpotEvent(self.floor_id, spot_type, -1, allocator.free_count, allocator.total))
+
+    # Only called when a spot type flips between full and not full,
+    # with the allocator lock of that spot type held
+    def _update_capacity(self, spot_type: ParkingSpotType):
+        self.is_full = all(allocator.free_count == 0 for allocator in self.allocators.values())
+        if self.lot:
+            self.lot.update_floor_capacity(self, spot_type)
 
     def get_parking_spots_status(self):
-        return self.display_board.get_display_status(self.parking_spots)
+        return self.display_board.get_display_status(self.allocators)
+
+    # Recounts every spot and compares it with the maintained counters (for tests)
+    def verify_counters(self) -> None:
+        for spot_type, spots in self.parking_spots.items():
+            allocator = self.allocators[spot_type]
+            free_count = sum(1 for spot in spots if spot.is_free and not spot.is_reserved)
+            if free_count != allocator.free_count or len(spots) != allocator.total:
+                raise RuntimeError(
+                    f"Counter mismatch on {self.floor_id} {spot_type.value}: "
+                    f"counted {free_count}/{len(spots)} free/total, "
+                    f"maintained {allocator.free_count}/{allocator.total}"
+                )
 
 
 class PaymentStrategy(ABC):
@@ -233,6 +399,11 @@ class UPIPayment(PaymentStrategy):
         print(f"Processing UPI payment of ${amount}")
         return True
 
+class InvoicePayment(PaymentStrategy):
+    def process_payment(self, amount: float) -> bool:
+        # Nothing is charged at the gate; the amount goes on the account's next invoice
+        return True
+
 class Payment:
     def __init__(self, amount: float, payment_strategy: PaymentStrategy):
         self.payment_id = str(uuid.uuid4())
@@ -242,7 +413,11 @@ class Payment:
         self.processed_at: Optional[datetime.datetime] = None
 
     def process_payment(self) -> bool:
-        if self.payment_strategy.process_payment(self.amount):
+        return self.record_result(self.payment_strategy.process_payment(self.amount))
+
+    # Split out so asynchronous gateways can report the outcome later
+    def record_result(self, succeeded: bool) -> bool:
+        if succeeded:
             self.payment_status = PaymentStatus.COMPLETED
             self.processed_at = datetime.datetime.now()
             return True
@@ -252,14 +427,17 @@ class Payment:
 
 
 class ParkingTicket:
-    def __init__(self, vehicle: Vehicle, spot: ParkingSpot):
-        self.ticket_id = str(uuid.uuid4())
+    def __init__(self, vehicle: Vehicle, spot: ParkingSpot, ticket_id: Optional[str] = None,
+                 entry_time: Optional[datetime.datetime] = None):
+        self.ticket_id = ticket_id or str(uuid.uuid4())
         self.vehicle = vehicle
         self.spot = spot
-        self.entry_time = datetime.datetime.now()
+        self.entry_time = entry_time or datetime.datetime.now()
         self.exit_time: Optional[datetime.datetime] = None
         self.payment: Optional[Payment] = None
         self.is_paid = False
+        # Guards the payment claim so two exit panels cannot charge the same ticket twice
+        self.lock = threading.Lock()
 
     def calculate_fee(self, hourly_rate: float) -> float:
         if not self.exit_time:
@@ -268,36 +446,180 @@ class ParkingTicket:
         duration = (self.exit_time - self.entry_time).total_seconds() / 3600  # hours
         return round(duration * hourly_rate, 2)
 
+class ClosedTicket(NamedTuple):
+    ticket_id: str
+    registration_number: str
+    spot_id: str
+    spot_type: ParkingSpotType
+    entry_time: datetime.datetime
+    exit_time: datetime.datetime
+    amount: float
+    payment_id: str
+
+# Spot types are stored as small integer codes in compact columns
+SPOT_TYPES: list[ParkingSpotType] = list(ParkingSpotType)
+SPOT_TYPE_CODES: dict[ParkingSpotType, int] = {spot_type: code for code, spot_type in enumerate(SPOT_TYPES)}
+
+# Closed tickets kept as parallel columns instead of full ParkingTicket objects
+class ClosedTicketArchive:
+    def __init__(self):
+        self.ticket_ids: list[str] = []
+        self.registration_numbers: list[str] = []
+        self.spot_ids: list[str] = []
+        self.payment_ids: list[str] = []
+        self.spot_types = array('b')
+        self.entry_times = array('d')
+        self.exit_times = array('d')
+        self.amounts = array('d')
+        self.positions: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.ticket_ids)
+
+    def append(self, ticket: ParkingTicket) -> int:
+        exit_time = ticket.exit_time or datetime.datetime.now()
+        return self.append_row(
+            ticket.ticket_id, ticket.vehicle.registration_number, ticket.spot.spot_id,
+            ticket.spot.get_parking_spot_type(), ticket.entry_time.timestamp(), exit_time.timestamp(),
+            ticket.payment.amount if ticket.payment else 0.0,
+            ticket.payment.payment_id if ticket.payment else "",
+        )
+
+    def append_row(self, ticket_id: str, registration_number: str, spot_id: str, spot_type: ParkingSpotType,
+                   entry_timestamp: float, exit_timestamp: float, amount: float, payment_id: str) -> int:
+        index = len(self.ticket_ids)
+        self.positions[ticket_id] = index
+        self.ticket_ids.append(ticket_id)
+        self.registration_numbers.append(registration_number)
+        self.spot_ids.append(spot_id)
+        self.payment_ids.append(payment_id)
+        self.spot_types.append(SPOT_TYPE_CODES[spot_type])
+        self.entry_times.append(entry_timestamp)
+        self.exit_times.append(exit_timestamp)
+        self.amounts.append(amount)
+        return index
+
+    def get(self, ticket_id: str) -> Optional[ClosedTicket]:
+        index = self.positions.get(ticket_id)
+        if index is None:
+            return None
+        return self.row(index)
+
+    def row(self, index: int) -> ClosedTicket:
+        return ClosedTicket(
+            ticket_id=self.ticket_ids[index],
+            registration_number=self.registration_numbers[index],
+            spot_id=self.spot_ids[index],
+            spot_type=SPOT_TYPES[self.spot_types[index]],
+            entry_time=datetime.datetime.fromtimestamp(self.entry_times[index]),
+            exit_time=datetime.datetime.fromtimestamp(self.exit_times[index]),
+            amount=self.amounts[index],
+            payment_id=self.payment_ids[index],
+        )
+
+# Active tickets indexed by ticket id, registration number and spot id
+class TicketRepository:
+    def __init__(self):
+        self.tickets_by_id: dict[str, ParkingTicket] = {}
+        self.tickets_by_registration: dict[str, ParkingTicket] = {}
+        self.tickets_by_spot: dict[str, ParkingTicket] = {}
+        self.archive = ClosedTicketArchive()
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.tickets_by_id)
+
+    # Returns False when the vehicle already holds an active ticket (re-entry)
+    def add(self, ticket: ParkingTicket) -> bool:
+        registration_number = ticket.vehicle.registration_number
+        with self.lock:
+            if registration_number in self.tickets_by_registration:
+                return False
+            self.tickets_by_id[ticket.ticket_id] = ticket
+            self.tickets_by_registration[registration_number] = ticket
+            self.tickets_by_spot[ticket.spot.spot_id] = ticket
+            return True
+
+    def get(self, ticket_id: str) -> Optional[ParkingTicket]:
+        return self.tickets_by_id.get(ticket_id)
+
+    def find_by_registration(self, registration_number: str) -> Optional[ParkingTicket]:
+        return self.tickets_by_registration.get(registration_number)
+
+    def find_by_spot(self, spot_id: str) -> Optional[ParkingTicket]:
+        return self.tickets_by_spot.get(spot_id)
+
+    # Moves the ticket from the active indexes into the archive
+    def close(self, ticket: ParkingTicket) -> bool:
+        with self.lock:
+            if self.tickets_by_id.pop(ticket.ticket_id, None) is None:
+                return False
+            del self.tickets_by_registration[ticket.vehicle.registration_number]
+            # The spot is freed before the ticket is closed, so another gate
+            # may already have parked in it and re-indexed it
+            if self.tickets_by_spot.get(ticket.spot.spot_id) is ticket:
+                del self.tickets_by_spot[ticket.spot.spot_id]
+            self.archive.append(ticket)
+            return True
+
+    def get_closed(self, ticket_id: str) -> Optional[ClosedTicket]:
+        return self.archive.get(ticket_id)
+
 class EntryPanel:
     def __init__(self, panel_id: str):
         self.panel_id = panel_id
 
-    def issue_ticket(self, vehicle: Vehicle, spot: ParkingSpot) -> ParkingTicket:
+    def issue_ticket(self, vehicle: Vehicle, spot: ParkingSpot,
+                     entry_time: Optional[datetime.datetime] = None) -> ParkingTicket:
         vehicle_assigned = spot.assign_vehicle(vehicle)
         if vehicle_assigned:
-            return ParkingTicket(vehicle, spot)
+            return ParkingTicket(vehicle, spot, entry_time=entry_time)
+        return None
+
+    def issue_reserved_ticket(self, vehicle: Vehicle, spot: ParkingSpot, hold_id: str,
+                              entry_time: Optional[datetime.datetime] = None) -> Optional[ParkingTicket]:
+        if spot.claim_hold(hold_id, vehicle):
+            return ParkingTicket(vehicle, spot, entry_time=entry_time)
         return None
 
 class ExitPanel:
-    def __init__(self, panel_id: str):
+    def __init__(self, panel_id: str, fee_policy: Optional['FeePolicy'] = None):
         self.panel_id = panel_id
+        self.fee_policy = fee_policy or HourlyFeePolicy()
     
-    def process_exit(self, ticket: ParkingTicket, payment_strategy: PaymentStrategy) -> bool:
-        if not ticket.is_paid:
+    def process_exit(self, ticket: ParkingTicket, payment_strategy: PaymentStrategy,
+                     exit_time: Optional[datetime.datetime] = None) -> bool:
+        payment = self.begin_exit(ticket, payment_strategy, exit_time)
+        if not payment:
+            return False
+        payment.process_payment()
+        return self.finish_exit(ticket, payment)
+
+    # Claims the ticket with a pending payment; the lock is not held while the
+    # gateway works, so a slow payment only blocks its own ticket
+    def begin_exit(self, ticket: ParkingTicket, payment_strategy: PaymentStrategy,
+                   exit_time: Optional[datetime.datetime] = None) -> Optional[Payment]:
+        with ticket.lock:
+            if ticket.is_paid:
+                return None
+            if ticket.payment and ticket.payment.payment_status == PaymentStatus.PENDING:
+                return None
+            if exit_time:
+                ticket.exit_time = exit_time
             fee = self._calculate_parking_fee(ticket)
-            payment = Payment(fee, payment_strategy)
-            if payment.process_payment():
-                ticket.payment = payment
-                ticket.is_paid = True
-                ticket.spot.remove_vehicle()
-                return True
-        return False
+            ticket.payment = Payment(fee, payment_strategy)
+            return ticket.payment
+
+    def finish_exit(self, ticket: ParkingTicket, payment: Payment) -> bool:
+        with ticket.lock:
+            if payment.payment_status != PaymentStatus.COMPLETED:
+                return False
+            ticket.is_paid = True
+            ticket.spot.remove_vehicle()
+            return True
     
     def _calculate_parking_fee(self, ticket: ParkingTicket) -> float:
-        spot = ticket.spot
-        hourly_cost = HourlyCost().get_cost(spot_type=spot.get_parking_spot_type())
-        fee = ticket.calculate_fee(hourly_cost)
-        return fee
+        return self.fee_policy.calculate_fee(ticket)
 
 class HourlyCost:
     def __init__(self):
@@ -309,62 +631,392 @@ class HourlyCost:
 
     def get_cost(self, spot_type: ParkingSpotType) -> float:
         return self.hourly_cost[spot_type]
+
+# Strategy Pattern for pricing a stay at the exit panel
+class FeePolicy(ABC):
+    @abstractmethod
+    def calculate_fee(self, ticket: ParkingTicket) -> float:
+        pass
+
+class HourlyFeePolicy(FeePolicy):
+    def __init__(self, hourly_cost: Optional[HourlyCost] = None):
+        self.hourly_cost = hourly_cost or HourlyCost()
+
+    def calculate_fee(self, ticket: ParkingTicket) -> float:
+        hourly_cost = self.hourly_cost.get_cost(spot_type=ticket.spot.get_parking_spot_type())
+        return ticket.calculate_fee(hourly_cost)
          
+# Strategy Pattern for choosing which free spot a vehicle gets
+class SpotSelectionStrategy(ABC):
+    @abstractmethod
+    def select_spot(self, parking_lot: 'ParkingLot', vehicle: Vehicle,
+                    entry_panel_id: Optional[str] = None) -> Optional[ParkingSpot]:
+        pass
+
+    # Called with the allocator lock of the spot's floor and type held
+    def on_spot_released(self, spot: ParkingSpot) -> None:
+        pass
+
+    # Walks the floors that still have room for a spot type, in the order
+    # given by pick_floor_index, skipping floors drained by a concurrent gate
+    def _select_from_floors(self, parking_lot: 'ParkingLot', vehicle: Vehicle,
+                            pick_floor_index: Callable[[ParkingSpotType, int], int]) -> Optional[ParkingSpot]:
+        for spot_type in COMPATIBLE_SPOT_TYPES.get(vehicle.get_vehicle_type(), []):
+            mask = parking_lot.floor_capacity[spot_type]
+            while mask:
+                floor_index = pick_floor_index(spot_type, mask)
+                spot = parking_lot.floors[floor_index].allocators[spot_type].peek()
+                if spot:
+                    return spot
+                mask &= ~(1 << floor_index)
+        return None
+
+class LowestFloorFirstStrategy(SpotSelectionStrategy):
+    def select_spot(self, parking_lot: 'ParkingLot', vehicle: Vehicle,
+                    entry_panel_id: Optional[str] = None) -> Optional[ParkingSpot]:
+        # Lowest set bit is the first floor that still has room
+        return self._select_from_floors(parking_lot, vehicle, lambda spot_type, mask: (mask & -mask).bit_length() - 1)
+
+class RoundRobinFloorStrategy(SpotSelectionStrategy):
+    def __init__(self):
+        self.next_floor: dict[ParkingSpotType, int] = {spot_type: 0 for spot_type in ParkingSpotType}
+
+    def select_spot(self, parking_lot: 'ParkingLot', vehicle: Vehicle,
+                    entry_panel_id: Optional[str] = None) -> Optional[ParkingSpot]:
+        return self._select_from_floors(parking_lot, vehicle, self._pick_floor_index)
+
+    # First floor with room at or after the cursor, wrapping around
+    def _pick_floor_index(self, spot_type: ParkingSpotType, mask: int) -> int:
+        upper_floors = mask >> self.next_floor[spot_type] << self.next_floor[spot_type]
+        candidates = upper_floors or mask
+        floor_index = (candidates & -candidates).bit_length() - 1
+        self.next_floor[spot_type] = floor_index + 1
+        return floor_index
+
+class LeastLoadedFloorStrategy(SpotSelectionStrategy):
+    def select_spot(self, parking_lot: 'ParkingLot', vehicle: Vehicle,
+                    entry_panel_id: Optional[str] = None) -> Optional[ParkingSpot]:
+        def pick_floor_index(spot_type: ParkingSpotType, mask: int) -> int:
+            # Highest share of free spots of this type; O(floors) from the counters
+            best_index, best_ratio = -1, -1.0
+            while mask:
+                lowest_bit = mask & -mask
+                floor_index = lowest_bit.bit_length() - 1
+                allocator = parking_lot.floors[floor_index].allocators[spot_type]
+                ratio = allocator.free_count / allocator.total
+                if ratio > best_ratio:
+                    best_index, best_ratio = floor_index, ratio
+                mask ^= lowest_bit
+            return best_index
+
+        return self._select_from_floors(parking_lot, vehicle, pick_floor_index)
+
+# Keeps a min-heap of free spots by distance for every entry panel and spot
+# type. Occupied spots are dropped lazily when they reach the top, and a
+# released spot is pushed back onto each panel's heap.
+class NearestToEntryPanelStrategy(SpotSelectionStrategy):
+    def __init__(self, distance: Callable[[str, ParkingSpot], float]):
+        self.distance = distance
+        self.heaps: dict[tuple[str, ParkingSpotType], list] = {}
+        self.heap_members: dict[tuple[str, ParkingSpotType], set[str]] = {}
+        self.locks: dict[tuple[str, ParkingSpotType], threading.Lock] = {}
+        self.panel_ids: list[str] = []
+        self.build_lock = threading.Lock()
+        # Breaks distance ties so heap entries never compare spots
+        self.tiebreak = itertools.count()
+
+    def prepare(self, parking_lot: 'ParkingLot') -> None:
+        with self.build_lock:
+            self.panel_ids = [panel.panel_id for panel in parking_lot.entry_panels]
+            for panel_id in self.panel_ids:
+                for spot_type in ParkingSpotType:
+                    heap = []
+                    for floor in parking_lot.floors:
+                        for spot in floor.parking_spots[spot_type]:
+                            if spot.is_free and not spot.is_reserved:
+                                heap.append((self.distance(panel_id, spot), next(self.tiebreak), spot))
+                    heapq.heapify(heap)
+                    key = (panel_id, spot_type)
+                    self.heaps[key] = heap
+                    self.heap_members[key] = {entry[2].spot_id for entry in heap}
+                    self.locks[key] = threading.Lock()
+
+    def select_spot(self, parking_lot: 'ParkingLot', vehicle: Vehicle,
+                    entry_panel_id: Optional[str] = None) -> Optional[ParkingSpot]:
+        if entry_panel_id not in self.panel_ids:
+            return LowestFloorFirstStrategy().select_spot(parking_lot, vehicle)
+        for spot_type in COMPATIBLE_SPOT_TYPES.get(vehicle.get_vehicle_type(), []):
+            key = (entry_panel_id, spot_type)
+            heap, members = self.heaps[key], self.heap_members[key]
+            with self.locks[key]:
+                while heap:
+                    spot = heap[0][2]
+                    if spot.is_free and not spot.is_reserved:
+                        return spot
+                    heapq.heappop(heap)
+                    members.discard(spot.spot_id)
+        return None
+
+    def on_spot_released(self, spot: ParkingSpot) -> None:
+        spot_type = spot.get_parking_spot_type()
+        for panel_id in self.panel_ids:
+            key = (panel_id, spot_type)
+            with self.locks[key]:
+                if spot.spot_id not in self.heap_members[key]:
+                    self.heap_members[key].add(spot.spot_id)
+                    heapq.heappush(self.heaps[key], (self.distance(panel_id, spot), next(self.tiebreak), spot))
+
+# Clock that only moves when told to, for demos and simulations
+class ManualClock:
+    def __init__(self, start: datetime.datetime):
+        self.current = start
+
+    def now(self) -> datetime.datetime:
+        return self.current
+
+    def advance(self, delta: datetime.timedelta) -> None:
+        self.current += delta
+
+    def set(self, moment: datetime.datetime) -> None:
+        self.current = moment
+
 class ParkingLot:
     _instance = None
+    _lock = threading.Lock()
 
     def __new__(cls):
         if not cls._instance:
-            cls._instance = super().__new__(cls)
-            cls._instance.initialize()
+            with cls._lock:
+                if not cls._instance:
+                    instance = super().__new__(cls)
+                    instance.initialize()
+                    cls._instance = instance
         return cls._instance
 
+    @classmethod
+    def reset_instance(cls) -> None:
+        with cls._lock:
+            cls._instance = None
+
+    # Independent lot outside the singleton, so one process can host many sites
+    @classmethod
+    def create(cls, lot_id: Optional[str] = None) -> 'ParkingLot':
+        instance = super().__new__(cls)
+        instance.initialize()
+        instance.lot_id = lot_id
+        return instance
+
     def initialize(self):
+        self.lot_id: Optional[str] = None
         self.floors: list[ParkingFloor] = []
         self.entry_panels: list[EntryPanel] = []
         self.exit_panels: list[ExitPanel] = []
-        self.tickets: dict[str, ParkingTicket] = {}
+        self.entry_panels_by_id: dict[str, EntryPanel] = {}
+        self.exit_panels_by_id: dict[str, ExitPanel] = {}
+        self.ticket_repository = TicketRepository()
+        # Optional write-ahead journal (see journal.py), duck-typed to avoid a cycle
+        self.journal = None
+        # Optional change-event bus (see event_bus.py), same reason
+        self.event_bus = None
+        self.ticket_observers: List[TicketObserver] = []
+        self.spot_selection_strategy: SpotSelectionStrategy = LowestFloorFirstStrategy()
+        # When enabled, every status snapshot is cross-checked against a full recount
+        self.consistency_check = False
+        # Source of entry and exit timestamps; simulations swap in a virtual clock
+        self.clock: Callable[[], datetime.datetime] = datetime.datetime.now
+        # Per spot type, a bitmask of the floor indexes that still have a free spot
+        self.floor_capacity: dict[ParkingSpotType, int] = {
+            spot_type: 0 for spot_type in ParkingSpotType
+        }
+        self.floor_capacity_locks: dict[ParkingSpotType, threading.Lock] = {
+            spot_type: threading.Lock() for spot_type in ParkingSpotType
+        }
 
     def add_floor(self, floor: ParkingFloor) -> None:
+        floor.lot = self
+        floor.floor_index = len(self.floors)
         self.floors.append(floor)
+        for spot_type in ParkingSpotType:
+            with floor.allocators[spot_type].lock:
+                self.update_floor_capacity(floor, spot_type)
+
+    def update_floor_capacity(self, floor: ParkingFloor, spot_type: ParkingSpotType) -> None:
+        floor_bit = 1 << floor.floor_index
+        with self.floor_capacity_locks[spot_type]:
+            if floor.allocators[spot_type].free_count:
+                self.floor_capacity[spot_type] |= floor_bit
+            else:
+                self.floor_capacity[spot_type] &= ~floor_bit
+
+    def get_floors_with_capacity(self, spot_type: ParkingSpotType) -> list[ParkingFloor]:
+        floors = []
+        mask = self.floor_capacity[spot_type]
+        while mask:
+            lowest_bit = mask & -mask
+            floors.append(self.floors[lowest_bit.bit_length() - 1])
+            mask ^= lowest_bit
+        return floors
 
     def add_entry_panel(self, panel: EntryPanel) -> None:
         self.entry_panels.append(panel)
+        self.entry_panels_by_id[panel.panel_id] = panel
 
     def add_exit_panel(self, panel: ExitPanel) -> None:
         self.exit_panels.append(panel)
+        self.exit_panels_by_id[panel.panel_id] = panel
 
-    def find_available_spot(self, vehicle: Vehicle) -> Optional[ParkingSpot]:
+    def get_entry_panel(self, panel_id: str) -> Optional[EntryPanel]:
+        return self.entry_panels_by_id.get(panel_id)
+
+    def get_exit_panel(self, panel_id: str) -> Optional[ExitPanel]:
+        return self.exit_panels_by_id.get(panel_id)
+
+    def get_spot(self, spot_id: str) -> Optional[ParkingSpot]:
         for floor in self.floors:
-            spot = floor.find_available_spot(vehicle)
+            spot = floor.spots_by_id.get(spot_id)
             if spot:
                 return spot
         return None
 
+    def attach_journal(self, journal) -> None:
+        self.journal = journal
+
+    def attach_event_bus(self, event_bus) -> None:
+        self.event_bus = event_bus
+
+    def add_ticket_observer(self, observer: TicketObserver) -> None:
+        # Copy on write, so the gates can iterate without a lock
+        self.ticket_observers = self.ticket_observers + [observer]
+
+    def remove_ticket_observer(self, observer: TicketObserver) -> None:
+        self.ticket_observers = [existing for existing in self.ticket_observers if existing is not observer]
+
+    def set_spot_selection_strategy(self, strategy: SpotSelectionStrategy) -> None:
+        self.spot_selection_strategy = strategy
+
+    def set_clock(self, clock: Callable[[], datetime.datetime]) -> None:
+        self.clock = clock
+
+    def set_fee_policy(self, fee_policy: FeePolicy) -> None:
+        for exit_panel in self.exit_panels:
+            exit_panel.fee_policy = fee_policy
+
+    def find_available_spot(self, vehicle: Vehicle, entry_panel_id: Optional[str] = None) -> Optional[ParkingSpot]:
+        return self.spot_selection_strategy.select_spot(self, vehicle, entry_panel_id)
+
     def issue_ticket(self, vehicle: Vehicle, entry_panel_id: str) -> Optional[ParkingTicket]:
-        entry_panel = next((panel for panel in self.entry_panels if panel.panel_id == entry_panel_id), None)
+        entry_panel = self.get_entry_panel(entry_panel_id)
         if not entry_panel:
             return None
+        if self.ticket_repository.find_by_registration(vehicle.registration_number):
+            return None
 
-        spot = self.find_available_spot(vehicle)
-        if spot:
-            return entry_panel.issue_ticket(vehicle, spot)
-        return None
+        # Optimistic allocation: if another gate takes the candidate spot first,
+        # assign_vehicle fails and we retry with the next free one
+        while True:
+            spot = self.find_available_spot(vehicle, entry_panel_id)
+            if not spot:
+                return None
+            ticket = entry_panel.issue_ticket(vehicle, spot, self.clock())
+            if ticket:
+                break
+        return self._register_ticket(ticket)
+
+    # Parks a vehicle in the spot its reservation is holding
+    def issue_reserved_ticket(self, vehicle: Vehicle, spot: ParkingSpot, hold_id: str,
+                              entry_panel_id: str) -> Optional[ParkingTicket]:
+        entry_panel = self.get_entry_panel(entry_panel_id)
+        if not entry_panel:
+            return None
+        if self.ticket_repository.find_by_registration(vehicle.registration_number):
+            return None
+        ticket = entry_panel.issue_reserved_ticket(vehicle, spot, hold_id, self.clock())
+        if not ticket:
+            return None
+        return self._register_ticket(ticket)
+
+    def _register_ticket(self, ticket: ParkingTicket) -> Optional[ParkingTicket]:
+        # Same vehicle entered through another gate at the same moment
+        if not self.ticket_repository.add(ticket):
+            ticket.spot.remove_vehicle()
+            return None
+        if self.journal:
+            self.journal.record_assign(ticket)
+        for observer in self.ticket_observers:
+            observer.on_ticket_issued(ticket)
+        return ticket
 
     def process_exit(self, ticket_id: str, exit_panel_id: str, payment_type: PaymentType) -> bool:
-        exit_panel = next((panel for panel in self.exit_panels if panel.panel_id == exit_panel_id), None)
+        ticket = self.ticket_repository.get(ticket_id)
+        if not ticket:
+            return False
+        return self.exit_vehicle(ticket, exit_panel_id, PaymentFactory().create_payment(payment_type))
+
+    def process_lost_ticket_exit(self, registration_number: str, exit_panel_id: str,
+                                 payment_type: PaymentType) -> bool:
+        ticket = self.ticket_repository.find_by_registration(registration_number)
+        if not ticket:
+            return False
+        return self.exit_vehicle(ticket, exit_panel_id, PaymentFactory().create_payment(payment_type))
+
+    def exit_vehicle(self, ticket: ParkingTicket, exit_panel_id: str, payment_strategy: PaymentStrategy) -> bool:
+        exit_panel = self.get_exit_panel(exit_panel_id)
         if not exit_panel:
-            return None
-        
-        ticket = self.tickets[ticket_id]
-        return exit_panel.process_exit(ticket, payment_type)
-            
+            return False
+        succeeded = exit_panel.process_exit(ticket, payment_strategy, self.clock())
+        self.record_payment(ticket)
+        if succeeded:
+            self.close_ticket(ticket)
+        return succeeded
+
+    def record_payment(self, ticket: ParkingTicket) -> None:
+        if self.journal and ticket.payment:
+            self.journal.record_payment(ticket)
+
+    def close_ticket(self, ticket: ParkingTicket) -> bool:
+        if not self.ticket_repository.close(ticket):
+            return False
+        if self.journal:
+            self.journal.record_release(ticket)
+        for observer in self.ticket_observers:
+            observer.on_ticket_closed(ticket)
+        return True
+
+    def find_vehicle(self, registration_number: str) -> Optional[ParkingSpot]:
+        ticket = self.ticket_repository.find_by_registration(registration_number)
+        return ticket.spot if ticket else None
+
+
     def get_parking_lot_status(self) -> dict:
+        if self.consistency_check:
+            for floor in self.floors:
+                floor.verify_counters()
         return {
             floor.floor_id: floor.get_parking_spots_status()
             for floor in self.floors
         }
 
+    def get_occupancy_by_spot_type(self) -> dict:
+        occupancy = {}
+        for spot_type in ParkingSpotType:
+            free_count = sum(floor.allocators[spot_type].free_count for floor in self.floors)
+            total_count = sum(floor.allocators[spot_type].total for floor in self.floors)
+            occupancy[spot_type.value] = {
+                "free": free_count,
+                "total": total_count,
+                "occupied": total_count - free_count
+            }
+        return occupancy
+
+    def get_occupancy_ratio(self, spot_type: ParkingSpotType) -> float:
+        total = 0
+        free = 0
+        for floor in self.floors:
+            allocator = floor.allocators[spot_type]
+            total += allocator.total
+            free += allocator.free_count
+        return (total - free) / total if total else 0.0
+
 
 
 ### Client Code
@@ -382,6 +1034,21 @@ class ParkingSpotFactory:
             spot = None
         return spot
 
+class VehicleFactory:
+    def create_vehicle(self, vehicle_type: VehicleType, registration_number: str) -> Vehicle:
+        if vehicle_type == VehicleType.CAR:
+            vehicle = Car(registration_number)
+        elif vehicle_type == VehicleType.TRUCK:
+            vehicle = Truck(registration_number)
+        elif vehicle_type == VehicleType.VAN:
+            vehicle = Van(registration_number)
+        elif vehicle_type == VehicleType.MOTORCYCLE:
+            vehicle = Motorcycle(registration_number)
+        else:
+            print("Invalid vehicle type")
+            vehicle = None
+        return vehicle
+
 class PaymentFactory:
     def create_payment(self, payment_type: PaymentType) -> Payment:
         if payment_type == PaymentType.CREDIT_CARD:
@@ -392,30 +1059,33 @@ class PaymentFactory:
             payment = CashPayment()
         elif payment_type == PaymentType.UPI:
             payment = UPIPayment()
+        elif payment_type == PaymentType.INVOICE:
+            payment = InvoicePayment()
         else:
             print("Invalid payment type")
             payment = None
         return payment
 
-def setup_parking_lot() -> ParkingLot:
-    parking_lot = ParkingLot()
+def setup_parking_lot(num_floors: int = 3, spots_per_type: int = 2, num_panels: int = 2,
+                      parking_lot: Optional[ParkingLot] = None) -> ParkingLot:
+    parking_lot = parking_lot or ParkingLot()
 
     # Add entry and exit panels
-    for i in range(2):
+    for i in range(num_panels):
         entry_panel = EntryPanel(f"ENTRY-{i+1}")
         exit_panel = ExitPanel(f"EXIT-{i+1}")
         parking_lot.add_entry_panel(entry_panel)
         parking_lot.add_exit_panel(exit_panel)
 
     # Create floors
-    for floor_num in range(3):
+    for floor_num in range(num_floors):
         floor = ParkingFloor(f"Floor-{floor_num + 1}")
 
         # Add different types of spots to each floor
         spot_distribution = {
-            ParkingSpotType.COMPACT: 2,
-            ParkingSpotType.LARGE: 2,
-            ParkingSpotType.MOTORCYCLE: 2
+            ParkingSpotType.COMPACT: spots_per_type,
+            ParkingSpotType.LARGE: spots_per_type,
+            ParkingSpotType.MOTORCYCLE: spots_per_type
         }
         for spot_type, count in spot_distribution.items():
             for i in range(count):
@@ -429,6 +1099,8 @@ def setup_parking_lot() -> ParkingLot:
 
 def simulate_parking_scenario():
     parking_lot = setup_parking_lot()
+    clock = ManualClock(datetime.datetime.now())
+    parking_lot.set_clock(clock.now)
     issued_tickets = []
     
     # Create various vehicles
@@ -458,11 +1130,12 @@ def simulate_parking_scenario():
         try:
             ticket = parking_lot.issue_ticket(vehicle, "ENTRY-1")
             if ticket:
-                parking_lot.tickets[ticket.ticket_id] = ticket  # Store ticket in parking lot
                 issued_tickets.append(ticket)
                 print(f"✅ Parked {vehicle.get_vehicle_type().value} - ({vehicle.registration_number})")
                 print(f"   Ticket ID: {ticket.ticket_id}")
                 print(f"   Spot ID: {ticket.spot.spot_id}")
+            elif parking_lot.find_vehicle(vehicle.registration_number):
+                print(f"❌ {vehicle.registration_number} is already parked (re-entry rejected)")
             else:
                 print(f"❌ No parking space available for {vehicle.get_vehicle_type().value} - ({vehicle.registration_number})")
         except Exception as e:
@@ -476,14 +1149,15 @@ def simulate_parking_scenario():
     print("\nProcessing Exits")
     print("-" * 50)
 
-    # Wait for some time to simulate parking duration
-    time.sleep(2)  # Simulate 2 seconds of parking time
+    # Move the lot's clock forward instead of sleeping
+    clock.advance(datetime.timedelta(hours=2, minutes=15))
     
     for ticket in issued_tickets[:3]:  # Process exit for first 3 vehicles
-        payment_type = random.choice(list(PaymentType))
-        payment_strategy = PaymentFactory().create_payment(payment_type)
+        # Invoicing is for registry accounts, not walk-up drivers
+        payment_type = random.choice([payment_type for payment_type in PaymentType
+                                      if payment_type != PaymentType.INVOICE])
         try:
-            success = parking_lot.exit_panels[0].process_exit(ticket, payment_strategy)
+            success = parking_lot.process_exit(ticket.ticket_id, "EXIT-1", payment_type)
             if success:
                 print(f"✅ Exit processed for vehicle {ticket.vehicle.registration_number}")
                 print(f"   Payment Type: {payment_type.value}")
@@ -0,0 +1,347 @@
+# Occupancy history: a bounded time-series store fed by ticket events.
+#
+# Every issued and closed ticket is counted into ring buffers of fixed-width
+# buckets, one ring per rollup (1 minute for 25 hours, 1 hour for 90 days,
+# 1 day for two years by default) for its floor and spot type, its floor,
+# its spot type and the whole lot. Each bucket keeps entries, exits,
+# revenue and peak occupancy; the occupancy at the end of a bucket is not
+# stored but derived at query time from the current level minus the net
+# arrivals after it. Old buckets are overwritten in place, so memory depends
+# on the number of floors and the rollups, never on uptime.
+#
+# Run from the repository root:
+#   python -m low_level_design.parking_lot.occupancy_history
+
+import datetime
+import random
+import threading
+from array import array
+from typing import NamedTuple, Optional
+
+from low_level_design.parking_lot.fee_engine import EPOCH, to_microseconds
+from low_level_design.parking_lot.my_parking_lot import (
+    ManualClock,
+    ParkingLot,
+    ParkingSpotType,
+    ParkingTicket,
+    PaymentStrategy,
+    TicketObserver,
+    VehicleFactory,
+    VehicleType,
+    setup_parking_lot,
+)
+
+
+MICROSECONDS_PER_MINUTE = 60 * 10**6
+
+
+class Rollup(NamedTuple):
+    minutes: int  # bucket width
+    buckets: int  # buckets retained
+
+
+# The minute rollup keeps a day and an hour, so a trailing 24 hour window
+# is always answered at minute resolution
+DEFAULT_ROLLUPS = (
+    Rollup(1, 25 * 60),
+    Rollup(60, 90 * 24),
+    Rollup(24 * 60, 2 * 366),
+)
+
+
+class HistoryPoint(NamedTuple):
+    start: datetime.datetime
+    entries: int
+    exits: int
+    revenue: float
+    occupied: int  # at the end of the bucket
+    peak_occupied: int
+
+
+# (floor id or None, spot type or None); None aggregates over that dimension
+SeriesKey = tuple[Optional[str], Optional[ParkingSpotType]]
+
+
+class RingSeries:
+    def __init__(self, rollup: Rollup):
+        self.width = rollup.minutes
+        self.size = rollup.buckets
+        # Bucket number held by each slot; a slot with another stamp is empty
+        self.stamps = array('q', [-1]) * self.size
+        self.entries = array('i', [0]) * self.size
+        self.exits = array('i', [0]) * self.size
+        self.revenue = array('d', [0.0]) * self.size
+        self.peaks = array('i', [0]) * self.size
+        self.latest = -1
+
+    def memory_bytes(self) -> int:
+        return sum(column.itemsize * len(column)
+                   for column in (self.stamps, self.entries, self.exits, self.revenue, self.peaks))
+
+    def _slot(self, bucket: int) -> int:
+        # Already overwritten by newer buckets
+        if bucket <= self.latest - self.size:
+            return -1
+        slot = bucket % self.size
+        if self.stamps[slot] != bucket:
+            self.stamps[slot] = bucket
+            self.entries[slot] = 0
+            self.exits[slot] = 0
+            self.revenue[slot] = 0.0
+            self.peaks[slot] = 0
+        if bucket > self.latest:
+            self.latest = bucket
+        return slot
+
+    def add(self, minute: int, entries: int, exits: int, revenue: float, peak: int) -> None:
+        bucket = minute // self.width
+        slot = self._slot(bucket)
+        if slot < 0:
+            return
+        self.entries[slot] += entries
+        self.exits[slot] += exits
+        self.revenue[slot] += revenue
+        # A late event's level is today's, not the bucket's, so only in-order events move the peak
+        if bucket == self.latest and peak > self.peaks[slot]:
+            self.peaks[slot] = peak
+
+    # Rows of (bucket, entries, exits, revenue, occupied, peak) for buckets
+    # first..last, given the occupancy level now
+    def rows(self, first: int, last: int, level: int) -> list[tuple]:
+        rows = []
+        closing = level
+        stamps, entries, exits, revenue, peaks = self.stamps, self.entries, self.exits, self.revenue, self.peaks
+        # Walk back from the newest bucket: each bucket closes at the level
+        # left after undoing the arrivals and departures that came later
+        for bucket in range(max(last, self.latest), first - 1, -1):
+            slot = bucket % self.size
+            if stamps[slot] == bucket:
+                opening = closing - entries[slot] + exits[slot]
+                if bucket <= last:
+                    rows.append((bucket, entries[slot], exits[slot], revenue[slot], closing,
+                                 max(peaks[slot], opening, closing)))
+                closing = opening
+            elif bucket <= last:
+                rows.append((bucket, 0, 0, 0.0, closing, closing))
+        rows.reverse()
+        return rows
+
+
+# One floor / spot type / whole-lot series: its current level, the minute
+# still being counted, and a ring per rollup. Events only touch the pending
+# minute; it is folded into every ring when the next minute starts or a
+# query needs it, so a busy minute costs one ring write per rollup in total.
+class Series:
+    def __init__(self, rollups: tuple[Rollup, ...]):
+        self.rings = [RingSeries(rollup) for rollup in rollups]
+        self.level = 0
+        self.pending_minute = -1
+        self.pending_entries = 0
+        self.pending_exits = 0
+        self.pending_revenue = 0.0
+        self.pending_peak = 0
+
+    def flush(self) -> None:
+        if not (self.pending_entries or self.pending_exits):
+            return
+        for ring in self.rings:
+            ring.add(self.pending_minute, self.pending_entries, self.pending_exits, self.pending_revenue,
+                     self.pending_peak)
+        self.pending_entries = 0
+        self.pending_exits = 0
+        self.pending_revenue = 0.0
+        self.pending_peak = 0
+
+    def record(self, minute: int, delta: int, amount: float) -> None:
+        if minute != self.pending_minute:
+            self.flush()
+            self.pending_minute = minute
+        level = self.level + delta
+        self.level = level
+        if delta > 0:
+            self.pending_entries += 1
+            if level > self.pending_peak:
+                self.pending_peak = level
+        else:
+            self.pending_exits += 1
+            self.pending_revenue += amount
+
+
+class OccupancyHistory(TicketObserver):
+    def __init__(self, rollups: tuple[Rollup, ...] = DEFAULT_ROLLUPS):
+        self.rollups = tuple(sorted(rollups))
+        self.series: dict[SeriesKey, Series] = {}
+        # (floor id, spot type) -> the four series an event for it updates
+        self.targets: dict[tuple[str, ParkingSpotType], list[Series]] = {}
+        # Same lists by spot id; enum members hash slowly, strings do not
+        self.targets_by_spot: dict[str, list[Series]] = {}
+        self.capacity: dict[SeriesKey, int] = {}
+        self.first_minute: Optional[int] = None
+        self.latest_minute = -1
+        self.parking_lot: Optional[ParkingLot] = None
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _keys(floor_id: str, spot_type: ParkingSpotType) -> tuple[SeriesKey, ...]:
+        return (floor_id, spot_type), (floor_id, None), (None, spot_type), (None, None)
+
+    # Starts recording; vehicles already parked count as the starting occupancy
+    def attach(self, parking_lot: ParkingLot) -> None:
+        with self.lock:
+            for floor in parking_lot.floors:
+                for spot_type, allocator in floor.allocators.items():
+                    for key in self._keys(floor.floor_id, spot_type):
+                        self.capacity[key] = self.capacity.get(key, 0) + allocator.total
+            for ticket in list(parking_lot.ticket_repository.tickets_by_id.values()):
+                for series in self._targets(ticket.spot.floor_id, ticket.spot.get_parking_spot_type()):
+                    series.level += 1
+            self.first_minute = to_microseconds(parking_lot.clock()) // MICROSECONDS_PER_MINUTE
+            self.parking_lot = parking_lot
+        parking_lot.add_ticket_observer(self)
+
+    def on_ticket_issued(self, ticket: ParkingTicket):
+        self._record(ticket, ticket.entry_time, 1, 0.0)
+
+    def on_ticket_closed(self, ticket: ParkingTicket):
+        amount = ticket.payment.amount if ticket.payment else 0.0
+        self._record(ticket, ticket.exit_time or ticket.entry_time, -1, amount)
+
+    def _record(self, ticket: ParkingTicket, moment: datetime.datetime, delta: int, amount: float) -> None:
+        minute = to_microseconds(moment) // MICROSECONDS_PER_MINUTE
+        spot = ticket.spot
+        with self.lock:
+            if self.first_minute is None:
+                self.first_minute = minute
+            if minute > self.latest_minute:
+                self.latest_minute = minute
+            targets = self.targets_by_spot.get(spot.spot_id)
+            if targets is None:
+                targets = self._targets(spot.floor_id, spot.get_parking_spot_type())
+                self.targets_by_spot[spot.spot_id] = targets
+            for series in targets:
+                series.record(minute, delta, amount)
+
+    def _targets(self, floor_id: str, spot_type: ParkingSpotType) -> list[Series]:
+        targets = self.targets.get((floor_id, spot_type))
+        if targets is None:
+            targets = []
+            for key in self._keys(floor_id, spot_type):
+                if key not in self.series:
+                    self.series[key] = Series(self.rollups)
+                targets.append(self.series[key])
+            self.targets[(floor_id, spot_type)] = targets
+        return targets
+
+    # Quiet periods still count: the range runs up to the lot's clock, not the last event
+    def _now_minute(self) -> int:
+        if not self.parking_lot:
+            return self.latest_minute
+        return max(self.latest_minute, to_microseconds(self.parking_lot.clock()) // MICROSECONDS_PER_MINUTE)
+
+    def _rollup_index(self, first_minute: int, now_minute: int, resolution: Optional[datetime.timedelta]) -> int:
+        if resolution is not None:
+            minutes = resolution // datetime.timedelta(minutes=1)
+            for index, rollup in enumerate(self.rollups):
+                if rollup.minutes == minutes:
+                    return index
+            raise ValueError(f"No rollup at {resolution} resolution")
+        # Finest rollup that still retains the start of the range
+        for index, rollup in enumerate(self.rollups):
+            if first_minute // rollup.minutes > now_minute // rollup.minutes - rollup.buckets:
+                return index
+        return len(self.rollups) - 1
+
+    # Buckets covering [start, end), clipped to what is recorded and retained
+    def query(self, start: datetime.datetime, end: datetime.datetime, floor_id: Optional[str] = None,
+              spot_type: Optional[ParkingSpotType] = None,
+              resolution: Optional[datetime.timedelta] = None) -> list[HistoryPoint]:
+        key = (floor_id, spot_type)
+        with self.lock:
+            if self.first_minute is None:
+                return []
+            now_minute = self._now_minute()
+            start_minute = max(to_microseconds(start) // MICROSECONDS_PER_MINUTE, self.first_minute)
+            end_minute = min((to_microseconds(end) - 1) // MICROSECONDS_PER_MINUTE, now_minute)
+            index = self._rollup_index(start_minute, now_minute, resolution)
+            rollup = self.rollups[index]
+            first = max(start_minute // rollup.minutes, now_minute // rollup.minutes - rollup.buckets + 1)
+            last = end_minute // rollup.minutes
+            if last < first:
+                return []
+            series = self.series.get(key)
+            if series:
+                series.flush()
+                rows = series.rings[index].rows(first, last, series.level)
+            else:
+                rows = [(bucket, 0, 0, 0.0, 0, 0) for bucket in range(first, last + 1)]
+        width = datetime.timedelta(minutes=rollup.minutes)
+        return [HistoryPoint(EPOCH + bucket * width, entries, exits, round(revenue, 2), occupied, peak)
+                for bucket, entries, exits, revenue, occupied, peak in rows]
+
+    def occupancy_curve(self, start: datetime.datetime, end: datetime.datetime, floor_id: Optional[str] = None,
+                        spot_type: Optional[ParkingSpotType] = None,
+                        resolution: Optional[datetime.timedelta] = None) -> list[tuple[datetime.datetime, float]]:
+        capacity = self.capacity.get((floor_id, spot_type), 0)
+        return [(point.start, point.occupied / capacity if capacity else 0.0)
+                for point in self.query(start, end, floor_id, spot_type, resolution)]
+
+    # Vehicles that left per spot over the range
+    def turnover(self, start: datetime.datetime, end: datetime.datetime, floor_id: Optional[str] = None,
+                 spot_type: Optional[ParkingSpotType] = None) -> float:
+        capacity = self.capacity.get((floor_id, spot_type), 0)
+        exits = sum(point.exits for point in self.query(start, end, floor_id, spot_type))
+        return exits / capacity if capacity else 0.0
+
+    def revenue_per_hour(self, start: datetime.datetime, end: datetime.datetime, floor_id: Optional[str] = None,
+                         spot_type: Optional[ParkingSpotType] = None) -> list[tuple[datetime.datetime, float]]:
+        return [(point.start, point.revenue)
+                for point in self.query(start, end, floor_id, spot_type, datetime.timedelta(hours=1))]
+
+    def memory_bytes(self) -> int:
+        with self.lock:
+            return sum(ring.memory_bytes() for series in self.series.values() for ring in series.rings)
+
+
+class _DemoPayment(PaymentStrategy):
+    def process_payment(self, amount: float) -> bool:
+        return True
+
+
+if __name__ == "__main__":
+    ParkingLot.reset_instance()
+    parking_lot = setup_parking_lot(num_floors=2, spots_per_type=20, num_panels=2)
+    day_start = datetime.datetime(2024, 5, 6)
+    clock = ManualClock(day_start)
+    parking_lot.set_clock(clock.now)
+    history = OccupancyHistory()
+    history.attach(parking_lot)
+
+    # A day of car traffic: busy mornings and evenings, quiet nights
+    rng = random.Random(7)
+    vehicle_factory = VehicleFactory()
+    payment = _DemoPayment()
+    parked: list[ParkingTicket] = []
+    for minute in range(24 * 60):
+        clock.set(day_start + datetime.timedelta(minutes=minute))
+        hour = minute // 60
+        arrival_chance = 0.5 if 8 <= hour < 10 or 17 <= hour < 19 else 0.15 if 7 <= hour < 22 else 0.02
+        if rng.random() < arrival_chance:
+            ticket = parking_lot.issue_ticket(vehicle_factory.create_vehicle(VehicleType.CAR, f"Car-{minute}"),
+                                              "ENTRY-1")
+            if ticket:
+                parked.append(ticket)
+        if parked and rng.random() < len(parked) / 90:
+            parking_lot.exit_vehicle(parked.pop(rng.randrange(len(parked))), "EXIT-1", payment)
+
+    day_end = day_start + datetime.timedelta(days=1)
+    print("Compact occupancy and revenue by hour")
+    print("-" * 50)
+    curve = dict(history.occupancy_curve(day_start, day_end, spot_type=ParkingSpotType.COMPACT,
+                                         resolution=datetime.timedelta(hours=1)))
+    for hour_start, revenue in history.revenue_per_hour(day_start, day_end):
+        print(f"{hour_start:%H:%M}  {curve[hour_start]:>5.0%}  {'#' * round(curve[hour_start] * 40):<40} ₹{revenue:>8.2f}")
+    print(f"Turnover: {history.turnover(day_start, day_end, spot_type=ParkingSpotType.COMPACT):.1f} "
+          f"vehicles per compact spot")
+    peak = max(history.query(day_start, day_end, floor_id="Floor-1"), key=lambda point: point.peak_occupied)
+    print(f"Floor-1 peak: {peak.peak_occupied} vehicles at {peak.start:%H:%M}")
+    print(f"History memory: {history.memory_bytes() / 1024:.0f} KiB")
@@ -0,0 +1,237 @@
+# Dynamic pricing: peak windows, daily caps, grace periods and occupancy surge.
+#
+# TariffRules describes a tariff the way an operator writes it. compile()
+# turns it into CompiledTariff, which holds only lookup tables:
+#   - a per-minute rate table over one week and its prefix sums
+#   - per weekday, the cost of a full day with the daily cap applied
+#   - the sorted surge tier thresholds, bisected with the occupancy
+# A quote then costs a few divmods and table lookups, however many peak
+# windows or surge tiers the tariff has.
+#
+# Timestamps are naive wall-clock datetimes, as ParkingTicket stores them.
+#
+# Run from the repository root:
+#   python -m low_level_design.parking_lot.pricing
+
+import bisect
+import datetime
+from array import array
+from typing import NamedTuple, Optional
+
+from low_level_design.parking_lot.fee_engine import to_microseconds
+from low_level_design.parking_lot.my_parking_lot import (
+    SPOT_TYPE_CODES,
+    SPOT_TYPES,
+    Car,
+    FeePolicy,
+    HourlyCost,
+    Motorcycle,
+    ParkingLot,
+    ParkingSpotType,
+    ParkingTicket,
+    PaymentType,
+    setup_parking_lot,
+)
+
+
+MICROSECONDS_PER_MINUTE = 60 * 10**6
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+MICROSECONDS_PER_DAY = MINUTES_PER_DAY * MICROSECONDS_PER_MINUTE
+# 1970-01-01 was a Thursday
+EPOCH_WEEKDAY = 3
+
+
+# Rates are multiplied between start and end on the given weekdays (Monday is 0).
+# A window with end <= start runs past midnight into the next day; a multiplier
+# below 1 makes it an off-peak discount.
+class PeakWindow(NamedTuple):
+    start: datetime.time
+    end: datetime.time
+    multiplier: float
+    weekdays: tuple[int, ...] = tuple(range(7))
+
+
+# Applies while the share of occupied spots of the type is at least min_occupancy
+class SurgeTier(NamedTuple):
+    min_occupancy: float
+    multiplier: float
+
+
+class TariffRules:
+    def __init__(self, hourly_rates: Optional[dict[ParkingSpotType, float]] = None,
+                 peak_windows: tuple[PeakWindow, ...] = (),
+                 daily_caps: Optional[dict[ParkingSpotType, float]] = None,
+                 grace_minutes: int = 0,
+                 surge_tiers: tuple[SurgeTier, ...] = ()):
+        hourly_cost = HourlyCost()
+        self.hourly_rates = hourly_rates or {spot_type: hourly_cost.get_cost(spot_type) for spot_type in SPOT_TYPES}
+        self.peak_windows = list(peak_windows)
+        self.daily_caps = daily_caps or {}
+        # Stays up to the grace period are free; longer stays pay for the whole stay
+        self.grace_minutes = grace_minutes
+        self.surge_tiers = sorted(surge_tiers)
+
+    def _minute_multipliers(self) -> list[float]:
+        # None until a window covers the minute, so a discount window is not
+        # lost to the base rate
+        multipliers: list[Optional[float]] = [None] * MINUTES_PER_WEEK
+        for window in self.peak_windows:
+            start = window.start.hour * 60 + window.start.minute
+            end = window.end.hour * 60 + window.end.minute
+            length = (end - start) % MINUTES_PER_DAY or MINUTES_PER_DAY
+            for weekday in window.weekdays:
+                for minute in range(weekday * MINUTES_PER_DAY + start,
+                                    weekday * MINUTES_PER_DAY + start + length):
+                    minute %= MINUTES_PER_WEEK
+                    # Overlapping windows do not stack; the highest multiplier wins
+                    covering = multipliers[minute]
+                    multipliers[minute] = (window.multiplier if covering is None
+                                           else max(covering, window.multiplier))
+        return [1.0 if multiplier is None else multiplier for multiplier in multipliers]
+
+    def compile(self) -> 'CompiledTariff':
+        return CompiledTariff(self)
+
+
+class CompiledTariff:
+    def __init__(self, rules: TariffRules):
+        self.grace_microseconds = rules.grace_minutes * MICROSECONDS_PER_MINUTE
+        self.surge_multipliers = [1.0] + [tier.multiplier for tier in rules.surge_tiers]
+        # Compared as given: rounding occupancy to a percent first would put
+        # 29/100 (0.28999... * 100) below a 29% threshold
+        self.surge_thresholds = [tier.min_occupancy for tier in rules.surge_tiers]
+
+        minute_multipliers = rules._minute_multipliers()
+        self.minute_costs: list[array] = []
+        self.minute_prefix: list[array] = []
+        self.day_costs: list[list[float]] = []
+        # [spot type code][surge tier]: capped cost of full days, prefix-summed over the week
+        self.capped_day_prefix: list[list[array]] = []
+        for spot_type in SPOT_TYPES:
+            minute_rate = rules.hourly_rates[spot_type] / 60
+            minute_costs = array('d', (minute_rate * multiplier for multiplier in minute_multipliers))
+            minute_prefix = array('d', [0.0])
+            for cost in minute_costs:
+                minute_prefix.append(minute_prefix[-1] + cost)
+            day_costs = [minute_prefix[(weekday + 1) * MINUTES_PER_DAY] - minute_prefix[weekday * MINUTES_PER_DAY]
+                         for weekday in range(7)]
+            daily_cap = rules.daily_caps.get(spot_type, float("inf"))
+            capped_prefixes = []
+            for surge_multiplier in self.surge_multipliers:
+                capped_prefix = array('d', [0.0])
+                for day_cost in day_costs:
+                    capped_prefix.append(capped_prefix[-1] + min(day_cost * surge_multiplier, daily_cap))
+                capped_prefixes.append(capped_prefix)
+            self.minute_costs.append(minute_costs)
+            self.minute_prefix.append(minute_prefix)
+            self.day_costs.append(day_costs)
+            self.capped_day_prefix.append(capped_prefixes)
+        self.daily_caps = [rules.daily_caps.get(spot_type, float("inf")) for spot_type in SPOT_TYPES]
+
+    # Index into surge_multipliers: how many tiers' min_occupancy the occupancy reaches
+    def surge_tier(self, occupancy: float) -> int:
+        return bisect.bisect_right(self.surge_thresholds, occupancy)
+
+    # Day number since the epoch, its weekday, and the cost from midnight up to the moment
+    def _day_position(self, moment_us: int, spot_type_code: int) -> tuple[int, int, float]:
+        day, within_day = divmod(moment_us, MICROSECONDS_PER_DAY)
+        weekday = (day + EPOCH_WEEKDAY) % 7
+        minute, within_minute = divmod(within_day, MICROSECONDS_PER_MINUTE)
+        week_minute = weekday * MINUTES_PER_DAY + minute
+        minute_prefix = self.minute_prefix[spot_type_code]
+        cost = (minute_prefix[week_minute] - minute_prefix[weekday * MINUTES_PER_DAY]
+                + within_minute / MICROSECONDS_PER_MINUTE * self.minute_costs[spot_type_code][week_minute])
+        return day, weekday, cost
+
+    # Capped cost of every full day from day 0 up to (not including) the given day
+    def _capped_days_before(self, day: int, spot_type_code: int, surge_tier: int) -> float:
+        capped_prefix = self.capped_day_prefix[spot_type_code][surge_tier]
+        weeks, weekday = divmod(day + EPOCH_WEEKDAY, 7)
+        return weeks * capped_prefix[7] + capped_prefix[weekday]
+
+    def quote_microseconds(self, entry_us: int, exit_us: int, spot_type_code: int, occupancy: float = 0.0) -> float:
+        if exit_us - entry_us <= self.grace_microseconds:
+            return 0.0
+        surge_tier = self.surge_tier(occupancy)
+        surge_multiplier = self.surge_multipliers[surge_tier]
+        daily_cap = self.daily_caps[spot_type_code]
+        entry_day, entry_weekday, entry_cost = self._day_position(entry_us, spot_type_code)
+        exit_day, _, exit_cost = self._day_position(exit_us, spot_type_code)
+        if entry_day == exit_day:
+            amount = min((exit_cost - entry_cost) * surge_multiplier, daily_cap)
+        else:
+            first_day = (self.day_costs[spot_type_code][entry_weekday] - entry_cost) * surge_multiplier
+            full_days = (self._capped_days_before(exit_day, spot_type_code, surge_tier)
+                         - self._capped_days_before(entry_day + 1, spot_type_code, surge_tier))
+            amount = min(first_day, daily_cap) + full_days + min(exit_cost * surge_multiplier, daily_cap)
+        return round(amount, 2)
+
+    def quote(self, entry_time: datetime.datetime, exit_time: datetime.datetime, spot_type: ParkingSpotType,
+              occupancy: float = 0.0) -> float:
+        return self.quote_microseconds(to_microseconds(entry_time), to_microseconds(exit_time),
+                                       SPOT_TYPE_CODES[spot_type], occupancy)
+
+
+# Plugs a compiled tariff into the exit panels; surge follows the lot's
+# occupancy of the ticket's spot type at the moment of the quote
+class DynamicPricingPolicy(FeePolicy):
+    def __init__(self, tariff: CompiledTariff, parking_lot: ParkingLot):
+        self.tariff = tariff
+        self.parking_lot = parking_lot
+
+    def calculate_fee(self, ticket: ParkingTicket) -> float:
+        if not ticket.exit_time:
+            ticket.exit_time = datetime.datetime.now()
+        spot_type = ticket.spot.get_parking_spot_type()
+        return self.tariff.quote(ticket.entry_time, ticket.exit_time, spot_type,
+                                 self.parking_lot.get_occupancy_ratio(spot_type))
+
+
+def weekday_rush_hours() -> TariffRules:
+    weekdays = tuple(range(5))
+    return TariffRules(
+        peak_windows=(
+            PeakWindow(datetime.time(8), datetime.time(10), 1.5, weekdays),
+            PeakWindow(datetime.time(17), datetime.time(20), 1.5, weekdays),
+            PeakWindow(datetime.time(22), datetime.time(6), 0.5),
+        ),
+        daily_caps={
+            ParkingSpotType.MOTORCYCLE: 120.0,
+            ParkingSpotType.COMPACT: 250.0,
+            ParkingSpotType.LARGE: 400.0,
+        },
+        grace_minutes=15,
+        surge_tiers=(SurgeTier(0.8, 1.25), SurgeTier(0.95, 1.5)),
+    )
+
+
+if __name__ == "__main__":
+    tariff = weekday_rush_hours().compile()
+    monday_morning = datetime.datetime(2024, 5, 6, 8, 0)
+    stays = {
+        "10 minutes (grace)": datetime.timedelta(minutes=10),
+        "2 hours, rush hour": datetime.timedelta(hours=2),
+        "working day (capped)": datetime.timedelta(hours=14),
+        "three days (capped)": datetime.timedelta(days=3),
+    }
+    print("Compact spot quotes from Monday 08:00")
+    print("-" * 50)
+    for name, stay in stays.items():
+        calm = tariff.quote(monday_morning, monday_morning + stay, ParkingSpotType.COMPACT)
+        busy = tariff.quote(monday_morning, monday_morning + stay, ParkingSpotType.COMPACT, occupancy=0.97)
+        print(f"{name:<20} ₹{calm:>8.2f}   at 97% occupancy ₹{busy:>8.2f}")
+
+    ParkingLot.reset_instance()
+    parking_lot = setup_parking_lot(num_floors=1, spots_per_type=2, num_panels=1)
+    parking_lot.set_fee_policy(DynamicPricingPolicy(tariff, parking_lot))
+    moto_ticket = parking_lot.issue_ticket(Motorcycle("Moto-001"), "ENTRY-1")
+    parking_lot.issue_ticket(Motorcycle("Moto-002"), "ENTRY-1")
+    ticket = parking_lot.issue_ticket(Car("Car-001"), "ENTRY-1")
+    for parked in (ticket, moto_ticket):
+        parked.entry_time -= datetime.timedelta(hours=3)
+        spot_type = parked.spot.get_parking_spot_type()
+        occupancy = parking_lot.get_occupancy_ratio(spot_type)
+        parking_lot.process_exit(parked.ticket_id, "EXIT-1", PaymentType.CASH)
+        print(f"{parked.vehicle.registration_number} after 3 hours ({spot_type.value}, {occupancy:.0%} occupied): "
+              f"₹{parked.payment.amount:.2f}")
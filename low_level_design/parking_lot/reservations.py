@@ -0,0 +1,246 @@
+# Spot reservations with expiring holds.
+#
+# A reservation places a hold on a free spot: the spot leaves its floor's
+# free list (so spot selection skips it at no cost) until the vehicle checks
+# in, the reservation is cancelled, or its TTL runs out. Expiry runs on a
+# hierarchical timer wheel: scheduling and cancelling are O(1), and each
+# hold is touched at most once per wheel level before it fires, so expiring
+# any number of holds is O(1) amortized instead of a scan over spots.
+#
+# Run from the repository root:
+#   python -m low_level_design.parking_lot.reservations
+
+import datetime
+import itertools
+import threading
+from typing import Callable, Generic, NamedTuple, Optional, TypeVar
+
+from low_level_design.parking_lot.my_parking_lot import (
+    Car,
+    ManualClock,
+    ParkingLot,
+    ParkingSpot,
+    ParkingTicket,
+    Vehicle,
+    setup_parking_lot,
+)
+
+
+T = TypeVar("T")
+
+SLOT_BITS = 6
+SLOTS = 1 << SLOT_BITS
+SLOT_MASK = SLOTS - 1
+
+
+class _Timer(NamedTuple):
+    timer_id: int
+    expires: int
+    payload: object
+
+
+# Level l has SLOTS slots of SLOTS ** l ticks each. A timer lives on the
+# lowest level whose range covers it and moves one level down each time its
+# slot comes round, until it fires from level 0.
+class HierarchicalTimerWheel(Generic[T]):
+    def __init__(self, levels: int = 4, start_tick: int = 0):
+        self.levels = levels
+        self.current_tick = start_tick
+        self.wheels: list[list[dict[int, _Timer]]] = [[{} for _ in range(SLOTS)] for _ in range(levels)]
+        self.level_counts = [0] * levels
+        # timer_id -> (level, slot), for O(1) cancel
+        self.locations: dict[int, tuple[int, int]] = {}
+        # Timers already due when placed; they fire on the next advance
+        self.overdue: dict[int, _Timer] = {}
+        self.ids = itertools.count(1)
+        self.max_delta = (1 << (SLOT_BITS * levels)) - 1
+
+    def __len__(self) -> int:
+        return len(self.locations) + len(self.overdue)
+
+    def schedule(self, expires_tick: int, payload: T) -> int:
+        timer = _Timer(next(self.ids), expires_tick, payload)
+        self._place(timer)
+        return timer.timer_id
+
+    def _place(self, timer: _Timer) -> None:
+        delta = timer.expires - self.current_tick
+        if delta <= 0:
+            self.overdue[timer.timer_id] = timer
+            return
+        # Past the top level's range: park it as far out as possible and re-place it on cascade
+        expires = timer.expires if delta <= self.max_delta else self.current_tick + self.max_delta
+        level = 0
+        while delta >= 1 << (SLOT_BITS * (level + 1)) and level < self.levels - 1:
+            level += 1
+        slot = (expires >> (SLOT_BITS * level)) & SLOT_MASK
+        self.wheels[level][slot][timer.timer_id] = timer
+        self.level_counts[level] += 1
+        self.locations[timer.timer_id] = (level, slot)
+
+    def cancel(self, timer_id: int) -> bool:
+        location = self.locations.pop(timer_id, None)
+        if location is None:
+            return self.overdue.pop(timer_id, None) is not None
+        level, slot = location
+        del self.wheels[level][slot][timer_id]
+        self.level_counts[level] -= 1
+        return True
+
+    def _take_slot(self, level: int, slot: int) -> list[_Timer]:
+        timers = list(self.wheels[level][slot].values())
+        self.wheels[level][slot].clear()
+        self.level_counts[level] -= len(timers)
+        for timer in timers:
+            del self.locations[timer.timer_id]
+        return timers
+
+    # Returns the payloads of every timer that expired up to and including tick
+    def advance(self, tick: int) -> list[T]:
+        expired = [timer.payload for timer in self.overdue.values()]
+        self.overdue.clear()
+        while self.current_tick < tick:
+            if not self.locations:
+                self.current_tick = tick
+                break
+            if self.level_counts[0] == 0:
+                # Nothing fires before the next level-1 boundary, so jump to it
+                next_boundary = (self.current_tick | SLOT_MASK) + 1
+                if next_boundary > tick:
+                    self.current_tick = tick
+                    break
+                self.current_tick = next_boundary - 1
+            self.current_tick += 1
+            for level in range(self.levels - 1, 0, -1):
+                if self.current_tick & ((1 << (SLOT_BITS * level)) - 1) == 0:
+                    slot = (self.current_tick >> (SLOT_BITS * level)) & SLOT_MASK
+                    for timer in self._take_slot(level, slot):
+                        self._place(timer)
+            expired.extend(timer.payload for timer in self._take_slot(0, self.current_tick & SLOT_MASK))
+            # Timers re-placed on cascade may already be due
+            expired.extend(timer.payload for timer in self.overdue.values())
+            self.overdue.clear()
+        return expired
+
+
+class Reservation:
+    def __init__(self, reservation_id: str, vehicle: Vehicle, spot: ParkingSpot, expires_at: datetime.datetime):
+        self.reservation_id = reservation_id
+        self.vehicle = vehicle
+        self.spot = spot
+        self.expires_at = expires_at
+        self.timer_id: Optional[int] = None
+
+
+class ReservationManager:
+    def __init__(self, parking_lot: ParkingLot, tick: datetime.timedelta = datetime.timedelta(seconds=1),
+                 clock: Optional[Callable[[], datetime.datetime]] = None):
+        self.parking_lot = parking_lot
+        self.clock = clock or parking_lot.clock
+        self.tick = tick
+        self.epoch = self.clock()
+        self.wheel: HierarchicalTimerWheel[str] = HierarchicalTimerWheel()
+        self.reservations: dict[str, Reservation] = {}
+        self.reservations_by_registration: dict[str, Reservation] = {}
+        self.ids = itertools.count(1)
+        self.expired = 0
+        self.lock = threading.Lock()
+
+    def _tick_of(self, moment: datetime.datetime) -> int:
+        # Rounded up, so a hold never expires before its TTL
+        return -((self.epoch - moment) // self.tick)
+
+    def reserve(self, vehicle: Vehicle, ttl: datetime.timedelta,
+                entry_panel_id: Optional[str] = None) -> Optional[Reservation]:
+        with self.lock:
+            if vehicle.registration_number in self.reservations_by_registration:
+                return None
+            reservation_id = f"RES-{next(self.ids)}"
+            # Same optimistic loop as ParkingLot.issue_ticket
+            while True:
+                spot = self.parking_lot.find_available_spot(vehicle, entry_panel_id)
+                if not spot:
+                    return None
+                if spot.place_hold(reservation_id):
+                    break
+            reservation = Reservation(reservation_id, vehicle, spot, self.clock() + ttl)
+            reservation.timer_id = self.wheel.schedule(self._tick_of(reservation.expires_at), reservation_id)
+            self.reservations[reservation_id] = reservation
+            self.reservations_by_registration[vehicle.registration_number] = reservation
+            return reservation
+
+    def _remove(self, reservation: Reservation) -> None:
+        del self.reservations[reservation.reservation_id]
+        del self.reservations_by_registration[reservation.vehicle.registration_number]
+
+    def cancel(self, reservation_id: str) -> bool:
+        with self.lock:
+            reservation = self.reservations.get(reservation_id)
+            if not reservation:
+                return False
+            self.wheel.cancel(reservation.timer_id)
+            self._remove(reservation)
+        return reservation.spot.release_hold(reservation_id)
+
+    def check_in(self, reservation_id: str, entry_panel_id: str) -> Optional[ParkingTicket]:
+        self.expire_due()
+        with self.lock:
+            reservation = self.reservations.get(reservation_id)
+            if not reservation:
+                return None
+            ticket = self.parking_lot.issue_reserved_ticket(reservation.vehicle, reservation.spot,
+                                                            reservation_id, entry_panel_id)
+            if not ticket:
+                return None
+            self.wheel.cancel(reservation.timer_id)
+            self._remove(reservation)
+            return ticket
+
+    # Releases every hold whose TTL has passed; call it periodically or let
+    # start_expiry_thread do it
+    def expire_due(self) -> int:
+        with self.lock:
+            expired = []
+            for reservation_id in self.wheel.advance(self._tick_of(self.clock())):
+                reservation = self.reservations.get(reservation_id)
+                if reservation:
+                    self._remove(reservation)
+                    expired.append(reservation)
+            self.expired += len(expired)
+        for reservation in expired:
+            reservation.spot.release_hold(reservation.reservation_id)
+        return len(expired)
+
+    def start_expiry_thread(self, interval: float = 1.0) -> threading.Event:
+        stop = threading.Event()
+
+        def run():
+            while not stop.wait(interval):
+                self.expire_due()
+
+        threading.Thread(target=run, name="reservation-expiry", daemon=True).start()
+        return stop
+
+
+if __name__ == "__main__":
+    ParkingLot.reset_instance()
+    parking_lot = setup_parking_lot(num_floors=1, spots_per_type=2, num_panels=1)
+    clock = ManualClock(datetime.datetime(2024, 5, 1, 9, 0))
+    parking_lot.set_clock(clock.now)
+    manager = ReservationManager(parking_lot)
+
+    first = manager.reserve(Car("Car-001"), datetime.timedelta(minutes=15))
+    second = manager.reserve(Car("Car-002"), datetime.timedelta(minutes=30))
+    print(f"✅ Held {first.spot.spot_id} for Car-001 and {second.spot.spot_id} for Car-002")
+    print(f"Walk-in Car-003 gets a spot: {parking_lot.issue_ticket(Car('Car-003'), 'ENTRY-1') is not None}")
+    print(f"Compact status: {parking_lot.get_parking_lot_status()['Floor-1']['spots']['Compact']}")
+
+    clock.advance(datetime.timedelta(minutes=10))
+    ticket = manager.check_in(first.reservation_id, "ENTRY-1")
+    print(f"✅ Car-001 checked in at {ticket.spot.spot_id}")
+
+    clock.advance(datetime.timedelta(minutes=25))
+    print(f"Expired holds after 35 minutes: {manager.expire_due()}")
+    print(f"Car-002 check-in after expiry: {manager.check_in(second.reservation_id, 'ENTRY-1')}")
+    print(f"Walk-in Car-003 gets a spot: {parking_lot.issue_ticket(Car('Car-003'), 'ENTRY-1') is not None}")
+    print(f"Compact status: {parking_lot.get_parking_lot_status()['Floor-1']['spots']['Compact']}")
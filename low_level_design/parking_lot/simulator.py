@@ -0,0 +1,264 @@
+# Deterministic discrete-event traffic simulator for the parking lot.
+#
+# Arrivals at each entry gate are a seeded Poisson process and every parked
+# vehicle leaves after an exponential stay, through a random exit gate.
+# Events run in virtual time: the lot's clock is a ManualClock moved to each
+# event's timestamp, so tickets and fees carry simulated times while the
+# real ParkingLot / EntryPanel / ExitPanel code does the work. Only the
+# wall-clock cost of each issue_ticket and exit_vehicle call is measured.
+#
+# The same seed always produces the same issued / rejected / revenue numbers,
+# so a report can be saved and later runs compared against it:
+#   python -m low_level_design.parking_lot.simulator --save baseline.json
+#   python -m low_level_design.parking_lot.simulator --baseline baseline.json
+
+import argparse
+import datetime
+import heapq
+import json
+import random
+import sys
+import time
+import tracemalloc
+from typing import NamedTuple, Optional
+
+from low_level_design.parking_lot.my_parking_lot import (
+    ManualClock,
+    ParkingLot,
+    PaymentStrategy,
+    VehicleFactory,
+    VehicleType,
+    setup_parking_lot,
+)
+
+
+# One vehicle type per spot type share, so every spot type sees the same load
+VEHICLE_MIX = [
+    (VehicleType.MOTORCYCLE, 2),
+    (VehicleType.CAR, 2),
+    (VehicleType.VAN, 1),
+    (VehicleType.TRUCK, 1),
+]
+SIMULATION_START = datetime.datetime(2024, 1, 1)
+ARRIVAL = 0
+DEPARTURE = 1
+
+
+class SimulatedPayment(PaymentStrategy):
+    def process_payment(self, amount: float) -> bool:
+        return True
+
+
+class SimulationConfig(NamedTuple):
+    num_spots: int = 10000
+    num_floors: int = 5
+    num_gates: int = 4
+    arrivals: int = 50000
+    target_occupancy: float = 0.9
+    mean_stay_hours: float = 2.0
+    seed: int = 42
+
+
+class SimulationReport(NamedTuple):
+    spots: int
+    arrivals: int
+    issued: int
+    rejected: int
+    exits: int
+    revenue: float
+    entry_p50_us: float
+    entry_p99_us: float
+    exit_p50_us: float
+    exit_p99_us: float
+    allocations_per_sec: float
+    memory_bytes: int
+    simulated_hours: float
+    wall_seconds: float
+
+
+def percentile(sorted_values: list[int], fraction: float) -> int:
+    if not sorted_values:
+        return 0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+class TrafficSimulator:
+    def __init__(self, config: SimulationConfig):
+        self.config = config
+        self.random = random.Random(config.seed)
+        self.vehicle_factory = VehicleFactory()
+        self.vehicle_types = [vehicle_type for vehicle_type, _ in VEHICLE_MIX]
+        self.vehicle_weights = [weight for _, weight in VEHICLE_MIX]
+        self.payment_strategy = SimulatedPayment()
+        self.clock = ManualClock(SIMULATION_START)
+        self.events: list[tuple[float, int, int, object]] = []
+        self.sequence = 0
+        self.vehicle_number = 0
+        self.entry_latencies: list[int] = []
+        self.exit_latencies: list[int] = []
+        self.issued = 0
+        self.rejected = 0
+        self.exits = 0
+        self.revenue = 0.0
+        self.memory_bytes = 0
+
+        spots_per_type = max(1, config.num_spots // (3 * config.num_floors))
+        tracemalloc.start()
+        ParkingLot.reset_instance()
+        self.parking_lot = setup_parking_lot(config.num_floors, spots_per_type, config.num_gates)
+        self.parking_lot.set_clock(self.clock.now)
+        self.spots = spots_per_type * 3 * config.num_floors
+        self.mean_stay_seconds = config.mean_stay_hours * 3600
+        # Arrival rate that keeps the lot at the target occupancy in steady state
+        self.gate_arrival_rate = (config.target_occupancy * self.spots / self.mean_stay_seconds) / config.num_gates
+        # Memory is measured with the lot already at its steady-state occupancy
+        self._prefill()
+        self.memory_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+    def _schedule(self, at: float, kind: int, payload) -> None:
+        self.sequence += 1
+        heapq.heappush(self.events, (at, self.sequence, kind, payload))
+
+    def _next_vehicle(self):
+        self.vehicle_number += 1
+        vehicle_type = self.random.choices(self.vehicle_types, self.vehicle_weights)[0]
+        return self.vehicle_factory.create_vehicle(vehicle_type, f"SIM-{self.vehicle_number}")
+
+    def _gate_id(self, prefix: str) -> str:
+        return f"{prefix}-{self.random.randrange(self.config.num_gates) + 1}"
+
+    # Starts from steady state instead of an empty lot; stays are memoryless,
+    # so the remaining stay of a vehicle already parked has the same distribution
+    def _prefill(self) -> None:
+        for _ in range(int(self.spots * self.config.target_occupancy)):
+            ticket = self.parking_lot.issue_ticket(self._next_vehicle(), self._gate_id("ENTRY"))
+            if ticket:
+                self._schedule(self.random.expovariate(1 / self.mean_stay_seconds), DEPARTURE, ticket)
+
+    def run(self) -> SimulationReport:
+        for gate in range(1, self.config.num_gates + 1):
+            self._schedule(self.random.expovariate(self.gate_arrival_rate), ARRIVAL, f"ENTRY-{gate}")
+
+        parking_lot = self.parking_lot
+        perf_counter_ns = time.perf_counter_ns
+        arrivals = 0
+        now = 0.0
+        wall_start = time.perf_counter()
+        while self.events and arrivals < self.config.arrivals:
+            now, _, kind, payload = heapq.heappop(self.events)
+            self.clock.set(SIMULATION_START + datetime.timedelta(seconds=now))
+            if kind == ARRIVAL:
+                arrivals += 1
+                vehicle = self._next_vehicle()
+                start = perf_counter_ns()
+                ticket = parking_lot.issue_ticket(vehicle, payload)
+                self.entry_latencies.append(perf_counter_ns() - start)
+                if ticket:
+                    self.issued += 1
+                    self._schedule(now + self.random.expovariate(1 / self.mean_stay_seconds), DEPARTURE, ticket)
+                else:
+                    self.rejected += 1
+                self._schedule(now + self.random.expovariate(self.gate_arrival_rate), ARRIVAL, payload)
+            else:
+                exit_panel_id = self._gate_id("EXIT")
+                start = perf_counter_ns()
+                succeeded = parking_lot.exit_vehicle(payload, exit_panel_id, self.payment_strategy)
+                self.exit_latencies.append(perf_counter_ns() - start)
+                if succeeded:
+                    self.exits += 1
+                    self.revenue += payload.payment.amount
+        wall_seconds = time.perf_counter() - wall_start
+        return self._report(now, wall_seconds)
+
+    def _report(self, simulated_seconds: float, wall_seconds: float) -> SimulationReport:
+        entry_latencies = sorted(self.entry_latencies)
+        exit_latencies = sorted(self.exit_latencies)
+        allocation_seconds = sum(entry_latencies) / 1e9
+        return SimulationReport(
+            spots=self.spots,
+            arrivals=len(entry_latencies),
+            issued=self.issued,
+            rejected=self.rejected,
+            exits=self.exits,
+            revenue=round(self.revenue, 2),
+            entry_p50_us=percentile(entry_latencies, 0.5) / 1000,
+            entry_p99_us=percentile(entry_latencies, 0.99) / 1000,
+            exit_p50_us=percentile(exit_latencies, 0.5) / 1000,
+            exit_p99_us=percentile(exit_latencies, 0.99) / 1000,
+            allocations_per_sec=self.issued / allocation_seconds if allocation_seconds else 0.0,
+            memory_bytes=self.memory_bytes,
+            simulated_hours=simulated_seconds / 3600,
+            wall_seconds=wall_seconds,
+        )
+
+
+def run_simulation(config: SimulationConfig) -> SimulationReport:
+    return TrafficSimulator(config).run()
+
+
+def run_benchmark_suite(sizes=(1000, 10000, 100000), arrivals: int = 50000, seed: int = 42) -> list[SimulationReport]:
+    print(f"\nTraffic simulation, {arrivals} arrivals per lot size")
+    print("-" * 50)
+    print(f"{'spots':>7} {'issued':>7} {'rejected':>8} {'entry p50/p99 us':>17} {'exit p50/p99 us':>16} "
+          f"{'allocs/sec':>11} {'bytes/spot':>10} {'sim hours':>9}")
+    reports = []
+    for size in sizes:
+        report = run_simulation(SimulationConfig(num_spots=size, arrivals=arrivals, seed=seed))
+        reports.append(report)
+        print(f"{report.spots:>7} {report.issued:>7} {report.rejected:>8} "
+              f"{report.entry_p50_us:>8.1f}/{report.entry_p99_us:<8.1f} "
+              f"{report.exit_p50_us:>7.1f}/{report.exit_p99_us:<8.1f} "
+              f"{report.allocations_per_sec:>11.0f} {report.memory_bytes / report.spots:>10.0f} "
+              f"{report.simulated_hours:>9.1f}")
+    return reports
+
+
+# Latencies may grow by up to `tolerance` and throughput may drop by as much;
+# the seeded outcome counts must match exactly
+def compare_reports(baseline: dict, report: SimulationReport, tolerance: float) -> list[str]:
+    problems = []
+    for field in ("issued", "rejected", "exits", "revenue"):
+        if baseline[field] != getattr(report, field):
+            problems.append(f"{report.spots} spots: {field} {getattr(report, field)} != baseline {baseline[field]}")
+    for field in ("entry_p50_us", "entry_p99_us", "exit_p50_us", "exit_p99_us", "memory_bytes"):
+        if getattr(report, field) > baseline[field] * (1 + tolerance):
+            problems.append(f"{report.spots} spots: {field} {getattr(report, field):.1f} "
+                            f"vs baseline {baseline[field]:.1f}")
+    if report.allocations_per_sec < baseline["allocations_per_sec"] * (1 - tolerance):
+        problems.append(f"{report.spots} spots: allocations_per_sec {report.allocations_per_sec:.0f} "
+                        f"vs baseline {baseline['allocations_per_sec']:.0f}")
+    return problems
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Parking lot traffic simulator")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--arrivals", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--save", help="write the reports to this JSON file")
+    parser.add_argument("--baseline", help="compare against reports saved with --save")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    reports = run_benchmark_suite(args.sizes, args.arrivals, args.seed)
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump([report._asdict() for report in reports], file, indent=2)
+    if args.baseline:
+        with open(args.baseline) as file:
+            baselines = {entry["spots"]: entry for entry in json.load(file)}
+        problems = []
+        for report in reports:
+            if report.spots in baselines:
+                problems.extend(compare_reports(baselines[report.spots], report, args.tolerance))
+        for problem in problems:
+            print(f"❌ {problem}")
+        if problems:
+            return 1
+        print("✅ No regressions against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
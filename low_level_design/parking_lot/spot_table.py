@@ -0,0 +1,355 @@
+# Compact, array-backed spot storage for very large lots.
+#
+# SpotTable keeps every spot of a lot as one row across typed arrays
+# (type code, floor code, status flags, free-list position). Ids of spots
+# added in bulk are not stored at all: a run of rows shares one interned
+# prefix and the id is the prefix plus the row's number in the run.
+# SpotView is a small ParkingSpot built on demand over one row, so
+# ParkingLot, the panels and the journal keep using the ParkingSpot API
+# unchanged. CompactParkingFloor stores its spots by row index and uses
+# index-based free lists.
+#
+# Run from the repository root:
+#   python -m low_level_design.parking_lot.spot_table
+
+import bisect
+import sys
+import threading
+from array import array
+from collections.abc import Sequence
+from typing import Optional
+
+from low_level_design.parking_lot.my_parking_lot import (
+    COMPATIBLE_SPOT_TYPES,
+    SPOT_TYPE_CODES,
+    SPOT_TYPES,
+    Car,
+    EntryPanel,
+    ExitPanel,
+    ParkingFloor,
+    ParkingLot,
+    ParkingSpot,
+    ParkingSpotType,
+    Truck,
+    Vehicle,
+)
+
+
+FREE = 1
+RESERVED = 2
+
+
+class SpotTable:
+    def __init__(self):
+        self.types = array('B')
+        self.floor_codes = array('H')
+        self.flags = bytearray()
+        # Position of the row in its floor's free list, -1 when not free
+        self.free_positions = array('i')
+        # Only occupied rows have a vehicle and only held rows a hold, so these stay sparse
+        self.vehicles: dict[int, Vehicle] = {}
+        self.holds: dict[int, str] = {}
+        self.floors: list['CompactParkingFloor'] = []
+        # Bulk-added rows: run k covers rows run_starts[k] .. run_starts[k] + run_lengths[k] - 1
+        self.run_starts = array('I')
+        self.run_lengths = array('I')
+        self.run_prefixes: list[str] = []
+        self.run_by_prefix: dict[str, int] = {}
+        # Rows added one at a time with an arbitrary id
+        self.explicit_ids: dict[int, str] = {}
+        self.explicit_indexes: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.types)
+
+    def register_floor(self, floor: 'CompactParkingFloor') -> int:
+        self.floors.append(floor)
+        return len(self.floors) - 1
+
+    def _append_rows(self, spot_type: ParkingSpotType, floor_code: int, count: int) -> int:
+        start = len(self.types)
+        self.types.extend([SPOT_TYPE_CODES[spot_type]] * count)
+        self.floor_codes.extend([floor_code] * count)
+        self.flags.extend([FREE] * count)
+        self.free_positions.extend([-1] * count)
+        return start
+
+    def add_row(self, spot_id: str, spot_type: ParkingSpotType, floor_code: int) -> int:
+        if self.find(spot_id) is not None:
+            raise ValueError(f"Duplicate spot id {spot_id}")
+        index = self._append_rows(spot_type, floor_code, 1)
+        spot_id = sys.intern(spot_id)
+        self.explicit_ids[index] = spot_id
+        self.explicit_indexes[spot_id] = index
+        return index
+
+    # Rows get the ids prefix + "1" .. prefix + str(count)
+    def add_run(self, prefix: str, spot_type: ParkingSpotType, floor_code: int, count: int) -> range:
+        if prefix in self.run_by_prefix:
+            raise ValueError(f"Duplicate spot id prefix {prefix}")
+        start = self._append_rows(spot_type, floor_code, count)
+        self.run_by_prefix[sys.intern(prefix)] = len(self.run_prefixes)
+        self.run_prefixes.append(prefix)
+        self.run_starts.append(start)
+        self.run_lengths.append(count)
+        return range(start, start + count)
+
+    def spot_id(self, index: int) -> str:
+        spot_id = self.explicit_ids.get(index)
+        if spot_id is not None:
+            return spot_id
+        run = bisect.bisect_right(self.run_starts, index) - 1
+        return f"{self.run_prefixes[run]}{index - self.run_starts[run] + 1}"
+
+    def find(self, spot_id: str) -> Optional[int]:
+        index = self.explicit_indexes.get(spot_id)
+        if index is not None:
+            return index
+        prefix, separator, number = spot_id.rpartition("-")
+        run = self.run_by_prefix.get(prefix + separator)
+        if run is None or not number.isdigit() or not 1 <= int(number) <= self.run_lengths[run]:
+            return None
+        return self.run_starts[run] + int(number) - 1
+
+
+# ParkingSpot over one SpotTable row; holds nothing but the row index
+class SpotView(ParkingSpot):
+    __slots__ = ("table", "index")
+
+    def __init__(self, table: SpotTable, index: int):
+        self.table = table
+        self.index = index
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, SpotView) and other.table is self.table and other.index == self.index
+
+    def __hash__(self) -> int:
+        return hash((id(self.table), self.index))
+
+    def __repr__(self) -> str:
+        return f"SpotView({self.spot_id!r})"
+
+    @property
+    def spot_id(self) -> str:
+        return self.table.spot_id(self.index)
+
+    @property
+    def floor(self) -> 'CompactParkingFloor':
+        return self.table.floors[self.table.floor_codes[self.index]]
+
+    @property
+    def floor_id(self) -> str:
+        return self.floor.floor_id
+
+    @property
+    def lock(self) -> threading.Lock:
+        return self.floor.allocators[self.get_parking_spot_type()].lock
+
+    @property
+    def is_free(self) -> bool:
+        return bool(self.table.flags[self.index] & FREE)
+
+    @is_free.setter
+    def is_free(self, value: bool):
+        self._set_flag(FREE, value)
+
+    @property
+    def is_reserved(self) -> bool:
+        return bool(self.table.flags[self.index] & RESERVED)
+
+    @is_reserved.setter
+    def is_reserved(self, value: bool):
+        self._set_flag(RESERVED, value)
+
+    @property
+    def vehicle(self) -> Optional[Vehicle]:
+        return self.table.vehicles.get(self.index)
+
+    @vehicle.setter
+    def vehicle(self, vehicle: Optional[Vehicle]):
+        if vehicle is None:
+            self.table.vehicles.pop(self.index, None)
+        else:
+            self.table.vehicles[self.index] = vehicle
+
+    @property
+    def hold_id(self) -> Optional[str]:
+        return self.table.holds.get(self.index)
+
+    @hold_id.setter
+    def hold_id(self, hold_id: Optional[str]):
+        if hold_id is None:
+            self.table.holds.pop(self.index, None)
+        else:
+            self.table.holds[self.index] = hold_id
+
+    def _set_flag(self, flag: int, value: bool):
+        if value:
+            self.table.flags[self.index] |= flag
+        else:
+            self.table.flags[self.index] &= ~flag
+
+    def get_parking_spot_type(self) -> ParkingSpotType:
+        return SPOT_TYPES[self.table.types[self.index]]
+
+    def _vehicle_can_fit(self, vehicle: Vehicle) -> bool:
+        return self.get_parking_spot_type() in COMPATIBLE_SPOT_TYPES.get(vehicle.get_vehicle_type(), [])
+
+
+# Same contract as SpotAllocator, but the free list holds row indexes
+class CompactSpotAllocator:
+    def __init__(self, table: SpotTable):
+        self.table = table
+        self.free_indexes = array('I')
+        self.total = 0
+        self.lock = threading.Lock()
+
+    @property
+    def free_count(self) -> int:
+        return len(self.free_indexes)
+
+    @property
+    def occupied_count(self) -> int:
+        return self.total - len(self.free_indexes)
+
+    def add_spot(self, spot: SpotView) -> None:
+        self.total += 1
+        if spot.is_free and not spot.is_reserved:
+            self.release(spot)
+
+    def peek(self) -> Optional[SpotView]:
+        try:
+            return SpotView(self.table, self.free_indexes[-1])
+        except IndexError:
+            return None
+
+    def acquire(self, spot: SpotView) -> None:
+        free_positions = self.table.free_positions
+        position = free_positions[spot.index]
+        if position < 0:
+            return
+        last_index = self.free_indexes.pop()
+        if last_index != spot.index:
+            self.free_indexes[position] = last_index
+            free_positions[last_index] = position
+        free_positions[spot.index] = -1
+
+    def release(self, spot: SpotView) -> None:
+        free_positions = self.table.free_positions
+        if free_positions[spot.index] >= 0:
+            return
+        free_positions[spot.index] = len(self.free_indexes)
+        self.free_indexes.append(spot.index)
+
+
+# Read-only list of the spots of one type on a floor, views made on access
+class SpotSequence(Sequence):
+    def __init__(self, table: SpotTable, indexes: array):
+        self.table = table
+        self.indexes = indexes
+
+    def __len__(self) -> int:
+        return len(self.indexes)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [SpotView(self.table, index) for index in self.indexes[position]]
+        return SpotView(self.table, self.indexes[position])
+
+
+# Stands in for ParkingFloor.spots_by_id
+class FloorSpotIndex:
+    def __init__(self, table: SpotTable, floor_code: int):
+        self.table = table
+        self.floor_code = floor_code
+
+    def get(self, spot_id: str, default=None) -> Optional[SpotView]:
+        index = self.table.find(spot_id)
+        if index is None or self.table.floor_codes[index] != self.floor_code:
+            return default
+        return SpotView(self.table, index)
+
+    def __contains__(self, spot_id: str) -> bool:
+        return self.get(spot_id) is not None
+
+
+class CompactParkingFloor(ParkingFloor):
+    def __init__(self, floor_id: str, table: SpotTable):
+        super().__init__(floor_id)
+        self.table = table
+        self.floor_code = table.register_floor(self)
+        self.spot_indexes: dict[ParkingSpotType, array] = {
+            spot_type: array('I') for spot_type in ParkingSpotType
+        }
+        self.parking_spots = {
+            spot_type: SpotSequence(table, indexes) for spot_type, indexes in self.spot_indexes.items()
+        }
+        self.spots_by_id = FloorSpotIndex(table, self.floor_code)
+        self.allocators = {spot_type: CompactSpotAllocator(table) for spot_type in ParkingSpotType}
+
+    def add_spot(self, spot_type: ParkingSpotType, spot_id: str) -> SpotView:
+        allocator = self.allocators[spot_type]
+        with allocator.lock:
+            index = self.table.add_row(spot_id, spot_type, self.floor_code)
+            self.spot_indexes[spot_type].append(index)
+            spot = SpotView(self.table, index)
+            allocator.add_spot(spot)
+            if allocator.free_count == 1:
+                self._update_capacity(spot_type)
+        return spot
+
+    # Bulk replacement for calling ParkingSpotFactory.create_spot per spot;
+    # ids follow setup_parking_lot: "<floor_id>-<spot type>-<number>"
+    def add_spots(self, spot_type: ParkingSpotType, count: int) -> None:
+        allocator = self.allocators[spot_type]
+        with allocator.lock:
+            rows = self.table.add_run(f"{self.floor_id}-{spot_type.value}-", spot_type, self.floor_code, count)
+            self.spot_indexes[spot_type].extend(rows)
+            free_positions = self.table.free_positions
+            for index in rows:
+                free_positions[index] = len(allocator.free_indexes)
+                allocator.free_indexes.append(index)
+            allocator.total += count
+            self._update_capacity(spot_type)
+
+    # Copies an existing ParkingSpot into the table
+    def add_parking_spot(self, spot: ParkingSpot):
+        spot_type = spot.get_parking_spot_type()
+        view = self.add_spot(spot_type, spot.spot_id)
+        if spot.vehicle or not spot.is_free or spot.is_reserved:
+            allocator = self.allocators[spot_type]
+            with allocator.lock:
+                view.vehicle = spot.vehicle
+                view.is_free = spot.is_free
+                view.is_reserved = spot.is_reserved
+                allocator.acquire(view)
+                if allocator.free_count == 0:
+                    self._update_capacity(spot_type)
+
+
+def setup_compact_parking_lot(num_floors: int = 3, spots_per_type: int = 2, num_panels: int = 2,
+                              parking_lot: Optional[ParkingLot] = None) -> ParkingLot:
+    parking_lot = parking_lot or ParkingLot()
+    for i in range(num_panels):
+        parking_lot.add_entry_panel(EntryPanel(f"ENTRY-{i+1}"))
+        parking_lot.add_exit_panel(ExitPanel(f"EXIT-{i+1}"))
+
+    table = SpotTable()
+    for floor_num in range(num_floors):
+        floor = CompactParkingFloor(f"Floor-{floor_num + 1}", table)
+        for spot_type in ParkingSpotType:
+            floor.add_spots(spot_type, spots_per_type)
+        parking_lot.add_floor(floor)
+    return parking_lot
+
+
+if __name__ == "__main__":
+    ParkingLot.reset_instance()
+    parking_lot = setup_compact_parking_lot()
+    ticket = parking_lot.issue_ticket(Car("Car-001"), "ENTRY-1")
+    truck_ticket = parking_lot.issue_ticket(Truck("Truck-001"), "ENTRY-1")
+    print(f"✅ Parked Car-001 at {ticket.spot.spot_id}, Truck-001 at {truck_ticket.spot.spot_id}")
+    print(parking_lot.get_parking_lot_status()["Floor-1"])
+    parking_lot.consistency_check = True
+    parking_lot.get_parking_lot_status()
+    print(f"Spot table rows: {len(parking_lot.floors[0].table)}")
@@ -0,0 +1,464 @@
+# Columnar export of closed tickets and their payments, for finance and BI.
+#
+# Rows are gathered column by column (array.array for numbers, lists for
+# strings) and written one batch at a time, so an export never holds more
+# than a batch or two in memory however many records it covers. Two tables
+# are written, "tickets" and "payments", in one of three formats:
+#   - parquet: one file per table and run, one row group per batch (needs
+#     pyarrow; the benchmarks' round-trip check skips it when pyarrow is missing)
+#   - npz: one compressed NumPy file per batch (needs numpy)
+#   - csv: one file per table, standard library only
+# The ticket table has the same columns as ClosedTicketArchive, so the
+# nightly export of an archive is a sequence of column slices.
+#
+# Run from the repository root:
+#   python -m low_level_design.parking_lot.ticket_export
+
+import csv
+import datetime
+import math
+import os
+import shutil
+import threading
+from abc import ABC, abstractmethod
+from array import array
+from typing import Iterator, NamedTuple, Optional, Sequence
+
+from low_level_design.parking_lot.my_parking_lot import (
+    SPOT_TYPE_CODES,
+    Car,
+    ClosedTicketArchive,
+    ManualClock,
+    Motorcycle,
+    ParkingLot,
+    ParkingTicket,
+    PaymentType,
+    TicketObserver,
+    Truck,
+    setup_parking_lot,
+)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+
+STRING = "str"
+
+# (column name, array typecode or STRING)
+TICKET_SCHEMA = (
+    ("ticket_id", STRING),
+    ("registration_number", STRING),
+    ("spot_id", STRING),
+    ("spot_type", "b"),
+    ("entry_timestamp", "d"),
+    ("exit_timestamp", "d"),
+    ("amount", "d"),
+    ("payment_id", STRING),
+)
+PAYMENT_SCHEMA = (
+    ("payment_id", STRING),
+    ("ticket_id", STRING),
+    ("amount", "d"),
+    ("method", STRING),
+    ("status", STRING),
+    # NaN when the gateway never reported a time
+    ("processed_timestamp", "d"),
+)
+SCHEMAS = {"tickets": TICKET_SCHEMA, "payments": PAYMENT_SCHEMA}
+
+Columns = dict[str, Sequence]
+
+
+class ColumnBatch:
+    def __init__(self, schema: tuple[tuple[str, str], ...]):
+        self.columns: Columns = {name: [] if typecode == STRING else array(typecode) for name, typecode in schema}
+        self.appenders = [column.append for column in self.columns.values()]
+
+    def __len__(self) -> int:
+        return len(next(iter(self.columns.values())))
+
+    def append(self, row: tuple) -> None:
+        for append, value in zip(self.appenders, row):
+            append(value)
+
+
+class ExportWriter(ABC):
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.rows_written = {table: 0 for table in SCHEMAS}
+
+    @abstractmethod
+    def write_batch(self, table: str, columns: Columns) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class ParquetExportWriter(ExportWriter):
+    ARROW_TYPES = {STRING: "string", "b": "int8", "d": "float64"}
+
+    def __init__(self, directory: str):
+        if pa is None:
+            raise RuntimeError("Parquet export needs pyarrow; use the npz or csv format instead")
+        super().__init__(directory)
+        self.schemas = {
+            table: pa.schema([(name, getattr(pa, self.ARROW_TYPES[typecode])()) for name, typecode in schema])
+            for table, schema in SCHEMAS.items()
+        }
+        self.writers = {}
+        # A new file per run: reopening an earlier one would truncate it
+        self.runs_written = {table: _count_files(directory, table, ".parquet") for table in SCHEMAS}
+
+    def write_batch(self, table: str, columns: Columns) -> None:
+        schema = self.schemas[table]
+        record_batch = pa.RecordBatch.from_arrays(
+            [pa.array(_numeric_view(column), type=field.type) for field, column in zip(schema, columns.values())],
+            schema=schema,
+        )
+        writer = self.writers.get(table)
+        if writer is None:
+            path = os.path.join(self.directory, f"{table}-{self.runs_written[table]:06d}.parquet")
+            writer = pq.ParquetWriter(path, schema)
+            self.writers[table] = writer
+            self.runs_written[table] += 1
+        writer.write_table(pa.Table.from_batches([record_batch]))
+        self.rows_written[table] += record_batch.num_rows
+
+    def close(self) -> None:
+        for writer in self.writers.values():
+            writer.close()
+        self.writers = {}
+
+
+class NpzExportWriter(ExportWriter):
+    def __init__(self, directory: str):
+        if np is None:
+            raise RuntimeError("NPZ export needs numpy; use the csv format instead")
+        super().__init__(directory)
+        self.batches_written = {table: _count_files(directory, table, ".npz") for table in SCHEMAS}
+
+    def write_batch(self, table: str, columns: Columns) -> None:
+        arrays = {name: _numeric_view(column) if isinstance(column, array) else np.array(column, dtype=str)
+                  for name, column in columns.items()}
+        path = os.path.join(self.directory, f"{table}-{self.batches_written[table]:06d}.npz")
+        np.savez_compressed(path, **arrays)
+        self.batches_written[table] += 1
+        self.rows_written[table] += len(next(iter(arrays.values())))
+
+
+class CsvExportWriter(ExportWriter):
+    def __init__(self, directory: str):
+        super().__init__(directory)
+        self.files = {}
+
+    def write_batch(self, table: str, columns: Columns) -> None:
+        file = self.files.get(table)
+        if file is None:
+            path = os.path.join(self.directory, f"{table}.csv")
+            is_new = not os.path.exists(path)
+            file = open(path, "a", newline="", encoding="utf-8")
+            self.files[table] = file
+            if is_new:
+                csv.writer(file).writerow(columns.keys())
+        # repr keeps floats exact through the round trip
+        formatted = [column if isinstance(column, list)
+                     else map(repr, column) if column.typecode == "d" else column
+                     for column in columns.values()]
+        csv.writer(file).writerows(zip(*formatted))
+        self.rows_written[table] += len(next(iter(columns.values())))
+
+    def close(self) -> None:
+        for file in self.files.values():
+            file.close()
+        self.files = {}
+
+
+# Zero-copy NumPy view of an array.array column; other columns pass through
+def _numeric_view(column: Sequence) -> Sequence:
+    if not isinstance(column, array):
+        return column
+    if np is None:
+        return column.tolist()
+    return np.frombuffer(column, dtype=column.typecode)
+
+
+EXPORT_FORMATS = {"parquet": ParquetExportWriter, "npz": NpzExportWriter, "csv": CsvExportWriter}
+
+
+def default_export_format() -> str:
+    if pa is not None:
+        return "parquet"
+    if np is not None:
+        return "npz"
+    return "csv"
+
+
+def create_export_writer(directory: str, export_format: Optional[str] = None) -> ExportWriter:
+    export_format = export_format or default_export_format()
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format {export_format}")
+    return EXPORT_FORMATS[export_format](directory)
+
+
+def _count_files(directory: str, table: str, suffix: str) -> int:
+    return len(_table_files(directory, table, suffix))
+
+
+def _table_files(directory: str, table: str, suffix: str) -> list[str]:
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.startswith(f"{table}-") and name.endswith(suffix)
+    )
+
+
+def ticket_row(ticket: ParkingTicket) -> tuple:
+    payment = ticket.payment
+    exit_time = ticket.exit_time or ticket.entry_time
+    return (
+        ticket.ticket_id, ticket.vehicle.registration_number, ticket.spot.spot_id,
+        SPOT_TYPE_CODES[ticket.spot.get_parking_spot_type()], ticket.entry_time.timestamp(), exit_time.timestamp(),
+        payment.amount if payment else 0.0, payment.payment_id if payment else "",
+    )
+
+
+def payment_row(ticket: ParkingTicket) -> tuple:
+    payment = ticket.payment
+    return (
+        payment.payment_id, ticket.ticket_id, payment.amount,
+        # Payments rebuilt from the journal no longer know how they were paid
+        type(payment.payment_strategy).__name__ if payment.payment_strategy else "",
+        payment.payment_status.value, payment.processed_at.timestamp() if payment.processed_at else math.nan,
+    )
+
+
+# Streams tickets as they close. Gates append a row under the lock; a writer
+# thread writes full batches while the gates fill the next one. At most one
+# full batch waits for the writer: a gate that fills another one waits, so
+# a slow disk slows the gates down instead of growing memory.
+class TicketExporter(TicketObserver):
+    def __init__(self, writer: ExportWriter, batch_size: int = 50000, flush_interval: Optional[float] = None):
+        self.writer = writer
+        self.batch_size = batch_size
+        # When set, a partial batch is written after this many idle seconds
+        self.flush_interval = flush_interval
+        self.tickets = ColumnBatch(TICKET_SCHEMA)
+        self.payments = ColumnBatch(PAYMENT_SCHEMA)
+        self.full: Optional[tuple[ColumnBatch, ColumnBatch]] = None
+        self.condition = threading.Condition()
+        self.exported = 0
+        self.closed = False
+        self.thread = threading.Thread(target=self._run_writer, name="ticket-exporter", daemon=True)
+        self.thread.start()
+
+    def attach(self, parking_lot: ParkingLot) -> None:
+        parking_lot.add_ticket_observer(self)
+
+    def on_ticket_issued(self, ticket: ParkingTicket):
+        pass
+
+    def on_ticket_closed(self, ticket: ParkingTicket):
+        row = ticket_row(ticket)
+        payment = payment_row(ticket) if ticket.payment else None
+        with self.condition:
+            self.tickets.append(row)
+            if payment:
+                self.payments.append(payment)
+            if len(self.tickets) >= self.batch_size:
+                while self.full is not None:
+                    self.condition.wait()
+                self._hand_over()
+
+    def _hand_over(self) -> None:
+        self.full = (self.tickets, self.payments)
+        self.tickets = ColumnBatch(TICKET_SCHEMA)
+        self.payments = ColumnBatch(PAYMENT_SCHEMA)
+        self.condition.notify_all()
+
+    def _run_writer(self) -> None:
+        while True:
+            with self.condition:
+                if self.full is None and not self.closed:
+                    self.condition.wait(self.flush_interval)
+                    if self.full is None and self.flush_interval is not None and len(self.tickets):
+                        self._hand_over()
+                if self.full is None:
+                    if self.closed:
+                        return
+                    continue
+                tickets, payments = self.full
+            self._write(tickets, payments)
+            with self.condition:
+                self.full = None
+                self.exported += len(tickets)
+                self.condition.notify_all()
+
+    def _write(self, tickets: ColumnBatch, payments: ColumnBatch) -> None:
+        if len(tickets):
+            self.writer.write_batch("tickets", tickets.columns)
+        if len(payments):
+            self.writer.write_batch("payments", payments.columns)
+
+    # Blocks until every ticket closed so far is written
+    def flush(self) -> None:
+        with self.condition:
+            while self.full is not None:
+                self.condition.wait()
+            if len(self.tickets):
+                self._hand_over()
+            while self.full is not None:
+                self.condition.wait()
+
+    def close(self) -> None:
+        self.flush()
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join()
+        self.writer.close()
+
+
+# Writes archive rows from `start` on, a batch of column slices at a time,
+# and returns the position to resume from in the next run
+def export_archive(archive: ClosedTicketArchive, writer: ExportWriter, start: int = 0,
+                   batch_size: int = 50000) -> int:
+    columns = (archive.ticket_ids, archive.registration_numbers, archive.spot_ids, archive.spot_types,
+               archive.entry_times, archive.exit_times, archive.amounts, archive.payment_ids)
+    end = len(archive)
+    for batch_start in range(start, end, batch_size):
+        batch_end = min(batch_start + batch_size, end)
+        writer.write_batch("tickets", {name: column[batch_start:batch_end]
+                                       for (name, _), column in zip(TICKET_SCHEMA, columns)})
+    return end
+
+
+def detect_export_format(directory: str) -> str:
+    names = os.listdir(directory)
+    if any(name.endswith(".parquet") for name in names):
+        return "parquet"
+    if any(name.endswith(".npz") for name in names):
+        return "npz"
+    return "csv"
+
+
+# Yields the table a batch at a time. String columns come back as lists;
+# numeric columns as NumPy arrays when NumPy is installed, array.array otherwise.
+def read_batches(directory: str, table: str, batch_size: int = 50000) -> Iterator[Columns]:
+    export_format = detect_export_format(directory)
+    schema = SCHEMAS[table]
+    if export_format == "parquet":
+        for path in _table_files(directory, table, ".parquet"):
+            for record_batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+                yield {name: record_batch.column(name).to_pylist() if typecode == STRING or np is None
+                       else record_batch.column(name).to_numpy()
+                       for name, typecode in schema}
+    elif export_format == "npz":
+        for path in _table_files(directory, table, ".npz"):
+            with np.load(path, allow_pickle=False) as arrays:
+                yield {name: arrays[name].tolist() if typecode == STRING else arrays[name]
+                       for name, typecode in schema}
+    else:
+        path = os.path.join(directory, f"{table}.csv")
+        if not os.path.exists(path):
+            return
+        parsers = [str if typecode == STRING else int if typecode == "b" else float for _, typecode in schema]
+        with open(path, newline="", encoding="utf-8") as file:
+            reader = csv.reader(file)
+            next(reader)
+            while True:
+                batch = ColumnBatch(schema)
+                columns = list(batch.columns.values())
+                for row in reader:
+                    for column, parse, value in zip(columns, parsers, row):
+                        column.append(parse(value))
+                    if len(batch) >= batch_size:
+                        break
+                if not len(batch):
+                    return
+                yield {name: _numeric_view(column) if np is not None else column
+                       for name, column in batch.columns.items()}
+
+
+class ReconciliationReport(NamedTuple):
+    tickets: int
+    payments: int
+    ticket_total: float
+    payment_total: float
+    # Paid tickets whose payment is missing or disagrees with the ticket
+    unmatched_tickets: list[str]
+    # Payments that no exported ticket points to
+    orphan_payments: list[str]
+
+
+# Joins the two tables on payment id, holding only payment ids and amounts
+def reconcile(directory: str) -> ReconciliationReport:
+    payment_amounts: dict[str, float] = {}
+    payments = 0
+    payment_total = 0.0
+    for columns in read_batches(directory, "payments"):
+        amounts = columns["amount"].tolist()
+        payments += len(amounts)
+        payment_total += math.fsum(amounts)
+        payment_amounts.update(zip(columns["payment_id"], amounts))
+    tickets = 0
+    ticket_total = 0.0
+    unmatched = []
+    for columns in read_batches(directory, "tickets"):
+        amounts = columns["amount"].tolist()
+        tickets += len(amounts)
+        ticket_total += math.fsum(amounts)
+        for ticket_id, payment_id, amount in zip(columns["ticket_id"], columns["payment_id"], amounts):
+            if not payment_id:
+                continue
+            if payment_amounts.pop(payment_id, None) != amount:
+                unmatched.append(ticket_id)
+    return ReconciliationReport(
+        tickets=tickets,
+        payments=payments,
+        ticket_total=round(ticket_total, 2),
+        payment_total=round(payment_total, 2),
+        unmatched_tickets=unmatched,
+        orphan_payments=sorted(payment_amounts),
+    )
+
+
+def run_export_demo(directory: str = "parking_lot_export"):
+    shutil.rmtree(directory, ignore_errors=True)
+    ParkingLot.reset_instance()
+    parking_lot = setup_parking_lot(num_floors=1, spots_per_type=5, num_panels=1)
+    clock = ManualClock(datetime.datetime(2024, 5, 6, 9, 0))
+    parking_lot.set_clock(clock.now)
+    exporter = TicketExporter(create_export_writer(directory), batch_size=4)
+    exporter.attach(parking_lot)
+
+    vehicles = [Car(f"Car-{i:03d}") for i in range(5)] + [Motorcycle("Moto-001"), Truck("Truck-001")]
+    tickets = [parking_lot.issue_ticket(vehicle, "ENTRY-1") for vehicle in vehicles]
+    clock.advance(datetime.timedelta(hours=2))
+    payment_types = [PaymentType.CASH, PaymentType.CREDIT_CARD, PaymentType.UPI]
+    for i, ticket in enumerate(tickets):
+        parking_lot.process_exit(ticket.ticket_id, "EXIT-1", payment_types[i % len(payment_types)])
+    exporter.close()
+
+    print(f"\nExported {exporter.exported} closed tickets as {detect_export_format(directory)}: "
+          f"{sorted(os.listdir(directory))}")
+    for columns in read_batches(directory, "payments"):
+        for payment_id, method, amount in zip(columns["payment_id"], columns["method"], columns["amount"]):
+            print(f"  {payment_id[:8]} {method:<18} ₹{amount:.2f}")
+    report = reconcile(directory)
+    print(f"Reconciliation: {report.tickets} tickets ₹{report.ticket_total}, {report.payments} payments "
+          f"₹{report.payment_total}, unmatched {len(report.unmatched_tickets)}, orphans {len(report.orphan_payments)}")
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    run_export_demo()
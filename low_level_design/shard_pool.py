@@ -0,0 +1,149 @@
+# Worker processes that each own a share of the state and serve batches of
+# requests over a pipe; used by the parking lot registry and the booking ledger.
+#
+# A worker is any object with a handle(request) method. Other messages call
+# the worker method of the same name (add_lot, add_show, status, ...).
+# Requests fail one by one: a request that raises comes back as a
+# RequestError in its slot while the rest of its batch is still applied, and
+# every shard's reply is read before the caller sees the error, so a pipe
+# never falls behind its requests.
+
+import multiprocessing
+import threading
+from typing import Callable, NamedTuple, Optional
+
+
+class RequestError(NamedTuple):
+    message: str
+
+
+class BatchError(RuntimeError):
+    # results holds every request's result, None where it failed;
+    # errors maps the position of each failed request to its message
+    def __init__(self, results: list, errors: dict[int, str]):
+        super().__init__(f"{len(errors)} of {len(results)} requests failed: "
+                         + "; ".join(errors[position] for position in sorted(errors)[:3]))
+        self.results = results
+        self.errors = errors
+
+
+def _describe(e: Exception) -> str:
+    return f"{type(e).__name__}: {e}"
+
+
+def _run_shard(connection, worker_factory: Callable, worker_args: tuple) -> None:
+    worker = worker_factory(*worker_args)
+    while True:
+        op, payload = connection.recv()
+        if op == "close":
+            break
+        try:
+            if op == "batch":
+                result = []
+                for request in payload:
+                    try:
+                        result.append(worker.handle(request))
+                    except Exception as e:
+                        result.append(RequestError(_describe(e)))
+            else:
+                result = getattr(worker, op)(*payload)
+            connection.send((True, result))
+        except Exception as e:
+            connection.send((False, _describe(e)))
+    connection.close()
+
+
+class Shard:
+    def __init__(self, context, worker_factory: Callable, worker_args: tuple, name: str):
+        self.connection, worker_connection = context.Pipe()
+        self.process = context.Process(target=_run_shard, args=(worker_connection, worker_factory, worker_args),
+                                       name=name, daemon=True)
+        self.process.start()
+        worker_connection.close()
+        # One request in flight per shard, so replies match their requests
+        self.lock = threading.Lock()
+
+    def send(self, op: str, payload) -> None:
+        self.connection.send((op, payload))
+
+    # (ok, result or error message); never raises, so callers can always drain
+    def receive(self) -> tuple[bool, object]:
+        return self.connection.recv()
+
+    def call(self, op: str, *args):
+        with self.lock:
+            self.send(op, args)
+            ok, result = self.receive()
+        if not ok:
+            raise RuntimeError(result)
+        return result
+
+
+class ShardPool:
+    # worker_args(index) gives the constructor arguments of shard index's worker
+    def __init__(self, num_shards: int, worker_factory: Callable, name: str,
+                 worker_args: Callable[[int], tuple] = lambda index: ()):
+        # spawn, not fork: the parent may already run journal, event bus or hold expiry threads
+        context = multiprocessing.get_context("spawn")
+        self.shards = [Shard(context, worker_factory, worker_args(index), f"{name}-{index}")
+                       for index in range(num_shards)]
+
+    def __len__(self) -> int:
+        return len(self.shards)
+
+    def call(self, index: int, op: str, *args):
+        return self.shards[index].call(op, *args)
+
+    # Routes each request with shard_for (None: not routable, its result is
+    # unrouted(request)) and returns results in request order. Raises
+    # BatchError, after every reply is in, if any request failed.
+    def submit(self, requests: list, shard_for: Callable[[object], Optional[int]],
+               unrouted: Callable[[object], object] = lambda request: None) -> list:
+        batches: dict[int, list[int]] = {}
+        results: list = [None] * len(requests)
+        for position, request in enumerate(requests):
+            index = shard_for(request)
+            if index is None:
+                results[position] = unrouted(request)
+                continue
+            batches.setdefault(index, []).append(position)
+
+        # Send every batch before waiting on any, so the shards run in parallel;
+        # locks are taken in shard order so concurrent callers cannot deadlock
+        errors: dict[int, str] = {}
+        involved = sorted(batches)
+        for index in involved:
+            self.shards[index].lock.acquire()
+        try:
+            sent = []
+            for index in involved:
+                try:
+                    self.shards[index].send("batch", [requests[position] for position in batches[index]])
+                except Exception as e:
+                    errors.update((position, _describe(e)) for position in batches[index])
+                    continue
+                sent.append(index)
+            for index in sent:
+                ok, replies = self.shards[index].receive()
+                if not ok:
+                    errors.update((position, replies) for position in batches[index])
+                    continue
+                for position, result in zip(batches[index], replies):
+                    if isinstance(result, RequestError):
+                        errors[position] = result.message
+                    else:
+                        results[position] = result
+        finally:
+            for index in involved:
+                self.shards[index].lock.release()
+        if errors:
+            raise BatchError(results, errors)
+        return results
+
+    def close(self) -> None:
+        for shard in self.shards:
+            with shard.lock:
+                shard.send("close", ())
+        for shard in self.shards:
+            shard.process.join()
+            shard.connection.close()